@@ -0,0 +1,43 @@
+class Identifier(int):
+    """A name interned as a dense integer id.
+
+    Hashing one is an int operation. It only turns back into its name when printed
+    or formatted, so debug output and the emitted assembly read the same as with
+    plain strings. Each name has one Identifier, so two are equal only if they're
+    the same object, and never equal to an int with the same value.
+    """
+
+    __slots__ = ()
+
+    __hash__ = int.__hash__
+
+    def __eq__(self, other) -> bool:
+        return self is other
+
+    def __ne__(self, other) -> bool:
+        return self is not other
+
+    def __str__(self) -> str:
+        return NAMES[self]
+
+    def __repr__(self) -> str:
+        return repr(NAMES[self])
+
+    def __format__(self, format_spec: str) -> str:
+        return format(NAMES[self], format_spec)
+
+    def __reduce__(self):
+        # ids are per process, a pickled identifier is interned again by name
+        return intern, (NAMES[self],)
+
+
+NAMES = []  # id -> name
+IDS = {}  # name -> Identifier
+
+
+def intern(name: str) -> Identifier:
+    identifier = IDS.get(name)
+    if identifier is None:
+        identifier = IDS[name] = Identifier(len(NAMES))
+        NAMES.append(name)
+    return identifier
@@ -1,4 +1,12 @@
 import re
+import os
+import mmap
+from array import array
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
+from typing import Iterator
 
 TOKENS = [
     (r",", "COMMA"),
@@ -60,7 +68,103 @@ TOKENS = [
     (r"\:", "COLON"),
 ]
 
-KEYWORDS = ["INT", "VOID", "RETURN"]
+TokenKind = IntEnum("TokenKind", [name for _, name in TOKENS], start=0)
+TOKEN_NAMES = [kind.name for kind in TokenKind]
+
+# whitespace, // and /* */ comments and # lines (hash functions are skipped...for now!)
+SKIP_REGEX = r"[ \t\n\r]+|//[^\n]*|/\*.*?\*/|#[^\n]*"
+
+
+def _literal(regex: str) -> str:
+    return re.sub(r"\\(.)", r"\1", regex)
+
+
+def _build_token_regex() -> tuple[re.Pattern, dict[str, int], list[int]]:
+    # Words (keywords and identifiers) all go through the identifier regex and are then
+    # looked up in the keyword table, which is the same as the keyword always winning a
+    # tie with the identifier. Everything else is ordered longest first so the
+    # alternation picks the longest match the same way the old "try every regex" loop
+    # did.
+    keyword_kinds = {}
+    punctuators = []
+    patterns = {}
+    for regex, name in TOKENS:
+        word = regex.removesuffix(r"\b")
+        if word.isalpha():
+            keyword_kinds[word] = TokenKind[name]
+        elif name in ["IDENTIFIER", "CONSTANT"]:
+            patterns[name] = regex
+        else:
+            punctuators.append((regex, name))
+    punctuators.sort(key=lambda token: len(_literal(token[0])), reverse=True)
+
+    alternatives = [f"(?P<SKIP>{SKIP_REGEX})", r"(?P<UNTERMINATED_COMMENT>/\*)"]
+    group_kinds = [None, SKIP, UNTERMINATED_COMMENT]  # indexed by match.lastindex
+    for name, regex in list(patterns.items()) + [(n, r) for r, n in punctuators]:
+        alternatives.append(f"(?P<{name}>{regex})")
+        group_kinds.append(TokenKind[name])
+    return re.compile("|".join(alternatives), re.DOTALL), keyword_kinds, group_kinds
+
+
+SKIP = -1
+UNTERMINATED_COMMENT = -2
+
+TOKEN_REGEX, KEYWORD_KINDS, GROUP_KINDS = _build_token_regex()
+# same regex for lexing straight out of a memory-mapped (bytes) source
+TOKEN_REGEX_BYTES = re.compile(TOKEN_REGEX.pattern.encode(), re.DOTALL)
+KEYWORD_KINDS_BYTES = {word.encode(): kind for word, kind in KEYWORD_KINDS.items()}
+
+# comments and # lines, the only places a newline doesn't end the lexer's state
+COMMENT_REGEX = re.compile(r"/\*.*?\*/|//[^\n]*|#[^\n]*", re.DOTALL)
+COMMENT_REGEX_BYTES = re.compile(COMMENT_REGEX.pattern.encode(), re.DOTALL)
+
+# the preprocessor's line markers, the next line is line N of the file
+LINE_MARKER_REGEX = re.compile(r'^# (\d+) "([^"\n]*)"', re.MULTILINE)
+LINE_MARKER_REGEX_BYTES = re.compile(LINE_MARKER_REGEX.pattern.encode(), re.MULTILINE)
+
+# smaller sources are lexed serially, starting the worker processes costs more
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+
+def map_source(path: str) -> mmap.mmap | bytes:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # can't mmap an empty file
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def split_points(content: str | bytes, count: int) -> list[int]:
+    # chunk boundaries for parallel lexing, each just after a newline that isn't inside
+    # a block comment so lexing the chunks separately gives the same tokens
+    regex = COMMENT_REGEX if isinstance(content, str) else COMMENT_REGEX_BYTES
+    newline = "\n" if isinstance(content, str) else b"\n"
+    comments = regex.finditer(content)
+    comment = next(comments, None)
+
+    points = [0]
+    for i in range(1, count):
+        pos = max(len(content) * i // count, points[-1])
+        while (pos := content.find(newline, pos)) != -1:
+            while comment is not None and comment.end() <= pos:
+                comment = next(comments, None)
+            if comment is None or comment.start() > pos:
+                break
+            pos = comment.end()
+        if pos == -1:
+            break
+        if pos + 1 > points[-1]:
+            points.append(pos + 1)
+    if points[-1] < len(content):
+        points.append(len(content))
+    return points
+
+
+def _lex_chunk(chunk: str | bytes, base: int, typecode: str) -> tuple[bytes, ...]:
+    # runs in a worker process, offsets are moved back into the whole file
+    tokens = Lexer(chunk, False).lex()
+    starts = array(typecode, map(base.__add__, tokens.starts))
+    ends = array(typecode, map(base.__add__, tokens.ends))
+    return tokens.kinds.tobytes(), starts.tobytes(), ends.tobytes()
 
 
 class Token:
@@ -80,9 +184,11 @@ class Token:
 
 class Lexer:
     def __init__(self, content: str, debug: bool) -> None:
-        self.content = content.replace("\t", "  ") + "\n"
+        self.content = content
         self.tokens = []
         self.debug = debug
+        self.line_starts = None
+        self.markers = None
 
     def __repr__(self):
         content = ""
@@ -90,53 +196,319 @@ class Lexer:
             content += str(token) + "\n"
         return content
 
-    def lex(self) -> list[Token]:
-        while self.content != "":
+    def lex(self) -> "TokenArray":
+        self.tokens = TokenArray(self.content)
+        kinds, starts, ends = self.tokens.kinds, self.tokens.starts, self.tokens.ends
+        for kind, start, end in self.scan():
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(end)
+        return self.tokens
+
+    def lex_parallel(self, jobs: int = None) -> "TokenArray":
+        jobs = jobs or os.cpu_count()
+        if jobs < 2 or len(self.content) < PARALLEL_THRESHOLD:
+            return self.lex()
 
-            # skip whitespace
-            if self.content[0] in [" ", "\n", "\r\n", "\r"]:
-                self.content = self.content[1:]
+        # a few chunks per worker so one slow chunk doesn't hold up the rest
+        points = split_points(self.content, jobs * 4)
+        tokens = TokenArray(self.content)
+        typecode = tokens.starts.typecode
+        try:
+            with ProcessPoolExecutor(jobs) as pool:
+                futures = [
+                    pool.submit(_lex_chunk, self.content[start:end], start, typecode)
+                    for start, end in zip(points, points[1:])
+                ]
+                for future in futures:
+                    kinds, starts, ends = future.result()
+                    tokens.kinds.frombytes(kinds)
+                    tokens.starts.frombytes(starts)
+                    tokens.ends.frombytes(ends)
+        except Exception:
+            # the chunk's error has a line and column inside the chunk, lexing it all
+            # again raises the same error with the real location
+            return self.lex()
 
-            # skip comments
-            elif self.content[0:2] == "//":
-                self.content = self.content.split("\n", 1)[1]
+        self.tokens = tokens
+        return tokens
 
-            # skip multiline comments
-            elif self.content[0:2] == "/*":
-                self.content = self.content.split("*/", 1)[1]
+    def stream(self) -> Iterator[Token]:
+        content = self.content
+        decode = not isinstance(content, str)
+        for kind, start, end in self.scan():
+            value = content[start:end]
+            if decode:
+                value = value.decode()
+            yield Token(TOKEN_NAMES[kind], value)
 
-            # skip hash functions...for now!
-            elif self.content[0] == "#":
-                self.content = self.content.split("\n", 1)[1]
+    def relex(self, offset: int, deleted: int, inserted: str) -> tuple[int, int, int]:
+        """Apply an edit to the content and update self.tokens in place.
 
+        Only the tokens around the edit are lexed again: scanning restarts at the end
+        of the last token before the edit and stops at the first new token that starts
+        where an old token (shifted by the edit) started. Returns (first, removed,
+        added), the token index where the edit landed and how many tokens it replaced.
+
+        The content is kept in a bytearray so an edit doesn't copy the whole file,
+        which makes offset and deleted UTF-8 byte counts, as with mmap input.
+        """
+        if not isinstance(self.content, bytearray):
+            content = self.content
+            if isinstance(content, str) and not content.isascii():
+                self.tokens = None  # token offsets were characters, not bytes
+            if isinstance(content, str):
+                content = content.encode()
+            self.content = bytearray(content)
+            if isinstance(self.tokens, TokenArray):
+                self.tokens.content = self.content
+        if not isinstance(self.tokens, TokenArray):
+            self.lex()
+        tokens = self.tokens
+        inserted = inserted.encode()
+        delta = len(inserted) - deleted
+        edit_end = offset + len(inserted)  # in new positions
+
+        # Token ends are sorted, so this finds the tokens entirely before the edit. A
+        # token ending right at the offset could be extended by the insert, and at a
+        # token end the lexer isn't inside a comment or # line, so restarting there
+        # gives the same tokens a full lex would.
+        low, high = 0, len(tokens)
+        while low < high:
+            middle = (low + high) // 2
+            if tokens.end(middle) < offset:
+                low = middle + 1
             else:
+                high = middle
+        first = low
+        pos = tokens.end(first - 1) if first > 0 else 0
 
-                # Find matching tokens
-                matches = []
-                for token in TOKENS:
-                    regex = token[0]
-                    match = re.match(regex, self.content)
-                    if match:
-                        matches.append((match.group(), token[1]))
-
-                if matches:
-                    matched_keyword = False
-
-                    # find longest match at start of input for any regex
-                    # if keyword and identifier match, choose keyword
-                    if len(matches) > 1:
-                        for match in matches:
-                            if match[1] in KEYWORDS:
-                                self.tokens.append(Token(match[1], match[0]))
-                                self.content = self.content[len(match[0]) :]
-                                matched_keyword = True
-
-                    if not matched_keyword:
-                        match = max(matches, key=lambda x: len(x[0]))
-                        self.tokens.append(Token(match[1], match[0]))
-                        self.content = self.content[len(match[0]) :]
-
-                else:
-                    print(self.content)
-                    raise Exception("Invalid token")
-        return self.tokens
+        removed = self.content[offset : offset + deleted]
+        self.content[offset : offset + deleted] = inserted
+        self.line_starts = self.markers = None
+        typecode = tokens.starts.typecode
+        kinds, starts, ends = array("B"), array(typecode), array(typecode)
+        old = first
+        try:
+            for kind, start, end in self.scan(pos):
+                # past the edit the text is unchanged, so once a new token starts where
+                # an old one did, every token after it is the same too
+                if start >= edit_end:
+                    while old < len(tokens) and tokens.start(old) + delta < start:
+                        old += 1
+                    if old < len(tokens) and tokens.start(old) + delta == start:
+                        break
+                kinds.append(kind)
+                starts.append(start)
+                ends.append(end)
+            else:
+                old = len(tokens)
+        except Exception:
+            self.content[offset : offset + len(inserted)] = removed
+            raise
+
+        tokens.splice(first, old, kinds, starts, ends, delta)
+        return first, old - first, len(kinds)
+
+    def scan(self, pos: int = 0) -> Iterator[tuple[int, int, int]]:
+        content = self.content
+        if isinstance(content, str):
+            regex, keywords = TOKEN_REGEX, KEYWORD_KINDS
+        else:
+            regex, keywords = TOKEN_REGEX_BYTES, KEYWORD_KINDS_BYTES
+        identifier = TokenKind.IDENTIFIER
+
+        # finditer searches forward, so any gap between matches is an invalid token
+        for match in regex.finditer(content, pos):
+            start = match.start()
+            if start != pos:
+                self.invalid_token(pos)
+            pos = match.end()
+
+            kind = GROUP_KINDS[match.lastindex]
+            if kind == SKIP:
+                continue
+            elif kind == UNTERMINATED_COMMENT:
+                raise Exception(f"Unterminated comment at {self.location(pos)}")
+            elif kind == identifier:
+                kind = keywords.get(match.group(), kind)
+            yield kind, start, pos
+
+        if pos != len(content):
+            self.invalid_token(pos)
+
+    def position(self, pos: int) -> tuple[int, int]:
+        # (line, column) of an offset, both starting at 1
+        if self.line_starts is None:
+            newline = "\n" if isinstance(self.content, str) else b"\n"
+            self.line_starts = array("q", [0])
+            start = self.content.find(newline)
+            while start != -1:
+                self.line_starts.append(start + 1)
+                start = self.content.find(newline, start + 1)
+
+        line = bisect_right(self.line_starts, pos)
+        return line, pos - self.line_starts[line - 1] + 1
+
+    def line_markers(self) -> tuple[list[int], list[tuple[int, str]]]:
+        # the lines holding markers, and the line and file each one names
+        content = self.content
+        regex = (
+            LINE_MARKER_REGEX if isinstance(content, str) else LINE_MARKER_REGEX_BYTES
+        )
+        lines, names = [], []
+        for match in regex.finditer(content):
+            path = match.group(2)
+            if not isinstance(path, str):
+                path = path.decode(errors="replace")
+            lines.append(self.position(match.start())[0])
+            names.append((int(match.group(1)), path))
+        return lines, names
+
+    def location(self, pos: int) -> str:
+        line, column = self.position(pos)
+        if self.markers is None:
+            self.markers = self.line_markers()
+        lines, names = self.markers
+        # preprocessed, the last marker before the line says where it came from
+        index = bisect_right(lines, line) - 1
+        if index < 0:
+            return f"line {line}, column {column}"
+        number, path = names[index]
+        return f"{path}:{number + line - lines[index] - 1}:{column}"
+
+    def invalid_token(self, pos: int):
+        raise Exception(f"Invalid token at {self.location(pos)}")
+
+
+class TokenArray:
+    """Compact token list: kinds and source offsets are kept in parallel arrays.
+
+    Lexemes are only sliced out of the source when a Token is asked for, and slicing
+    the array gives a view sharing the same storage instead of a copy.
+
+    After an edit the offsets past it are moved lazily, like the gap in a gap buffer:
+    stored offsets from index shift_from onwards are off by shift, and the gap only
+    moves as far as the next edit, so typing in one place never rewrites the arrays.
+    """
+
+    def __init__(
+        self,
+        content: str | bytes,
+        kinds: array = None,
+        starts: array = None,
+        ends: array = None,
+        offset: int = 0,
+    ) -> None:
+        # signed, offsets past the gap are stored minus the pending shift
+        offset_type = "i" if len(content) < 2**31 else "q"
+        self.content = content
+        self.kinds = kinds if kinds is not None else array("B")
+        self.starts = starts if starts is not None else array(offset_type)
+        self.ends = ends if ends is not None else array(offset_type)
+        self.offset = offset
+        self.shift_from = 0
+        self.shift = 0
+
+    def __len__(self) -> int:
+        return len(self.kinds) - self.offset
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            offset = min(self.offset + (index.start or 0), len(self.kinds))
+            view = TokenArray(self.content, self.kinds, self.starts, self.ends, offset)
+            view.shift_from, view.shift = self.shift_from, self.shift
+            return view
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Token stream exhausted")
+        return Token(TOKEN_NAMES[self.kind(index)], self.lexeme(index))
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def kind(self, index: int) -> int:
+        return self.kinds[self.offset + index]
+
+    def start(self, index: int) -> int:
+        index += self.offset
+        if index >= self.shift_from:
+            return self.starts[index] + self.shift
+        return self.starts[index]
+
+    def end(self, index: int) -> int:
+        index += self.offset
+        if index >= self.shift_from:
+            return self.ends[index] + self.shift
+        return self.ends[index]
+
+    def lexeme(self, index: int) -> str:
+        value = self.content[self.start(index) : self.end(index)]
+        if not isinstance(value, str):
+            value = value.decode()
+        return value
+
+    def move_gap(self, index: int):
+        if index < self.shift_from:
+            low, high, shift = index, self.shift_from, -self.shift
+        else:
+            low, high, shift = self.shift_from, index, self.shift
+        typecode = self.starts.typecode
+        self.starts[low:high] = array(
+            typecode, map(shift.__add__, self.starts[low:high])
+        )
+        self.ends[low:high] = array(typecode, map(shift.__add__, self.ends[low:high]))
+        self.shift_from = index
+
+    def splice(
+        self,
+        first: int,
+        last: int,
+        kinds: array,
+        starts: array,
+        ends: array,
+        delta: int,
+    ):
+        # replace tokens first..last with freshly lexed ones, everything after them
+        # moves by delta characters
+        self.move_gap(last)
+        self.kinds[first:last] = kinds
+        self.starts[first:last] = starts
+        self.ends[first:last] = ends
+        self.shift_from = first + len(kinds)
+        self.shift += delta
+
+
+class TokenStream:
+    """Lazily lexed tokens, standing in for the token list the Parser works on.
+
+    Tokens are indexed by their position in the whole stream, but everything before
+    the last drop_before is let go, so only a few lookahead tokens are ever held.
+    """
+
+    def __init__(self, tokens: Iterator[Token]) -> None:
+        self.tokens = tokens
+        self.window = deque()
+        self.start = 0
+
+    def __getitem__(self, position: int) -> Token:
+        while position - self.start >= len(self.window):
+            token = next(self.tokens, None)
+            if token is None:
+                raise IndexError("Token stream exhausted")
+            self.window.append(token)
+        return self.window[position - self.start]
+
+    def __bool__(self) -> bool:
+        try:
+            self[self.start]
+        except IndexError:
+            return False
+        return True
+
+    def drop_before(self, position: int):
+        while self.start < position and self.window:
+            self.window.popleft()
+            self.start += 1
@@ -0,0 +1,502 @@
+import re
+import os
+from Lexer import Lexer
+
+# pieces of the raw text: line continuations, comments, newlines and everything else
+SOURCE_REGEX = re.compile(r"\\\n|/\*.*?\*/|//[^\n]*|\n|[^\\/\n]+|.", re.DOTALL)
+DIRECTIVE_REGEX = re.compile(r"\s*#\s*(\w*)\s*(.*)", re.DOTALL)
+DEFINE_REGEX = re.compile(r"([A-Za-z_]\w*)(\([^)]*\))?\s*(.*)", re.DOTALL)
+DEFINED_REGEX = re.compile(r"\bdefined\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))")
+# numbers are matched whole so a suffix is never taken for a macro name
+WORD_REGEX = re.compile(r"[A-Za-z_]\w*|[0-9][\w.]*")
+# a macro body split into tokens and the whitespace between them
+BODY_REGEX = re.compile(
+    r"##|#|[A-Za-z_]\w*|[0-9][\w.]*|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|\s+|.",
+    re.DOTALL,
+)
+
+MAX_INCLUDE_DEPTH = 200
+
+BINARY_OPERATORS = {
+    "MULTIPLY": (10, lambda a, b: a * b),
+    "DIVIDE": (10, lambda a, b: _divide(a, b)),
+    "REMAINDER": (10, lambda a, b: a - b * _divide(a, b)),
+    "ADD": (9, lambda a, b: a + b),
+    "HYPHEN": (9, lambda a, b: a - b),
+    "LEFT_SHIFT": (8, lambda a, b: a << b),
+    "RIGHT_SHIFT": (8, lambda a, b: a >> b),
+    "LESS_THAN": (7, lambda a, b: int(a < b)),
+    "LESS_OR_EQUAL": (7, lambda a, b: int(a <= b)),
+    "GREATER_THAN": (7, lambda a, b: int(a > b)),
+    "GREATER_OR_EQUAL": (7, lambda a, b: int(a >= b)),
+    "EQUAL": (6, lambda a, b: int(a == b)),
+    "NOT_EQUAL": (6, lambda a, b: int(a != b)),
+    "AND_BITWISE": (5, lambda a, b: a & b),
+    "XOR_BITWISE": (4, lambda a, b: a ^ b),
+    "OR_BITWISE": (3, lambda a, b: a | b),
+    "AND_LOGICAL": (2, lambda a, b: int(bool(a and b))),
+    "OR_LOGICAL": (1, lambda a, b: int(bool(a or b))),
+}
+UNARY_OPERATORS = {
+    "HYPHEN": lambda a: -a,
+    "ADD": lambda a: a,
+    "TILDA": lambda a: ~a,
+    "NOT": lambda a: int(not a),
+}
+
+
+def _divide(a: int, b: int) -> int:
+    if b == 0:
+        raise Exception("Division by zero in #if")
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+class Macro:
+    def __init__(self, name: str, params: list[str] | None, body: str) -> None:
+        self.name = name
+        self.params = params  # None for object-like macros
+        self.body = body
+        self.tokens = BODY_REGEX.findall(body)
+        # bodies without # or ## are substituted word by word
+        self.operators = "#" in body
+
+        words = [token for token in self.tokens if not token.isspace()]
+        if words[:1] == ["##"] or words[-1:] == ["##"]:
+            raise Exception(f"'##' at either end of macro {name}")
+        if params is not None:
+            for token, following in zip(words, words[1:] + [None]):
+                if token == "#" and following not in params:
+                    raise Exception(
+                        f"'#' is not followed by a parameter in macro {name}"
+                    )
+
+
+class UnterminatedArguments(Exception):
+    """A macro call whose argument list goes on past the end of the line."""
+
+
+class SourceFile:
+    """A file split into logical lines, each either a directive or plain text.
+
+    Comments are replaced by a space and line continuations joined, with blank lines
+    added after the logical line so line numbers still match the file.
+    """
+
+    def __init__(self, path: str, content: str) -> None:
+        self.path = path
+        self.lines = []  # (directive name or None, text)
+        self.pragma_once = False
+        self.guard = None
+
+        current = []
+        pending = 0
+        for match in SOURCE_REGEX.finditer(content):
+            piece = match.group()
+            if piece == "\n":
+                self.add_line("".join(current))
+                self.lines.extend([(None, "")] * pending)
+                current = []
+                pending = 0
+            elif piece == "\\\n":
+                pending += 1
+            elif piece.startswith("/*"):
+                current.append(" ")
+                pending += piece.count("\n")
+            elif piece.startswith("//"):
+                current.append(" ")
+            else:
+                current.append(piece)
+        if current or pending:
+            self.add_line("".join(current))
+            self.lines.extend([(None, "")] * pending)
+        self.guard = self.find_guard()
+
+    def add_line(self, line: str):
+        match = DIRECTIVE_REGEX.fullmatch(line)
+        if match is None:
+            self.lines.append((None, line))
+            return
+        name, args = match.group(1), match.group(2).strip()
+        if name == "pragma" and args == "once":
+            self.pragma_once = True
+        self.lines.append((name, args))
+
+    def find_guard(self) -> str | None:
+        # #ifndef X / #define X ... #endif around everything in the file
+        directives = [
+            (index, name, args)
+            for index, (name, args) in enumerate(self.lines)
+            if name is not None or args.strip()
+        ]
+        if len(directives) < 3:
+            return None
+        _, first, guard = directives[0]
+        _, second, definition = directives[1]
+        if first != "ifndef" or second != "define" or definition.split()[:1] != [guard]:
+            return None
+
+        depth = 0
+        for position, (_, name, _) in enumerate(directives):
+            if name in ["if", "ifdef", "ifndef"]:
+                depth += 1
+            elif name == "endif":
+                depth -= 1
+                if depth == 0:
+                    return guard if position == len(directives) - 1 else None
+        return None
+
+
+# headers already read, shared by every Preprocessor so each is only read and split
+# into lines once per build
+SOURCE_CACHE: dict[str, tuple[tuple[int, int], SourceFile]] = {}
+
+
+def load_source(path: str) -> SourceFile:
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = SOURCE_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path) as f:
+        source = SourceFile(path, f.read())
+    SOURCE_CACHE[path] = (key, source)
+    return source
+
+
+class Preprocessor:
+    def __init__(self, include_dirs: list[str] = (), debug: bool = False) -> None:
+        self.include_dirs = list(include_dirs)
+        self.debug = debug
+        self.macros: dict[str, Macro] = {}
+        self.included_once = set()
+        self.depth = 0
+
+    def process(self, content: str, path: str) -> str:
+        path = os.path.realpath(path)
+        # so locations before the first #include know their file too
+        output = [f'# 1 "{path}"']
+        self.process_file(SourceFile(path, content), output)
+        return "\n".join(output) + "\n"
+
+    def process_file(self, source: SourceFile, output: list[str]):
+        # each entry is (parent active, a branch has been taken, #else seen)
+        conditions = []
+        active = True
+        # the lines of a macro call whose arguments span lines, expanded onto the
+        # first one's output line once the call is complete
+        call = []
+        call_line = 0
+
+        for line_number, (directive, text) in enumerate(source.lines, start=1):
+            if directive is None:
+                output.append("")
+                if not active:
+                    continue
+                if not call:
+                    call_line = len(output) - 1
+                call.append(text)
+                try:
+                    output[call_line] = self.expand(
+                        " ".join(call), continued=line_number < len(source.lines)
+                    )
+                    call = []
+                except UnterminatedArguments:
+                    pass
+                continue
+            output.append("")
+
+            if directive in ["if", "ifdef", "ifndef"]:
+                taken = active and self.condition(directive, text)
+                conditions.append((active, taken, False))
+                active = taken
+            elif directive in ["elif", "else"]:
+                if not conditions or conditions[-1][2]:
+                    raise Exception(f"#{directive} without #if in {source.path}")
+                parent, taken, _ = conditions[-1]
+                if directive == "else":
+                    active = parent and not taken
+                    conditions[-1] = (parent, True, True)
+                else:
+                    active = parent and not taken and self.condition("if", text)
+                    conditions[-1] = (parent, taken or active, False)
+            elif directive == "endif":
+                if not conditions:
+                    raise Exception(f"#endif without #if in {source.path}")
+                active = conditions.pop()[0]
+            elif not active:
+                continue
+            elif directive == "include":
+                output.pop()
+                self.include(text, source, line_number, output)
+            elif directive == "define":
+                self.define(text)
+            elif directive == "undef":
+                self.macros.pop(text, None)
+            elif directive == "error":
+                raise Exception(f"#error {text}")
+            elif directive == "pragma":
+                output[-1] = f"#pragma {text}"  # left for the lexer to skip
+            elif directive not in ["", "line", "warning"]:
+                raise Exception(f"Invalid preprocessor directive #{directive}")
+
+        if call:
+            output[call_line] = self.expand(" ".join(call))
+        if conditions:
+            raise Exception(f"Unterminated #if in {source.path}")
+
+    def include(self, text: str, source: SourceFile, line_number: int, output):
+        if not text.startswith(('"', "<")):
+            text = self.expand(text).strip()
+        if len(text) < 2 or (text[0], text[-1]) not in [('"', '"'), ("<", ">")]:
+            raise Exception(f"Invalid #include {text} in {source.path}")
+
+        name = text[1:-1]
+        search = self.include_dirs
+        if text[0] == '"':
+            search = [os.path.dirname(source.path)] + search
+        for directory in search:
+            path = os.path.realpath(os.path.join(directory, name))
+            if os.path.isfile(path):
+                break
+        else:
+            raise Exception(f"Include file not found: {name}")
+
+        header = load_source(path)
+        if path in self.included_once:
+            output.append("")
+            return
+        if header.guard is not None and header.guard in self.macros:
+            output.append("")  # include guard already defined, nothing to read
+            return
+        if header.pragma_once:
+            self.included_once.add(path)
+
+        if self.depth == MAX_INCLUDE_DEPTH:
+            raise Exception(f"#include nested too deeply in {source.path}")
+        if self.debug:
+            print(f"Including {path}")
+
+        # line markers, skipped by the lexer like any other # line
+        self.depth += 1
+        output.append(f'# 1 "{path}"')
+        self.process_file(header, output)
+        output.append(f'# {line_number + 1} "{source.path}"')
+        self.depth -= 1
+
+    def define(self, text: str):
+        match = DEFINE_REGEX.fullmatch(text)
+        if match is None:
+            raise Exception(f"Invalid #define {text}")
+        name, params, body = match.groups()
+        if params is not None:
+            params = [param.strip() for param in params[1:-1].split(",")]
+            if params == [""]:
+                params = []
+        self.macros[name] = Macro(name, params, body.strip())
+
+    def condition(self, directive: str, text: str) -> bool:
+        if directive == "ifdef":
+            return text in self.macros
+        if directive == "ifndef":
+            return text not in self.macros
+
+        text = DEFINED_REGEX.sub(
+            lambda match: str(int((match.group(1) or match.group(2)) in self.macros)),
+            text,
+        )
+        # identifiers left after expansion evaluate to 0
+        text = WORD_REGEX.sub(
+            lambda match: match.group() if match.group()[0].isdigit() else "0",
+            self.expand(text),
+        )
+        tokens = Lexer(text, self.debug).lex()
+        if len(tokens) == 0:
+            raise Exception("#if with no expression")
+        value, position = self.evaluate(tokens, 0, 0)
+        if position != len(tokens):
+            raise Exception(f"Invalid #if expression {text.strip()}")
+        return value != 0
+
+    def evaluate(self, tokens, position: int, min_precedence: int) -> tuple[int, int]:
+        # precedence climbing over the lexed #if expression
+        value, position = self.evaluate_factor(tokens, position)
+        while position < len(tokens):
+            token = tokens[position]
+            if token.type == "QUESTION_MARK" and min_precedence == 0:
+                middle, position = self.evaluate(tokens, position + 1, 0)
+                if position >= len(tokens) or tokens[position].type != "COLON":
+                    raise Exception("Expected : in #if expression")
+                right, position = self.evaluate(tokens, position + 1, 0)
+                value = middle if value else right
+                continue
+            if token.type not in BINARY_OPERATORS:
+                break
+            precedence, operator = BINARY_OPERATORS[token.type]
+            if precedence < min_precedence:
+                break
+            right, position = self.evaluate(tokens, position + 1, precedence + 1)
+            value = operator(value, right)
+        return value, position
+
+    def evaluate_factor(self, tokens, position: int) -> tuple[int, int]:
+        if position >= len(tokens):
+            raise Exception("Unexpected end of #if expression")
+        token = tokens[position]
+        if token.type == "CONSTANT":
+            return int(token.value), position + 1
+        if token.type in UNARY_OPERATORS:
+            value, position = self.evaluate_factor(tokens, position + 1)
+            return UNARY_OPERATORS[token.type](value), position
+        if token.type == "OPEN_PAREN":
+            value, position = self.evaluate(tokens, position + 1, 0)
+            if position >= len(tokens) or tokens[position].type != "CLOSE_PAREN":
+                raise Exception("Expected ) in #if expression")
+            return value, position + 1
+        raise Exception(f"Unexpected {token.value} in #if expression")
+
+    def expand(
+        self, text: str, disabled: frozenset = frozenset(), continued: bool = False
+    ) -> str:
+        # macros are not expanded again inside their own expansion. When the text is
+        # continued by more lines, a call running off its end raises
+        # UnterminatedArguments so it can be expanded with the next line added.
+        if not self.macros:
+            return text
+        output = []
+        pos = 0
+        while (match := WORD_REGEX.search(text, pos)) is not None:
+            name = match.group()
+            output.append(text[pos : match.start()])
+            pos = match.end()
+            macro = self.macros.get(name)
+            if macro is None or name in disabled:
+                output.append(name)
+                continue
+
+            body = macro.body
+            args = []
+            if macro.params is not None:
+                arguments = self.arguments(text, pos, continued)
+                if arguments is None:
+                    output.append(name)  # function-like macro name without a call
+                    continue
+                args, pos = arguments
+                if args == [""] and not macro.params:
+                    args = []
+                if len(args) != len(macro.params):
+                    raise Exception(
+                        f"Macro {name} expects {len(macro.params)} arguments, got {len(args)}"
+                    )
+            if macro.operators:
+                body = self.substitute(macro, args, disabled)
+            elif args:
+                expanded = {
+                    param: self.expand(arg.strip(), disabled)
+                    for param, arg in zip(macro.params, args)
+                }
+                body = WORD_REGEX.sub(
+                    lambda word: expanded.get(word.group(), word.group()), body
+                )
+            output.append(self.expand(body, disabled | {name}))
+
+        output.append(text[pos:])
+        return "".join(output)
+
+    def substitute(self, macro: Macro, args: list[str], disabled: frozenset) -> str:
+        """The body with # and ## applied and the parameters replaced.
+
+        A parameter next to ## is replaced by its argument as written, one after #
+        by the argument as a string literal, and any other by the expanded argument.
+        """
+        params = dict(zip(macro.params or [], args))
+        tokens = macro.tokens
+        pieces = []  # text, and None for each ##
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            index += 1
+            if token == "##":
+                while pieces and pieces[-1] is not None and pieces[-1].isspace():
+                    pieces.pop()
+                pieces.append(None)
+                while index < len(tokens) and tokens[index].isspace():
+                    index += 1
+            elif token == "#" and macro.params is not None:
+                while tokens[index].isspace():
+                    index += 1
+                pieces.append(stringize(params[tokens[index]]))
+                index += 1
+            elif token == "#":
+                raise Exception(f"Stray '#' in the expansion of macro {macro.name}")
+            elif token in params:
+                following = index
+                while following < len(tokens) and tokens[following].isspace():
+                    following += 1
+                argument = params[token].strip()
+                if (pieces and pieces[-1] is None) or tokens[
+                    following : following + 1
+                ] == ["##"]:
+                    pieces.append(argument)
+                else:
+                    pieces.append(self.expand(argument, disabled))
+            else:
+                pieces.append(token)
+
+        # each ## joins the text either side of it
+        output = []
+        paste = False
+        for piece in pieces:
+            if piece is None:
+                paste = True
+            elif paste:
+                output[-1] += piece
+                paste = False
+            else:
+                output.append(piece)
+        return "".join(output)
+
+    def arguments(
+        self, text: str, pos: int, continued: bool = False
+    ) -> tuple[list[str], int] | None:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos == len(text) and continued:
+            raise UnterminatedArguments()  # the ( could be on the next line
+        if pos == len(text) or text[pos] != "(":
+            return None
+
+        args = []
+        depth = 0
+        start = pos + 1
+        for index in range(pos, len(text)):
+            char = text[index]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    args.append(text[start:index])
+                    return args, index + 1
+            elif char == "," and depth == 1:
+                args.append(text[start:index])
+                start = index + 1
+        if continued:
+            raise UnterminatedArguments()
+        raise Exception("Unterminated macro argument list")
+
+
+def stringize(argument: str) -> str:
+    # whitespace between tokens becomes one space, and " and \ in string and
+    # character literals are escaped
+    pieces = []
+    for token in BODY_REGEX.findall(argument.strip()):
+        if token.isspace():
+            pieces.append(" ")
+        elif token[0] in "\"'":
+            pieces.append(token.replace("\\", "\\\\").replace('"', '\\"'))
+        else:
+            pieces.append(token)
+    return '"' + "".join(pieces) + '"'
@@ -1,6 +1,8 @@
 from parser.ParserConstructs import *
-from collections import defaultdict
-import copy
+from parser.FlatAST import serialize
+
+from Visitor import Visitor, run_recursive, run_iterative
+from Identifier import Identifier, intern
 
 
 class SymbolType:
@@ -38,14 +40,84 @@ class FunctionSymbolType(SymbolType):
         )
 
 
+class ScopeChain:
+    """Identifier map over nested scopes, each name maps to its innermost entry.
+
+    Every name keeps a stack of its entries, innermost last, and every open scope
+    the set of names it declared, so entering, leaving and looking up cost the same
+    however deep the nesting goes.
+    """
+
+    def __init__(self) -> None:
+        self.entries = {}  # name -> entries, innermost last
+        self.scopes = [set()]  # names declared in each open scope, global first
+
+    def enter(self) -> None:
+        self.scopes.append(set())
+
+    def exit(self) -> None:
+        for name in self.scopes.pop():
+            entries = self.entries[name]
+            entries.pop()
+            if not entries:
+                del self.entries[name]
+
+    def is_global(self, name: str) -> bool:
+        return name in self.scopes[0]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __getitem__(self, name: str) -> dict:
+        return self.entries[name][-1]
+
+    def get(self, name: str, default=None):
+        entries = self.entries.get(name)
+        return entries[-1] if entries else default
+
+    def __setitem__(self, name: str, entry: dict) -> None:
+        # declares it in the innermost scope, replacing that scope's own entry
+        scope = self.scopes[-1]
+        if name in scope:
+            self.entries[name][-1] = entry
+        else:
+            scope.add(name)
+            self.entries.setdefault(name, []).append(entry)
+
+
+class FunctionResult:
+    # a checked top level function, the state of the global names it looked up
+    # and the symbols it added
+    def __init__(self, function, dependencies: dict, symbols: dict):
+        self.function = function
+        self.dependencies = dependencies
+        self.symbols = symbols
+
+
 class SemanticAnalysis:
-    def __init__(self):
+    def __init__(self, incremental: bool = False, iterative: bool = False):
         self.scope_level = 0
-        self.identifier_map = defaultdict(dict)
+        # an entry is declared in the current scope when its scope id is scope_id
+        self.identifier_map = ScopeChain()
         self.identifier_map_stack = []
+        self.scope_id = 0
+        self.scope_count = 0
         self.previous_identifier_map = {}
         self.symbol_table = {}
         self.semantic_analysis_within_function = False
+        self.control_flow_count = 0
+
+        # with incremental set, parse can be called again with the edited program
+        # and only rechecks the functions that changed, or that look up a global
+        # name whose declaration changed
+        self.incremental = incremental
+        self.results = {}  # serialized function -> FunctionResults
+        self.checked = []  # functions checked (not reused) by the last parse
+        self.dependencies = None
+        self.symbols = None
+
+        # statements are walked by generators, see Visitor.run_recursive
+        self.run = run_iterative if iterative else run_recursive
 
         self.label_declarations = (
             []
@@ -57,351 +129,584 @@ class SemanticAnalysis:
     def enter_scope(self):
         # Create a new scope
         self.scope_level += 1
-        # self.previous_identifier_map = copy.deepcopy(self.identifier_map)
-        self.identifier_map_stack.append(copy.deepcopy(self.identifier_map))
-        for identifier in self.identifier_map:
-            self.identifier_map[identifier]["from_current_scope"] = False
+        self.identifier_map_stack.append(self.scope_id)
+        self.identifier_map.enter()
+        self.scope_id = self.new_scope_id()
 
     def exit_scope(self):
         # Remove the current scope
 
         if self.scope_level > 0:
             self.scope_level -= 1
-            self.identifier_map = copy.deepcopy(self.identifier_map_stack.pop())
+            self.identifier_map.exit()
+            self.scope_id = self.identifier_map_stack.pop()
         else:
             raise Exception("No scope to exit.")
 
-    def make_temporary_variable(self, identifier: str) -> str:
-        if identifier in self.identifier_map:
-            if (
-                self.identifier_map[identifier]["from_current_scope"]
-                and not self.identifier_map[identifier]["has_linkage"]
-            ):
-                raise Exception(
-                    f"Variable '{identifier}' already declared in this scope."
-                )
+    def new_scope_id(self) -> int:
+        self.scope_count += 1
+        return self.scope_count
+
+    def current_scope_entry(self, identifier: str) -> dict | None:
+        entry = self.identifier_map.get(identifier)
+        if entry is not None and entry["scope"] == self.scope_id:
+            return entry
+        return None
+
+    def declare(self, identifier: str, new_name: str, has_linkage: bool) -> None:
+        self.identifier_map[identifier] = {
+            "new_name": new_name,
+            "scope": self.scope_id,
+            "has_linkage": has_linkage,
+        }
+
+    def make_temporary_variable(self, identifier: str) -> Identifier:
+        prev_entry = self.current_scope_entry(identifier)
+        if prev_entry and not prev_entry["has_linkage"]:
+            raise Exception(f"Variable '{identifier}' already declared in this scope.")
 
         # Create unique name
-        unique_name = f"{identifier}.{self.scope_level-1}"
+        unique_name = intern(f"{identifier}.{self.scope_level-1}")
 
         # Add to current scope
-        self.identifier_map[identifier]["new_name"] = unique_name
-        self.identifier_map[identifier]["from_current_scope"] = True
-        self.identifier_map[identifier]["has_linkage"] = False
+        self.declare(identifier, unique_name, False)
 
         return unique_name
 
     def get_temporary_identifier(self, identifier: str) -> str:
         if identifier in self.identifier_map:
-            return self.identifier_map[identifier]["new_name"]
+            entry = self.identifier_map[identifier]
+            if entry["has_linkage"]:
+                self.depend(identifier)
+            return entry["new_name"]
 
         raise Exception(f"Variable '{identifier}' not found in any scope.")
 
     def parse(self, ast: ProgramNode) -> ProgramNode:
-        ast = self.semantic_analysis_parse(ast)
-        self.typecheck_parse(ast)
+        # identifiers, types, labels and control flow are all resolved in one walk
+        self.control_flow_stack = []
 
-        if self.label_declarations:
-            if len(list(set(self.label_declarations))) != len(self.label_declarations):
-                raise Exception(f"Duplicate label name in '{self.label_declarations}'")
+        self.current_switch_case_targets = (
+            []
+        )  # List of case labels for the current switch
+        self.current_switch_default_target = False
+        self.switch_depth = (
+            0  # Track the depth of nested switches, used to ensure case within a switch
+        )
+        self.switch_case_values = (
+            {}
+        )  # Track case values for each switch, used to ensure no duplicates
 
-        # Check for label calls
-        if self.label_calls:  # check if there are any label calls
-            if not bool(set(self.label_declarations) & set(self.label_calls)):
-                raise Exception(
-                    f"Label name '{set(self.label_declarations) & set(self.label_calls)}' not declared."
-                )
+        if not self.incremental:
+            for i, function in enumerate(ast.functions):  # functions
+                ast.functions[i] = self.resolve_declaration(function, typecheck=True)
+            return ast, self.symbol_table
 
-        ast = self.resolve_control_flow(ast)
+        # a rerun starts from an empty global scope, and keeps counting control flow
+        # labels so the ones it makes can't clash with those of reused functions
+        self.scope_level = 0
+        self.identifier_map = ScopeChain()
+        self.identifier_map_stack = []
+        self.symbol_table = {}
+        self.semantic_analysis_within_function = False
+        self.checked = []
+        results = {}
+        for i, function in enumerate(ast.functions):
+            ast.functions[i] = self.check_function(function, results)
+        # only replaced once the whole program checks, an error keeps the last results
+        self.results = results
 
         return ast, self.symbol_table
 
-    def typecheck_parse(self, ast: ProgramNode) -> ProgramNode:
-        for i, function in enumerate(ast.functions):
-            function = self.typecheck_function_declaration(function)
-        return ast
+    def check_function(self, function: FunctionDeclarationNode, results: dict):
+        key = serialize(ProgramNode([function]))
+        for result in self.results.get(key, ()):
+            if all(
+                self.global_symbol(name) == seen
+                for name, seen in result.dependencies.items()
+            ):
+                # same effect on the global state as resolving it again
+                self.symbol_table.update(result.symbols)
+                self.scope_id = self.new_scope_id()
+                self.declare(function.identifier, intern(function.identifier), True)
+                break
+        else:
+            self.dependencies = {}
+            self.symbols = {}
+            try:
+                function = self.resolve_declaration(function, typecheck=True)
+                result = FunctionResult(function, self.dependencies, self.symbols)
+            finally:
+                self.dependencies = self.symbols = None
+            self.checked.append(function.identifier)
+
+        results.setdefault(key, []).append(result)
+        return result.function
+
+    def global_symbol(self, name: str) -> tuple:
+        # what a function sees of a global name: its type and whether it's in scope
+        return self.symbol_table.get(intern(name)), self.identifier_map.is_global(name)
+
+    def depend(self, name: str) -> None:
+        if self.dependencies is not None and name not in self.dependencies:
+            self.dependencies[name] = self.global_symbol(name)
+
+    def define_symbol(self, name: str, symbol_type: SymbolType) -> None:
+        self.symbol_table[name] = symbol_type
+        if self.symbols is not None:
+            self.symbols[name] = symbol_type
+
+    def validate_labels(self):
+        if self.label_declarations:
+            if len(set(self.label_declarations)) != len(self.label_declarations):
+                raise Exception(f"Duplicate label name in '{self.label_declarations}'")
 
-    def semantic_analysis_parse(self, ast: ProgramNode) -> ProgramNode:
-        for i, function in enumerate(ast.functions):  # functions
-            ast.functions[i] = self.resolve_declaration(function)
-            # self.semantic_analysis_parse_block(function.body)
-        return ast
+        # Check for label calls
+        undeclared = set(self.label_calls).difference(self.label_declarations)
+        if undeclared:
+            raise Exception(f"Label name '{undeclared}' not declared.")
 
     def semantic_analysis_parse_block(
-        self, block: BlockNode, force_current_block: bool = False
+        self, block: BlockNode, typecheck: bool, force_current_block: bool = False
     ) -> BlockNode:
         if not force_current_block:
             self.enter_scope()
         for i, item in enumerate(block.children):
             if isinstance(item, BlockItemNode):
-                block.children[i] = self.semantic_analysis_parse_block_item(item)
+                block.children[i] = yield self.semantic_analysis_parse_block_item(
+                    item, typecheck
+                )
             else:
-                raise Exception(f"Unknown block type: {type(item)}")
+                block.children[i] = yield self.resolve_block_content(item, typecheck)
         if not force_current_block:
             self.exit_scope()
         return block
 
     def semantic_analysis_parse_block_item(
-        self, block_item: BlockItemNode
+        self, block_item: BlockItemNode, typecheck: bool
     ) -> BlockItemNode:
-        content = block_item.child
+        block_item.child = yield self.resolve_block_content(block_item.child, typecheck)
+        return block_item
+
+    def resolve_block_content(self, content, typecheck: bool):
         if isinstance(content, DeclarationNode):
-            block_item = self.resolve_declaration(content)
+            return self.resolve_declaration(content, typecheck)
         elif isinstance(content, Statement):
-            block_item = self.resolve_statement(content)
+            return self.resolve_statement(content, typecheck)
         elif isinstance(content, ExpressionNode):
-            block_item = self.resolve_expression(content)
+            content = self.resolve_expression(content)
+            if typecheck:
+                self.typecheck_exp(content)
+            return content
         elif isinstance(content, BlockNode):
-            block_item = self.semantic_analysis_parse_block(content)
+            return self.semantic_analysis_parse_block(content, typecheck)
         elif content is None:
-            block_item = None
+            return None
         else:
             raise Exception(f"Unknown block item type {content}.")
 
-        return BlockItemNode(block_item)
-
     def resolve_function_parameter(self, declaration: str):
         declaration = self.make_temporary_variable(declaration)
         return declaration
 
-    def resolve_declaration(self, declaration: DeclarationNode) -> DeclarationNode:
+    def resolve_declaration(
+        self, declaration: DeclarationNode, typecheck: bool = False
+    ) -> DeclarationNode:
 
         if isinstance(declaration, FunctionDeclarationNode):
 
-            # Reset the label declarations as can't goto a label defined in a separate function
-            self.label_declarations = []
-            self.label_calls = []
-
             self.enter_scope()
-            if declaration.identifier in self.identifier_map:
-                prev_entry = self.identifier_map[declaration.identifier]
-                if prev_entry["from_current_scope"] and (not prev_entry["has_linkage"]):
-                    raise Exception("Duplicate Declaration")
-
-            self.identifier_map[declaration.identifier][
-                "new_name"
-            ] = declaration.identifier
-            self.identifier_map[declaration.identifier]["from_current_scope"] = True
-            self.identifier_map[declaration.identifier]["has_linkage"] = True
-
-            inner_map = copy.deepcopy(self.identifier_map)
+            prev_entry = self.current_scope_entry(declaration.identifier)
+            if prev_entry and not prev_entry["has_linkage"]:
+                raise Exception("Duplicate Declaration")
+            self.depend(declaration.identifier)
+
+            self.declare(declaration.identifier, intern(declaration.identifier), True)
+            entry = self.identifier_map[declaration.identifier]
+
             new_params = []
             for param in declaration.params:
                 new_params.append(self.resolve_function_parameter(param))
 
-            new_body = None
-            if declaration.body is not None:
-                if self.semantic_analysis_within_function:
-                    raise Exception(
-                        "Function declaration inside another function is not allowed."
-                    )
+            body = declaration.body
+            if body is not None and self.semantic_analysis_within_function:
+                raise Exception(
+                    "Function declaration inside another function is not allowed."
+                )
+
+            function = FunctionDeclarationNode(entry["new_name"], new_params, body)
+            if typecheck:
+                self.typecheck_function_declaration(function)
+
+            if body is not None:
+                # Labels are per function, can't goto a label defined in another one
+                self.label_declarations = []
+                self.label_calls = []
+
                 self.semantic_analysis_within_function = True
                 self.current_function = declaration.identifier
 
-                new_body = self.semantic_analysis_parse_block(
-                    declaration.body, force_current_block=True
+                function.body = self.run(
+                    self.semantic_analysis_parse_block(
+                        body, typecheck, force_current_block=True
+                    )
                 )
                 self.semantic_analysis_within_function = False
+                self.validate_labels()
 
             self.exit_scope()
 
-            self.identifier_map = inner_map
+            # the function stays visible in the enclosing scope, as the only name
+            # declared in it so far
+            self.scope_id = entry["scope"] = self.new_scope_id()
+            self.identifier_map[declaration.identifier] = entry
 
-            return FunctionDeclarationNode(
-                self.identifier_map[declaration.identifier]["new_name"],
-                new_params,
-                new_body,
-            )
+            return function
 
         elif isinstance(declaration, VariableDeclarationNode):
 
-            if declaration.identifier in self.identifier_map:
-                prev_entry = self.identifier_map[declaration.identifier]
-                if prev_entry["from_current_scope"] and prev_entry["has_linkage"]:
-                    raise Exception(
-                        "It's illegal to declare an identifier with external linkage and no linkage in the same scope"
-                    )
+            prev_entry = self.current_scope_entry(declaration.identifier)
+            if prev_entry and prev_entry["has_linkage"]:
+                raise Exception(
+                    "It's illegal to declare an identifier with external linkage and no linkage in the same scope"
+                )
 
             declaration.identifier = self.make_temporary_variable(
                 declaration.identifier
             )
             if declaration.exp:
                 declaration.exp = self.resolve_expression(declaration.exp)
+            if typecheck:
+                self.typecheck_variable_declaration(declaration)
 
             return declaration
         else:
             raise Exception(f"Unknown declaration type {type(declaration)}.")
 
-    def resolve_statement(self, statement: Statement) -> Statement:
-        if statement is None:
-            return None
-        elif isinstance(statement, ReturnNode):
-            statement.exp = self.resolve_expression(statement.exp)
-            return statement
-        elif isinstance(statement, IfNode):
-            statement.condition = self.resolve_expression(statement.condition)
-            statement.then = self.resolve_statement(statement.then)
-            if statement.else_:
-                statement.else_ = self.resolve_statement(statement.else_)
-
-            return statement
-        elif isinstance(statement, WhileNode):
-            statement.condition = self.resolve_expression(statement.condition)
-            statement.body = self.resolve_statement(statement.body)
-            return statement
-        elif isinstance(statement, DoWhileNode):
-            statement.body = self.resolve_statement(statement.body)
-            statement.condition = self.resolve_expression(statement.condition)
-            return statement
-        elif isinstance(statement, ForNode):
-            self.enter_scope()
-            init = None
-            if statement.init:
-                init = self._resolve_for_init(statement.init)
-            condition = None
-            if statement.condition:
-                condition = self.resolve_expression(statement.condition)
-            post = None
-            if statement.post:
-                post = self.resolve_expression(statement.post)
-            body = self.resolve_statement(statement.body)
-            self.exit_scope()
-            return ForNode(body, init, condition, post)
-        elif isinstance(statement, ConditionalNode):
-            statement.condition = self.resolve_expression(statement.condition)
-            statement.then = self.resolve_statement(statement.then)
-            statement.else_ = self.resolve_statement(statement.else_)
-            return statement
-        elif isinstance(statement, BlockNode):
-            statement = self.semantic_analysis_parse_block(statement)
-            return statement
-        elif isinstance(statement, LabeledStatementNode):
-            label = statement.label + f"_F{self.current_function}"
-            if statement.label in self.label_declarations:
-                raise Exception(f"Label '{statement.label}' already called.")
-            self.label_declarations.append(
-                statement.label + f"_F{self.current_function}"
-            )
-            return LabeledStatementNode(
-                label,
-                self.resolve_statement(statement.child),
-            )
-        elif isinstance(statement, GotoNode):
-            self.label_calls.append(statement.label + f"_F{self.current_function}")
-            return GotoNode(statement.label + f"_F{self.current_function}")
-        elif isinstance(statement, ExpressionNode):
-            statement = self.resolve_expression(statement)
-            return statement
-        elif isinstance(statement, BreakNode):
-            return BreakNode()
-        elif isinstance(statement, ContinueNode):
-            return ContinueNode()
-        elif isinstance(statement, SwitchNode):
-            statement.condition = self.resolve_expression(statement.condition)
-            statement.body = self.resolve_statement(statement.body)
-            return statement
-        elif isinstance(statement, CaseNode):
-            if not isinstance(statement.condition, ConstantNode):
-                raise Exception("Case condition must be a constant value")
-            statement.condition = self.resolve_expression(statement.condition)
-            for i, body in enumerate(statement.body):
-                if isinstance(body, BlockItemNode):
-                    body = body.child
-                if isinstance(body, DeclarationNode):
-                    statement.body[i] = self.resolve_declaration(body)
-                else:
-                    statement.body[i] = self.resolve_statement(body)
-            return statement
-        elif isinstance(statement, DefaultNode):
-            if self.label_calls.count(statement.label) > 1:
-                raise Exception("Multiple default statements in switch")
-            for i, body in enumerate(statement.body):
-                statement.body[i] = self.resolve_statement(body)
-            return statement
-        elif isinstance(statement.child, DeclarationNode):
+    @Visitor
+    def resolve_statement(self, statement: Statement, typecheck: bool):
+        # typecheck is whether the statement's expressions are typechecked, which
+        # reaches into the substatements of control statements only. Statements
+        # that nest are generators yielding the walk of each substatement
+        if isinstance(statement.child, DeclarationNode):
             statement.child = self.resolve_declaration(statement.child)
+        return statement
 
+    @resolve_statement.register(ReturnNode)
+    def resolve_return(self, statement: Statement, typecheck: bool):
+        statement.exp = self.resolve_expression(statement.exp)
+        if typecheck:
+            self.typecheck_exp(statement.exp)
         return statement
 
-    def resolve_expression(self, expression: ExpressionNode) -> ExpressionNode:
-        if expression is None:
-            return None
-        elif isinstance(expression, ConstantNode):
-            return expression
-        elif isinstance(expression, VarNode):
-            return VarNode(self.get_temporary_identifier(expression.identifier))
-        elif isinstance(expression, AssignmentNode):
-            if not isinstance(expression.lvalue, VarNode):
-                raise Exception("Left side of assignment must be a variable.")
-            expression.lvalue = self.resolve_expression(expression.lvalue)
-            expression.rvalue = self.resolve_expression(expression.rvalue)
-            return expression
-        elif isinstance(expression, BinaryNode):
-            expression.exp_1 = self.resolve_expression(expression.exp_1)
-            expression.exp_2 = self.resolve_expression(expression.exp_2)
-            return expression
-        elif isinstance(expression, UnaryNode):
-            child = self.resolve_expression(expression.exp)
-
-            if isinstance(child, UnaryNode) and isinstance(expression, UnaryNode):
-                if expression.operator in [
-                    UnaryOperatorNode.INCREMENT,
-                    UnaryOperatorNode.DECREMENT,
-                ] and child.operator in [
-                    UnaryOperatorNode.INCREMENT,
-                    UnaryOperatorNode.DECREMENT,
-                ]:
-                    raise Exception(
-                        "Increment/Decrement operator cannot be used on itself."
-                    )
-            if isinstance(child, AssignmentNode) and isinstance(
-                expression.operator, UnaryOperatorNode
-            ):
-                raise Exception("Unary operator cannot be used on assignment.")
-            if isinstance(
-                child, (ConstantNode, BinaryNode, FunctionCallNode)
-            ) and isinstance(expression, UnaryNode):
-                if expression.operator in [
-                    UnaryOperatorNode.INCREMENT,
-                    UnaryOperatorNode.DECREMENT,
-                ]:
-                    raise Exception(
-                        "Unary operator cannot be used on constant or binary node."
-                    )
-            return UnaryNode(child, expression.operator, expression.postfix)
-        elif isinstance(expression, ConditionalNode):
-            expression.condition = self.resolve_expression(expression.condition)
-            expression.then = self.resolve_expression(expression.then)
-            expression.else_ = self.resolve_expression(expression.else_)
-            return expression
-
-        elif isinstance(expression, FunctionCallNode):
-
-            if expression.identifier in self.identifier_map:
-                new_fun_name = self.identifier_map[expression.identifier]["new_name"]
-                new_args = []
-                for arg in expression.arguments:
-                    new_args.append(self.resolve_expression(arg))
-                return FunctionCallNode(new_fun_name, new_args)
+    @resolve_statement.register(IfNode)
+    def resolve_if(self, statement: Statement, typecheck: bool):
+        statement.condition = self.resolve_expression(statement.condition)
+        if typecheck:
+            self.typecheck_exp(statement.condition)
+        statement.then = yield self.resolve_statement(statement.then, typecheck)
+        if statement.else_:
+            statement.else_ = yield self.resolve_statement(statement.else_, typecheck)
+
+        return statement
+
+    @resolve_statement.register(WhileNode)
+    def resolve_while(self, statement: Statement, typecheck: bool):
+        statement.condition = self.resolve_expression(statement.condition)
+        if typecheck:
+            self.typecheck_exp(statement.condition)
+        label = self.enter_loop("_WHILE_LOOP_")
+        statement.body = yield self.resolve_statement(statement.body, typecheck)
+        statement.label = label
+        self.control_flow_stack.pop()
+        return statement
+
+    @resolve_statement.register(DoWhileNode)
+    def resolve_do_while(self, statement: Statement, typecheck: bool):
+        label = self.enter_loop("_DO_WHILE_")
+        statement.body = yield self.resolve_statement(statement.body, typecheck)
+        statement.label = label
+        self.control_flow_stack.pop()
+        statement.condition = self.resolve_expression(statement.condition)
+        if typecheck:
+            self.typecheck_exp(statement.condition)
+        return statement
+
+    @resolve_statement.register(ForNode)
+    def resolve_for(self, statement: Statement, typecheck: bool):
+        self.enter_scope()
+        init = None
+        if statement.init:
+            init = self._resolve_for_init(statement.init, typecheck)
+        condition = None
+        if statement.condition:
+            condition = self.resolve_expression(statement.condition)
+            if typecheck:
+                self.typecheck_exp(condition)
+        post = None
+        if statement.post:
+            post = self.resolve_expression(statement.post)
+            if typecheck:
+                self.typecheck_exp(post)
+        label = self.enter_loop("_FOR_LOOP_")
+        body = yield self.resolve_statement(statement.body, typecheck)
+        self.control_flow_stack.pop()
+        self.exit_scope()
+        statement = ForNode(body, init, condition, post)
+        statement.label = label
+        return statement
+
+    @resolve_statement.register(ConditionalNode)
+    def resolve_conditional_statement(self, statement: Statement, typecheck: bool):
+        statement.condition = self.resolve_expression(statement.condition)
+        statement.then = yield self.resolve_statement(statement.then, False)
+        statement.else_ = yield self.resolve_statement(statement.else_, False)
+        return statement
+
+    @resolve_statement.register(BlockNode)
+    def resolve_block_statement(self, statement: Statement, typecheck: bool):
+        return self.semantic_analysis_parse_block(statement, False)
+
+    @resolve_statement.register(LabeledStatementNode)
+    def resolve_labeled_statement(self, statement: Statement, typecheck: bool):
+        label = statement.label + f"_F{self.current_function}"
+        if statement.label in self.label_declarations:
+            raise Exception(f"Label '{statement.label}' already called.")
+        self.label_declarations.append(statement.label + f"_F{self.current_function}")
+        child = yield self.resolve_statement(statement.child, False)
+        return LabeledStatementNode(label, child)
+
+    @resolve_statement.register(GotoNode)
+    def resolve_goto(self, statement: Statement, typecheck: bool):
+        self.label_calls.append(statement.label + f"_F{self.current_function}")
+        return GotoNode(statement.label + f"_F{self.current_function}")
+
+    @resolve_statement.register(ExpressionNode)
+    def resolve_expression_statement(self, statement: Statement, typecheck: bool):
+        statement = self.resolve_expression(statement)
+        return statement
+
+    @resolve_statement.register(BreakNode)
+    def resolve_break(self, statement: Statement, typecheck: bool):
+        # Find the nearest enclosing structure of any type (loop or switch)
+        if not self.control_flow_stack:
+            raise Exception("Break statement not within loop or switch")
+
+        # Get label of nearest enclosing structure
+        structure_type, label = self.control_flow_stack[-1]
+        statement = BreakNode()
+        statement.label = label
+        statement.target_type = structure_type  # Store the type for code generation
+        return statement
+
+    @resolve_statement.register(ContinueNode)
+    def resolve_continue(self, statement: Statement, typecheck: bool):
+        # Continue can only target loops, not switches
+        # Find the nearest enclosing loop
+        loop_context = next(
+            (ctx for ctx in reversed(self.control_flow_stack) if ctx[0] == "loop"),
+            None,
+        )
+
+        if not loop_context:
+            raise Exception("Continue statement not within loop")
+
+        # Get label of nearest enclosing loop
+        _, label = loop_context
+        statement = ContinueNode()
+        statement.label = label
+        return statement
+
+    @resolve_statement.register(SwitchNode)
+    def resolve_switch(self, statement: Statement, typecheck: bool):
+        # Entering switch
+        switch_label = f"_SWITCH_{self.control_flow_count}"
+        self.control_flow_count += 1
+        self.control_flow_stack.append(("switch", switch_label))
+
+        self.current_switch_case_targets.append([])
+        self.switch_depth += 1
+        self.switch_case_values[self.switch_depth - 1] = []
+
+        statement.condition = self.resolve_expression(statement.condition)
+        if typecheck:
+            self.typecheck_exp(statement.condition)
+        statement.body = yield self.resolve_statement(statement.body, typecheck)
+
+        # add the current switch case targets and default target
+        statement.case_targets = self.current_switch_case_targets[-1]
+        if self.current_switch_default_target:
+            statement.default_target = self.current_switch_default_target
+
+        # Clear the case values for this switch level
+        self.current_switch_case_targets.pop()
+        self.current_switch_default_target = None
+        self.switch_depth -= 1
+        self.switch_case_values[self.switch_depth - 1] = []
+
+        # Assign label and pop from stack
+        statement.label = switch_label
+        self.control_flow_stack.pop()
+        return statement
+
+    @resolve_statement.register(CaseNode)
+    def resolve_case(self, statement: Statement, typecheck: bool):
+        if not isinstance(statement.condition, ConstantNode):
+            raise Exception("Case condition must be a constant value")
+        if self.switch_depth == 0:
+            raise Exception("Case statement not within a switch statement")
+
+        # For constant values, check for duplicates
+        value = statement.condition.value
+        if value in self.switch_case_values[self.switch_depth - 1]:
+            raise Exception(f"Duplicate case value: {value}")
+        # Record this case value for the current switch
+        self.switch_case_values[self.switch_depth - 1].append(value)
+
+        statement.condition = self.resolve_expression(statement.condition)
+        for i, body in enumerate(statement.body):
+            if isinstance(body, BlockItemNode):
+                body = body.child
+            if isinstance(body, DeclarationNode):
+                statement.body[i] = self.resolve_declaration(body)
+                if typecheck:
+                    self.typecheck_variable_declaration(statement.body[i])
             else:
-                raise Exception("Undeclared Function")
+                statement.body[i] = yield self.resolve_statement(body, typecheck)
+
+        # Create a unique label for this case
+        case_label = f"_CASE_{self.control_flow_count}"
+        self.control_flow_count += 1
+        statement.label = case_label
 
+        self.current_switch_case_targets[-1].append(case_label)
+        return statement
+
+    @resolve_statement.register(DefaultNode)
+    def resolve_default(self, statement: Statement, typecheck: bool):
+        if self.label_calls.count(statement.label) > 1:
+            raise Exception("Multiple default statements in switch")
+        if self.switch_depth == 0:
+            raise Exception("Default statement not within a switch statement")
+
+        if self.current_switch_default_target:
+            raise Exception("Multiple default statements in switch")
+
+        for i, body in enumerate(statement.body):
+            statement.body[i] = yield self.resolve_statement(body, typecheck)
+
+        # Create a unique label for this default
+        default_label = f"_DEFAULT_{self.control_flow_count}"
+        self.control_flow_count += 1
+        statement.label = default_label
+        self.current_switch_default_target = default_label
+        return statement
+
+    @resolve_statement.register(type(None))
+    def resolve_no_statement(self, statement: Statement, typecheck: bool):
+        return None
+
+    def enter_loop(self, prefix: str) -> str:
+        loop_label = f"{prefix}{self.control_flow_count}"
+        self.control_flow_count += 1
+        self.control_flow_stack.append(("loop", loop_label))
+        return loop_label
+
+    @Visitor
+    def resolve_expression(self, expression: ExpressionNode):
+        raise Exception(f"Unknown expression type {type(expression)}.")
+
+    @resolve_expression.register(ConstantNode)
+    def resolve_constant(self, expression: ExpressionNode):
+        return expression
+
+    @resolve_expression.register(VarNode)
+    def resolve_var(self, expression: ExpressionNode):
+        return VarNode(self.get_temporary_identifier(expression.identifier))
+
+    @resolve_expression.register(AssignmentNode)
+    def resolve_assignment(self, expression: ExpressionNode):
+        if not isinstance(expression.lvalue, VarNode):
+            raise Exception("Left side of assignment must be a variable.")
+        expression.lvalue = self.resolve_expression(expression.lvalue)
+        expression.rvalue = self.resolve_expression(expression.rvalue)
+        return expression
+
+    @resolve_expression.register(BinaryNode)
+    def resolve_binary(self, expression: ExpressionNode):
+        expression.exp_1 = self.resolve_expression(expression.exp_1)
+        expression.exp_2 = self.resolve_expression(expression.exp_2)
+        return expression
+
+    @resolve_expression.register(UnaryNode)
+    def resolve_unary(self, expression: ExpressionNode):
+        child = self.resolve_expression(expression.exp)
+
+        if isinstance(child, UnaryNode) and isinstance(expression, UnaryNode):
+            if expression.operator in [
+                UnaryOperatorNode.INCREMENT,
+                UnaryOperatorNode.DECREMENT,
+            ] and child.operator in [
+                UnaryOperatorNode.INCREMENT,
+                UnaryOperatorNode.DECREMENT,
+            ]:
+                raise Exception(
+                    "Increment/Decrement operator cannot be used on itself."
+                )
+        if isinstance(child, AssignmentNode) and isinstance(
+            expression.operator, UnaryOperatorNode
+        ):
+            raise Exception("Unary operator cannot be used on assignment.")
+        if isinstance(
+            child, (ConstantNode, BinaryNode, FunctionCallNode)
+        ) and isinstance(expression, UnaryNode):
+            if expression.operator in [
+                UnaryOperatorNode.INCREMENT,
+                UnaryOperatorNode.DECREMENT,
+            ]:
+                raise Exception(
+                    "Unary operator cannot be used on constant or binary node."
+                )
+        return UnaryNode(child, expression.operator, expression.postfix)
+
+    @resolve_expression.register(ConditionalNode)
+    def resolve_conditional(self, expression: ExpressionNode):
+        expression.condition = self.resolve_expression(expression.condition)
+        expression.then = self.resolve_expression(expression.then)
+        expression.else_ = self.resolve_expression(expression.else_)
+        return expression
+
+    @resolve_expression.register(FunctionCallNode)
+    def resolve_function_call(self, expression: ExpressionNode):
+        if expression.identifier in self.identifier_map:
+            entry = self.identifier_map[expression.identifier]
+            if entry["has_linkage"]:
+                self.depend(expression.identifier)
+            new_fun_name = entry["new_name"]
+            new_args = []
+            for arg in expression.arguments:
+                new_args.append(self.resolve_expression(arg))
+            return FunctionCallNode(new_fun_name, new_args)
         else:
-            raise Exception(f"Unknown expression type {type(expression)}.")
+            raise Exception("Undeclared Function")
+
+    @resolve_expression.register(type(None))
+    def resolve_no_expression(self, expression: ExpressionNode):
+        return None
 
     def _resolve_for_init(
-        self, init: InitDeclNode | InitExprNode
+        self, init: InitDeclNode | InitExprNode, typecheck: bool
     ) -> InitDeclNode | InitExprNode:
         if isinstance(init, InitDeclNode):
-            return InitDeclNode(
-                self.resolve_declaration(init.declaration),
-                init.label,
-            )
+            declaration = self.resolve_declaration(init.declaration)
+            if typecheck:
+                self.typecheck_variable_declaration(declaration)
+            return InitDeclNode(declaration, init.label)
         elif isinstance(init, InitExprNode):
-            return InitExprNode(
-                self.resolve_expression(init.expression),
-                init.label,
-            )
+            expression = self.resolve_expression(init.expression)
+            if typecheck:
+                self.typecheck_exp(expression)
+            return InitExprNode(expression, init.label)
         else:
             raise Exception(f"Unknown for loop initialization type {type(init)}.")
 
@@ -437,7 +742,7 @@ class SemanticAnalysis:
             pass
 
     def typecheck_variable_declaration(self, declaration: VariableDeclarationNode):
-        self.symbol_table[declaration.identifier] = IntSymbolType()
+        self.define_symbol(declaration.identifier, IntSymbolType())
         if declaration.exp:
             self.typecheck_exp(declaration.exp)
 
@@ -454,252 +759,11 @@ class SemanticAnalysis:
             already_defined = old_declaration.defined
             if already_defined and has_body:
                 raise Exception(f"Function '{declaration.identifier}' already defined.")
-        self.symbol_table[declaration.identifier] = FunctionSymbolType(
-            len(declaration.params), already_defined or has_body
+        self.define_symbol(
+            declaration.identifier,
+            FunctionSymbolType(len(declaration.params), already_defined or has_body),
         )
 
         if has_body:
             for param in declaration.params:
-                self.symbol_table[param] = IntSymbolType()
-            self.typecheck_block(declaration.body)
-
-    def typecheck_block(self, block: BlockNode):
-        for item in block.children:
-            if isinstance(item, BlockItemNode):
-                if isinstance(item.child, VariableDeclarationNode):
-                    self.typecheck_variable_declaration(item.child)
-                elif isinstance(item.child, FunctionDeclarationNode):
-                    self.typecheck_function_declaration(item.child)
-                elif isinstance(item.child, ExpressionNode):
-                    self.typecheck_exp(item.child)
-                elif isinstance(item.child, Statement):
-                    self.typecheck_statement(item.child)
-                elif isinstance(item.child, BlockNode):
-                    self.typecheck_block(item.child)
-            else:
-                raise Exception(f"Unknown block item type {item}.")
-
-    def typecheck_statement(self, statement: Statement):
-        if isinstance(statement, ReturnNode):
-            self.typecheck_exp(statement.exp)
-        elif isinstance(statement, IfNode):
-            self.typecheck_exp(statement.condition)
-            self.typecheck_statement(statement.then)
-            if statement.else_:
-                self.typecheck_statement(statement.else_)
-        elif isinstance(statement, WhileNode):
-            self.typecheck_exp(statement.condition)
-            self.typecheck_statement(statement.body)
-        elif isinstance(statement, DoWhileNode):
-            self.typecheck_statement(statement.body)
-            self.typecheck_exp(statement.condition)
-        elif isinstance(statement, ForNode):
-            if statement.init:
-                if isinstance(statement.init, InitDeclNode):
-                    self.typecheck_variable_declaration(statement.init.declaration)
-                elif isinstance(statement.init, InitExprNode):
-                    self.typecheck_exp(statement.init.expression)
-                else:
-                    raise Exception("For loop init must be a variable declaration")
-            if statement.condition:
-                self.typecheck_exp(statement.condition)
-            if statement.post:
-                self.typecheck_exp(statement.post)
-            self.typecheck_statement(statement.body)
-        elif isinstance(statement, SwitchNode):
-            self.typecheck_exp(statement.condition)
-            self.typecheck_statement(statement.body)
-        elif isinstance(statement, CaseNode):
-            for body in statement.body:
-                if isinstance(body, BlockItemNode):
-                    body = body.child
-                if isinstance(body, DeclarationNode):
-                    self.typecheck_variable_declaration(body)
-                else:
-                    self.typecheck_statement(body)
-        elif isinstance(statement, DefaultNode):
-            for body in statement.body:
-                if isinstance(body, BlockItemNode):
-                    body = body.child
-                if isinstance(body, DeclarationNode):
-                    self.typecheck_variable_declaration(body)
-                else:
-                    self.typecheck_statement(body)
-
-    ##################### CONTROL FLOW ########################
-    def resolve_control_flow(self, ast: ProgramNode) -> ProgramNode:
-        self.control_flow_count = 0
-        self.control_flow_stack = []
-
-        self.current_switch_case_targets = (
-            []
-        )  # List of case labels for the current switch
-        self.current_switch_default_target = False
-        self.switch_depth = (
-            0  # Track the depth of nested switches, used to ensure case within a switch
-        )
-        self.switch_case_values = (
-            {}
-        )  # Track case values for each switch, used to ensure no duplicates
-
-        # Start the recursive traversal
-        if isinstance(ast, ProgramNode):
-            for i, function in enumerate(ast.functions):
-                ast.functions[i] = self._resolve_control_flow_node(function)
-
-        return ast
-
-    def _resolve_control_flow_node(self, node):
-        if isinstance(node, FunctionDeclarationNode):
-            node.body = self._resolve_control_flow_node(node.body)
-
-        if isinstance(node, LabeledStatementNode):
-            # Process the child statement
-            node.child = self._resolve_control_flow_node(node.child)
-
-        elif isinstance(node, WhileNode):
-            loop_label = f"_WHILE_LOOP_{self.control_flow_count}"
-            self.control_flow_count += 1
-            self.control_flow_stack.append(("loop", loop_label))
-
-            node.body = self._resolve_control_flow_node(node.body)
-
-            node.label = loop_label
-            self.control_flow_stack.pop()
-
-        elif isinstance(node, ForNode):
-            loop_label = f"_FOR_LOOP_{self.control_flow_count}"
-            self.control_flow_count += 1
-            self.control_flow_stack.append(("loop", loop_label))
-
-            node.body = self._resolve_control_flow_node(node.body)
-            if node.init:
-                node.init = self._resolve_control_flow_node(node.init)
-
-            node.label = loop_label
-            self.control_flow_stack.pop()
-
-        elif isinstance(node, DoWhileNode):
-            loop_label = f"_DO_WHILE_{self.control_flow_count}"
-            self.control_flow_count += 1
-            self.control_flow_stack.append(("loop", loop_label))
-
-            node.body = self._resolve_control_flow_node(node.body)
-
-            node.label = loop_label
-            self.control_flow_stack.pop()
-
-        elif isinstance(node, BreakNode):
-            # Find the nearest enclosing structure of any type (loop or switch)
-            if not self.control_flow_stack:
-                raise Exception("Break statement not within loop or switch")
-
-            # Get label of nearest enclosing structure
-            structure_type, label = self.control_flow_stack[-1]
-            node.label = label
-            node.target_type = structure_type  # Store the type for code generation
-
-        elif isinstance(node, ContinueNode):
-            # Continue can only target loops, not switches
-            # Find the nearest enclosing loop
-            loop_context = next(
-                (ctx for ctx in reversed(self.control_flow_stack) if ctx[0] == "loop"),
-                None,
-            )
-
-            if not loop_context:
-                raise Exception("Continue statement not within loop")
-
-            # Get label of nearest enclosing loop
-            _, label = loop_context
-            node.label = label
-
-        elif isinstance(node, BlockNode):
-            for i, child in enumerate(node.children):
-                if isinstance(child, BlockItemNode):
-                    child.child = self._resolve_control_flow_node(child.child)
-                else:
-                    node.children[i] = self._resolve_control_flow_node(child)
-
-        elif isinstance(node, IfNode):
-            node.then = self._resolve_control_flow_node(node.then)
-            if node.else_:
-                node.else_ = self._resolve_control_flow_node(node.else_)
-
-        elif isinstance(node, BlockItemNode):
-            node.child = self._resolve_control_flow_node(node.child)
-
-        elif isinstance(node, CaseNode):
-
-            if self.switch_depth == 0:
-                raise Exception("Case statement not within a switch statement")
-
-            if not isinstance(node.condition, ConstantNode):
-                raise Exception("Case condition must be a constant value")
-
-            # For constant values, check for duplicates
-            if node.condition.value in self.switch_case_values[self.switch_depth - 1]:
-                raise Exception(f"Duplicate case value: {node.condition.value}")
-            # Record this case value for the current switch
-            self.switch_case_values[self.switch_depth - 1].append(node.condition.value)
-
-            # Just process the body, don't push onto the stack
-            for i, body in enumerate(node.body):
-                node.body[i] = self._resolve_control_flow_node(body)
-
-            # Create a unique label for this case
-            case_label = f"_CASE_{self.control_flow_count}"
-            self.control_flow_count += 1
-            node.label = case_label
-
-            self.current_switch_case_targets[-1].append(case_label)
-
-        elif isinstance(node, DefaultNode):
-
-            if self.switch_depth == 0:
-                raise Exception("Default statement not within a switch statement")
-
-            if self.current_switch_default_target:
-                raise Exception("Multiple default statements in switch")
-
-            # Just process the body, don't push onto the stack
-            for i, body in enumerate(node.body):
-                node.body[i] = self._resolve_control_flow_node(body)
-
-            # Create a unique label for this default
-            default_label = f"_DEFAULT_{self.control_flow_count}"
-            self.control_flow_count += 1
-            node.label = default_label
-            self.current_switch_default_target = default_label
-
-        elif isinstance(node, SwitchNode):
-            # Entering switch
-            switch_label = f"_SWITCH_{self.control_flow_count}"
-            self.control_flow_count += 1
-            self.control_flow_stack.append(("switch", switch_label))
-
-            self.current_switch_case_targets.append([])
-            self.switch_depth += 1
-            self.switch_case_values[self.switch_depth - 1] = []
-
-            node.condition = self._resolve_control_flow_node(node.condition)
-            node.body = self._resolve_control_flow_node(node.body)
-
-            # add the current switch case targets and default target
-            node.case_targets = self.current_switch_case_targets[-1]
-            if self.current_switch_default_target:
-                node.default_target = self.current_switch_default_target
-
-            # Clear the case values for this switch level
-            self.current_switch_case_targets = self.current_switch_case_targets[:-1]
-            self.current_switch_default_target = None
-            self.switch_depth -= 1
-            self.switch_case_values[self.switch_depth - 1] = []
-
-            # Assign label and pop from stack
-            node.label = switch_label
-            self.control_flow_stack.pop()
-
-            # raise Exception(f"Unknown node type {type(node)}.")
-
-        return node
+                self.define_symbol(param, IntSymbolType())
@@ -0,0 +1,103 @@
+from types import GeneratorType
+
+
+class DispatchTable(dict):
+    # node class -> handler, a class is looked up through its MRO when first seen
+    def __init__(self, handlers: dict, default) -> None:
+        self.handlers = handlers
+        self.default = default
+
+    def __missing__(self, node_class):
+        for base in node_class.__mro__:
+            if base in self.handlers:
+                handler = self.handlers[base]
+                break
+        else:
+            handler = self.default
+        self[node_class] = handler
+        return handler
+
+
+class Visitor:
+    """Method that calls the handler registered for its argument's class.
+
+    Used as a decorator on the walker's default handler, with the per class
+    handlers registered on it:
+
+        @Visitor
+        def emit_ir(self, node, instructions): ...
+
+        @emit_ir.register(ReturnNode)
+        def emit_return(self, node, instructions): ...
+
+    A node class without a handler of its own uses its nearest base class's, found
+    through the MRO the first time the class is seen and cached from then on, so
+    every later node costs one dict lookup instead of a chain of isinstance checks.
+    """
+
+    def __init__(self, default) -> None:
+        self.default = default
+        self.handlers = {}
+        self.table = DispatchTable(self.handlers, default)
+        self.__doc__ = default.__doc__
+
+    def register(self, *node_classes):
+        def decorator(handler):
+            for node_class in node_classes:
+                self.handlers[node_class] = handler
+            self.table.clear()
+            return handler
+
+        return decorator
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        table = self.table
+
+        def dispatch(node, *args):
+            return table[type(node)](instance, node, *args)
+
+        # kept on the instance, so later calls skip the descriptor
+        instance.__dict__[self.name] = dispatch
+        return dispatch
+
+
+# A walker that has to go down into nested nodes can be a generator that yields the
+# walk of each one (a generator, or the result straight away for a node that doesn't
+# nest) and gets its result sent back. These drive such a walk, either on Python's
+# stack or on an explicit one, which bounds the nesting depth by memory alone.
+
+
+def run_recursive(walk: GeneratorType):
+    value = None
+    while True:
+        try:
+            nested = walk.send(value)
+        except StopIteration as done:
+            return done.value
+        if type(nested) is GeneratorType:
+            value = run_recursive(nested)
+        else:
+            value = nested
+
+
+def run_iterative(walk: GeneratorType):
+    stack = [walk]
+    value = None
+    while stack:
+        try:
+            nested = stack[-1].send(value)
+        except StopIteration as done:
+            stack.pop()
+            value = done.value
+            continue
+        if type(nested) is GeneratorType:
+            stack.append(nested)
+            value = None
+        else:
+            value = nested
+    return value
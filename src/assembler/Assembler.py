@@ -2,6 +2,9 @@ from tacky.TackyConstructs import *
 from .AssemblerConstructs import *
 from collections import defaultdict
 
+from Visitor import Visitor
+from Identifier import Identifier
+
 ###########################################
 
 
@@ -12,29 +15,29 @@ class AssemblyParser:
 
         self.instructions = defaultdict(list)
         self.stack_tracker = defaultdict(dict)
+        self.lowest_slot = {}  # the deepest slot given out in each function
 
     def generate_stack_pntr(
-        self, pseudo_name: str, function_name: str = "", mem_size: int = 4
+        self, pseudo_name: Identifier, function_name: Identifier, mem_size: int = 4
     ) -> int:
-        if function_name not in self.stack_tracker.keys():
-            self.stack_tracker[function_name][pseudo_name] = (
-                self.get_function_stack_size(function_name, mem_size)
-            )  # if function name doesn't exist, neitgher will pseudoname
-            return self.stack_tracker[function_name][pseudo_name]
-        else:
-            if pseudo_name in self.stack_tracker[function_name].keys():
-                return self.stack_tracker[function_name][pseudo_name]
-            else:
-                self.stack_tracker[function_name][pseudo_name] = (
-                    self.get_function_stack_size(function_name, mem_size) - mem_size
-                )
-            return self.stack_tracker[function_name][pseudo_name]
-
-    def get_function_stack_size(self, function_name: str, mem_size: int = 4) -> int:
-        max_size = -mem_size
-        for pseudo_name in self.stack_tracker[function_name].keys():
-            if self.stack_tracker[function_name][pseudo_name] < max_size:
-                max_size = self.stack_tracker[function_name][pseudo_name]
+        slots = self.stack_tracker.get(function_name, {})
+        if pseudo_name in slots:
+            return slots[pseudo_name]
+
+        slot = self.get_function_stack_size(function_name, mem_size)
+        if function_name in self.stack_tracker:
+            slot -= mem_size
+        # if function name doesn't exist, neither will pseudoname
+        self.stack_tracker[function_name][pseudo_name] = slot
+        self.lowest_slot[function_name] = min(
+            slot, self.lowest_slot.get(function_name, 0)
+        )
+        return slot
+
+    def get_function_stack_size(
+        self, function_name: Identifier, mem_size: int = 4
+    ) -> int:
+        max_size = min(-mem_size, self.lowest_slot.get(function_name, 0))
 
         print(f"Max size for {function_name} is {max_size}")
         return max_size
@@ -53,7 +56,7 @@ class AssemblyParser:
         if isinstance(node, IRConstantNode):
             return OperandImmediate(node.value)
         elif isinstance(node, IRVarNode):
-            return OperandPseudo(node.sources[0])
+            return OperandPseudo(node.name)
 
     def _parse_relational_type(self, op: IRBinaryOperator) -> ConditionCode:
         if op == IRBinaryOperator.GREATER_THAN:
@@ -468,116 +471,130 @@ class AssemblyParser:
                 stack_offset += 8
         for j, body in enumerate(function.body):
             if body:
-                self.parse_body(current_func_identifier, body)
+                self.parse_instruction(body, current_func_identifier)
 
-    def parse_body(self, current_func_identifier, tack: list[IRNode]):
+    @Visitor
+    def parse_instruction(self, tack: IRNode, current_func_identifier):
+        raise Exception(f"Unknown IR {tack}")
 
-        if isinstance(tack, IRReturnNode):
-            self.instructions[current_func_identifier].extend(self.parse_return(tack))
+    @parse_instruction.register(IRReturnNode)
+    def parse_instruction_return(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].extend(self.parse_return(tack))
+        return self.instructions
 
-        elif isinstance(tack, IRUnaryNode):
-            self.instructions[current_func_identifier].extend(self.parse_unary(tack))
+    @parse_instruction.register(IRUnaryNode)
+    def parse_instruction_unary(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].extend(self.parse_unary(tack))
+        return self.instructions
 
-        elif isinstance(tack, IRBinaryNode):
-            self.instructions[current_func_identifier].extend(self.parse_binary(tack))
+    @parse_instruction.register(IRBinaryNode)
+    def parse_instruction_binary(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].extend(self.parse_binary(tack))
+        return self.instructions
 
-        elif isinstance(tack, IRJumpIfZeroNode):
-            self.instructions[current_func_identifier].extend(
-                [
-                    InstructionCmp(
-                        OperandImmediate(0), self._parse_operand(tack.condition)
-                    ),
-                    InstructionJmpCC(ConditionCodeEqual(), tack.target),
-                ]
-            )
-        elif isinstance(tack, IRJumpIfNotZeroNode):
-            self.instructions[current_func_identifier].extend(
-                [
-                    InstructionCmp(
-                        OperandImmediate(0), self._parse_operand(tack.condition)
-                    ),
-                    InstructionJmpCC(ConditionCodeNotEqual(), tack.target),
-                ]
-            )
-        elif isinstance(tack, IRCopyNode):
-            self.instructions[current_func_identifier].append(
-                InstructionMov(
-                    self._parse_operand(tack.sources[0]),
-                    self._parse_operand(tack.dst),
-                )
+    @parse_instruction.register(IRJumpIfZeroNode)
+    def parse_instruction_jump_if_zero(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].extend(
+            [
+                InstructionCmp(
+                    OperandImmediate(0), self._parse_operand(tack.condition)
+                ),
+                InstructionJmpCC(ConditionCodeEqual(), tack.target),
+            ]
+        )
+        return self.instructions
+
+    @parse_instruction.register(IRJumpIfNotZeroNode)
+    def parse_instruction_jump_if_not_zero(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].extend(
+            [
+                InstructionCmp(
+                    OperandImmediate(0), self._parse_operand(tack.condition)
+                ),
+                InstructionJmpCC(ConditionCodeNotEqual(), tack.target),
+            ]
+        )
+        return self.instructions
+
+    @parse_instruction.register(IRCopyNode)
+    def parse_instruction_copy(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].append(
+            InstructionMov(
+                self._parse_operand(tack.sources[0]),
+                self._parse_operand(tack.dst),
             )
-        elif isinstance(tack, IRJumpNode):
+        )
+        return self.instructions
+
+    @parse_instruction.register(IRJumpNode)
+    def parse_instruction_jump(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].append(InstructionJmp(tack.target))
+        return self.instructions
+
+    @parse_instruction.register(IRLabelNode)
+    def parse_instruction_label(self, tack: IRNode, current_func_identifier):
+        self.instructions[current_func_identifier].append(
+            InstructionLabel(tack.identifier)
+        )
+        return self.instructions
+
+    @parse_instruction.register(IRFunctionCallNode)
+    def parse_instruction_function_call(self, tack: IRNode, current_func_identifier):
+        register_args = tack.sources[0:6]
+        stack_args = tack.sources[6:]
+        # if the length of the stack args is odd, we need to allocate 8 bytes
+        # to make it even, so that we can use movq
+        # to move the stack args to the registers
+        if len(stack_args) % 2 != 0:
+            stack_padding = 8
+        else:
+            stack_padding = 0
+        if stack_padding != 0:
             self.instructions[current_func_identifier].append(
-                InstructionJmp(tack.target)
+                InstructionAllocateStack(stack_padding)
             )
-        elif isinstance(tack, IRLabelNode):
+
+        for i, arg in enumerate(register_args):
+            r = FunctionRegOrder[i]()
+            assembly_arg = self._parse_operand(arg)
             self.instructions[current_func_identifier].append(
-                InstructionLabel(tack.identifier)
+                InstructionMov(assembly_arg, r)
             )
 
-        elif isinstance(tack, IRVarNode):
-            pass
-
-        elif isinstance(tack, IRFunctionCallNode):
-            register_args = tack.sources[0:6]
-            stack_args = tack.sources[6:]
-            # if the length of the stack args is odd, we need to allocate 8 bytes
-            # to make it even, so that we can use movq
-            # to move the stack args to the registers
-            if len(stack_args) % 2 != 0:
-                stack_padding = 8
+        for i, tacky_arg in enumerate(reversed(stack_args)):
+            assembly_arg = self._parse_operand(tacky_arg)
+            if isinstance(assembly_arg, Reg) or isinstance(
+                assembly_arg, OperandImmediate
+            ):
+                self.instructions[current_func_identifier].append(
+                    InstructionPush(assembly_arg)
+                )
             else:
-                stack_padding = 0
-            if stack_padding != 0:
                 self.instructions[current_func_identifier].append(
-                    InstructionAllocateStack(stack_padding)
+                    InstructionMov(assembly_arg, RegAX())
                 )
-
-            for i, arg in enumerate(register_args):
-                r = FunctionRegOrder[i]()
-                assembly_arg = self._parse_operand(arg)
                 self.instructions[current_func_identifier].append(
-                    InstructionMov(assembly_arg, r)
+                    InstructionPush(RegAX("8_byte"))
                 )
 
-            for i, tacky_arg in enumerate(reversed(stack_args)):
-                assembly_arg = self._parse_operand(tacky_arg)
-                if isinstance(assembly_arg, Reg) or isinstance(
-                    assembly_arg, OperandImmediate
-                ):
-                    self.instructions[current_func_identifier].append(
-                        InstructionPush(assembly_arg)
-                    )
-                else:
-                    self.instructions[current_func_identifier].append(
-                        InstructionMov(assembly_arg, RegAX())
-                    )
-                    self.instructions[current_func_identifier].append(
-                        InstructionPush(RegAX("8_byte"))
-                    )
-
-            self.instructions[current_func_identifier].append(
-                InstructionCall(
-                    tack.identifier, self.symbol_table[tack.identifier].defined
-                )
-            )
+        self.instructions[current_func_identifier].append(
+            InstructionCall(tack.identifier, self.symbol_table[tack.identifier].defined)
+        )
 
-            bytes_to_remove = 8 * len(stack_args) + stack_padding
-            if bytes_to_remove != 0:
-                self.instructions[current_func_identifier].append(
-                    InstructionDeallocateStack(bytes_to_remove)
-                )
+        bytes_to_remove = 8 * len(stack_args) + stack_padding
+        if bytes_to_remove != 0:
             self.instructions[current_func_identifier].append(
-                InstructionMov(RegAX(), self._parse_operand(tack.dst))
+                InstructionDeallocateStack(bytes_to_remove)
             )
+        self.instructions[current_func_identifier].append(
+            InstructionMov(RegAX(), self._parse_operand(tack.dst))
+        )
 
-            foo = 1
-
-        elif tack is None:
-            pass
-        else:
-            raise Exception(f"Unknown IR {tack}")
+        foo = 1
+        return self.instructions
 
+    @parse_instruction.register(IRVarNode, type(None))
+    def parse_instruction_nothing(self, tack: IRNode, current_func_identifier):
         return self.instructions
 
     def pretty_print(self):
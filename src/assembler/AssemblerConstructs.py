@@ -8,7 +8,8 @@ class Program:
 
     def _gen_globals(self):
         res = ""
-        for globall in list(set(self.globalls)):
+        # each name once, in the order the functions were defined
+        for globall in dict.fromkeys(map(str, self.globalls)):
             res += f"   .global {globall}\n"
         return res
 
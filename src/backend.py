@@ -0,0 +1,85 @@
+#!/home/benth/miniconda3/envs/main/bin/python
+
+import os
+import click
+from tacky.Tacky import Tacky
+from tacky import IRFormat
+from tacky.Optimizer import PassManager, select_passes
+from assembler.Assembler import AssemblyParser
+
+
+@click.command()
+@click.argument("input_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "output", help="Write the assembly here, next to the input if not")
+@click.option(
+    "--save-ir",
+    type=click.Path(dir_okay=False),
+    help="Write the IR back out to this file, as text if it ends in .tir",
+)
+@click.option("--debug", is_flag=True, help="Debug")
+@click.option(
+    "-O",
+    "optimization_level",
+    type=click.IntRange(0, 2),
+    default=0,
+    help="Optimize, -O1 folds constants and removes unreachable code, -O2 runs every pass",
+)
+@click.option("--fold-constants", is_flag=True, help="Fold constant expressions")
+@click.option(
+    "--eliminate-unreachable-code", is_flag=True, help="Remove code that can't run"
+)
+@click.option(
+    "--propagate-copies",
+    is_flag=True,
+    help="Replace copied variables with what they hold",
+)
+@click.option(
+    "--eliminate-dead-stores", is_flag=True, help="Remove stores that are never read"
+)
+def main(
+    input_file,
+    output,
+    save_ir,
+    debug,
+    optimization_level,
+    fold_constants,
+    eliminate_unreachable_code,
+    propagate_copies,
+    eliminate_dead_stores,
+):
+    """Generate assembly from Tacky IR saved with main.py --save-ir."""
+    passes = select_passes(
+        optimization_level,
+        {
+            "fold-constants": fold_constants,
+            "eliminate-unreachable-code": eliminate_unreachable_code,
+            "propagate-copies": propagate_copies,
+            "eliminate-dead-stores": eliminate_dead_stores,
+        },
+    )
+    ir = IRFormat.load(input_file)
+    if passes:
+        PassManager(passes, debug).run(ir)
+    if debug:
+        Tacky(None, debug).pretty_print(ir)
+    if save_ir:
+        IRFormat.save(ir, save_ir)
+
+    if output is None:
+        output = os.path.splitext(input_file)[0] + ".s"
+    assm = AssemblyParser(output)
+    assm.parse(ir, IRFormat.function_symbols(ir))
+    if debug:
+        assm.pretty_print()
+
+    with open(output, "w") as f:
+        content = assm.generate()
+        f.write(content)
+    if debug:
+        print(content)
+
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+import os
+import glob
+import time
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from parser.ASTCache import ASTCache
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "tester", "tests")
+ROUNDS = 20
+
+
+def load_corpus() -> list[str]:
+    sources = []
+    for path in sorted(glob.glob(os.path.join(TEST_DIR, "**", "*.c"), recursive=True)):
+        with open(path) as f:
+            content = f.read()
+        try:
+            Parser(Lexer(content, False).lex(), False).parse()
+        except Exception:
+            continue  # programs the front end rejects
+        sources.append(content)
+    return sources
+
+
+def parse_all(sources: list[str]) -> float:
+    start = time.perf_counter()
+    for content in sources:
+        Parser(Lexer(content, False).lex(), False).parse()
+    return time.perf_counter() - start
+
+
+def load_all(cache: ASTCache, sources: list[str]) -> float:
+    start = time.perf_counter()
+    for content in sources:
+        if cache.load(cache.key(content)) is None:
+            raise Exception("AST missing from the cache")
+    return time.perf_counter() - start
+
+
+def main():
+    sources = load_corpus()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ASTCache(directory)
+        for content in sources:
+            cache.store(
+                cache.key(content), Parser(Lexer(content, False).lex(), False).parse()
+            )
+        size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+
+        parse = min(parse_all(sources) for _ in range(ROUNDS))
+        load = min(load_all(cache, sources) for _ in range(ROUNDS))
+
+    print(f"{len(sources)} files, {size / 1024:.0f} KB cached")
+    print(f"{'lex + parse':>12} {parse * 1e3:>8.1f} ms")
+    print(f"{'cache load':>12} {load * 1e3:>8.1f} ms  ({parse / load:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
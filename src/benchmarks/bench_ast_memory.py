@@ -0,0 +1,38 @@
+import sys
+import os
+import gc
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from bench_parser import FUNCTION, EXPRESSIONS
+
+FUNCTIONS = 1_000
+
+
+def ast_size(tokens, block_items: bool) -> int:
+    gc.collect()
+    tracemalloc.start()
+    ast = Parser(tokens, False, block_items=block_items).parse()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del ast
+    return size
+
+
+def main():
+    print(f"{'source':>12} {'lines':>8} {'block items':>12} {'KB/1k lines':>12}")
+    for name, template in [("statements", FUNCTION), ("expressions", EXPRESSIONS)]:
+        source = "".join(template.format(index=i) for i in range(FUNCTIONS))
+        lines = source.count("\n")
+        tokens = Lexer(source, False).lex()
+        for block_items in [True, False]:
+            size = ast_size(tokens, block_items)
+            print(
+                f"{name:>12} {lines:>8} {str(block_items):>12} {size * 1000 / lines / 1024:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import sys
+import os
+import time
+import random
+import contextlib
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+from tacky.TackyConstructs import IRVarNode, IRCopyNode, IRReturnNode
+from tacky.IRFormat import instructions
+from tacky.CFG import ControlFlowGraph
+from tacky.Dataflow import liveness, reaching_copies, destination, uses, copy_fact
+from tacky.Dataflow import bits
+
+# statements in the generated function, lowered to about 23 instructions each
+SIZES = [50, 100, 200, 400, 800]
+MAX_NESTING = 3
+REPEATS = 3
+
+# small functions with their answers worked out by hand: the copies reaching the
+# block that returns, and the registers live at the end of the entry block
+KNOWN = [
+    # writing z on one path ends y = z at the join, but not x = y
+    (
+        "int f(int z, int c){int y=z; int x=y; if (c) z=5; return x + z;}",
+        {"x.0 = y.0"},
+        {"x.0", "z.0"},
+    ),
+    (
+        "int main(void){int z=1; int y=z; int x=y;"
+        " for (int i=0; i<3; i=i+1) z=z+1; return x * 10 + z;}",
+        # the loop leaves from its condition, where tmp.0 = tmp.1 was just copied
+        {"x.0 = y.0", "tmp.0 = tmp.1"},
+        {"x.0", "z.0", "i.1"},
+    ),
+    (
+        "int f(int a, int c){int b=a; while (c) { c=c-1; b=c; } return b;}",
+        # b = a only holds if the loop never runs
+        {"tmp.0 = c.0"},
+        {"b.0", "c.0"},
+    ),
+]
+
+
+def statements(rng: random.Random, names: list[str], count: int, depth: int) -> str:
+    body = []
+    for _ in range(count):
+        a, b, c = rng.sample(names, 3)
+        kind = rng.random() if depth < MAX_NESTING else 0
+        if kind < 0.6:
+            body.append(f"{a} = {b} + {c} * {rng.randint(1, 9)};")
+        elif kind < 0.7:
+            body.append(f"{a} = {b};")
+        elif kind < 0.85:
+            then = statements(rng, names, 3, depth + 1)
+            otherwise = statements(rng, names, 2, depth + 1)
+            # an else block starting with an if would be read as else if
+            body.append(
+                f"if ({a} < {b}) {{ {then} }} else {{ {c} = {a}; {otherwise} }}"
+            )
+        else:
+            loop = statements(rng, names, 4, depth + 1)
+            body.append(f"while ({a} > {b}) {{ {a} = {a} - 1; {loop} }}")
+    return " ".join(body)
+
+
+def program(size: int) -> str:
+    rng = random.Random(size)
+    names = [f"v{i}" for i in range(max(20, size // 10))]
+    declarations = " ".join(f"int {name} = {i};" for i, name in enumerate(names))
+    body = statements(rng, names, size, 0)
+    return f"int main(void) {{ {declarations} {body} return {names[0]}; }}"
+
+
+def function(source: str):
+    # typechecking prints every expression
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ast = Parser(Lexer(source, False).lex(), False, True).parse()
+        ast, _ = SemanticAnalysis().parse(ast)
+        return Tacky(ast, False, True).parse(ast).function_definitions[-1]
+
+
+def check_known() -> None:
+    for source, copies_expected, live_expected in KNOWN:
+        ir_function = function(source)
+        names = [str(name) for name in ir_function.registers]
+        cfg = ControlFlowGraph(ir_function)
+        returning = next(
+            block
+            for block in cfg.blocks
+            if type(block.instructions[-1]) is IRReturnNode
+            and type(block.instructions[-1].sources[0]) is IRVarNode
+        )
+        copies = reaching_copies(cfg)
+        reaching = set()
+        for i in bits(copies.reaching[returning.index]):
+            dst, is_register, source_value = copies.facts[i]
+            value = names[source_value] if is_register else source_value
+            reaching.add(f"{names[dst]} = {value}")
+        live = {names[register] for register in bits(liveness(cfg)[0])}
+        if reaching != copies_expected or live != live_expected:
+            raise Exception(
+                f"{source!r}: copies {reaching} and live {live}, "
+                f"not {copies_expected} and {live_expected}"
+            )
+
+
+def set_liveness(cfg: ControlFlowGraph) -> dict:
+    """Liveness as sets of registers, as the passes did it before the bitsets."""
+    live_in = {block: set() for block in cfg.blocks}
+    live_out = {block: set() for block in cfg.blocks}
+    worklist = deque(reversed(cfg.blocks))
+    queued = set(cfg.blocks)
+    while worklist:
+        block = worklist.popleft()
+        queued.discard(block)
+        live = set()
+        for successor in block.successors:
+            live |= live_in[successor]
+        live_out[block] = set(live)
+        for instruction in reversed(block.instructions):
+            dst = destination(instruction)
+            if dst is not None:
+                live.discard(dst.register)
+            for source in uses(instruction):
+                if type(source) is IRVarNode:
+                    live.add(source.register)
+        if live != live_in[block]:
+            live_in[block] = live
+            for predecessor in block.predecessors:
+                if predecessor not in queued:
+                    queued.add(predecessor)
+                    worklist.append(predecessor)
+    return live_out
+
+
+def set_reaching_copies(cfg: ControlFlowGraph) -> dict:
+    """Reaching copies as sets of facts, as the passes did it before the bitsets."""
+    mentions = {}
+    for block in cfg.blocks:
+        for instruction in block.instructions:
+            if type(instruction) is IRCopyNode:
+                fact = copy_fact(instruction)
+                mentions.setdefault(fact[0], set()).add(fact)
+                if fact[1]:
+                    mentions.setdefault(fact[2], set()).add(fact)
+    everything = set().union(*mentions.values())
+    entry = cfg.blocks[0]
+    reaching_in = {block: set() for block in cfg.blocks}
+    reaching_out = {block: set(everything) for block in cfg.blocks}
+    worklist = deque(cfg.reverse_postorder())
+    queued = set(worklist)
+    while worklist:
+        block = worklist.popleft()
+        queued.discard(block)
+        reaching = set()
+        if block is not entry:
+            reaching = set(everything)
+            for predecessor in block.predecessors:
+                reaching &= reaching_out[predecessor]
+        reaching_in[block] = set(reaching)
+        for instruction in block.instructions:
+            dst = destination(instruction)
+            if dst is not None:
+                reaching -= mentions.get(dst.register, set())
+                if type(instruction) is IRCopyNode:
+                    reaching.add(copy_fact(instruction))
+        if reaching != reaching_out[block]:
+            reaching_out[block] = reaching
+            for successor in block.successors:
+                if successor not in queued:
+                    queued.add(successor)
+                    worklist.append(successor)
+    return reaching_in
+
+
+def timed(analysis, cfg: ControlFlowGraph):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = analysis(cfg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    print(
+        f"{'instrs':>7} {'blocks':>7} {'registers':>10} {'analysis':>9} "
+        f"{'sets ms':>8} {'bits ms':>8} {'bits us/instr':>14}"
+    )
+    check_known()
+    for size in SIZES:
+        ir_function = function(program(size))
+        cfg = ControlFlowGraph(ir_function)
+        count = len(instructions(ir_function))
+        analyses = [
+            ("liveness", set_liveness, liveness),
+            ("copies", set_reaching_copies, reaching_copies),
+        ]
+        for name, with_sets, with_bits in analyses:
+            expected, set_time = timed(with_sets, cfg)
+            result, bit_time = timed(with_bits, cfg)
+            if name == "liveness":
+                same = all(
+                    set(bits(result[b.index])) == expected[b] for b in cfg.blocks
+                )
+            else:
+                same = all(
+                    {result.facts[i] for i in bits(result.reaching[b.index])}
+                    == expected[b]
+                    for b in cfg.blocks
+                )
+            if not same:
+                raise Exception(f"{name} differs on {count} instructions")
+            print(
+                f"{count:>7} {len(cfg.blocks):>7} {len(ir_function.registers):>10} "
+                f"{name:>9} {set_time * 1e3:>8.2f} {bit_time * 1e3:>8.2f} "
+                f"{bit_time * 1e6 / count:>14.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
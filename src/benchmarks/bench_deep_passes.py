@@ -0,0 +1,84 @@
+import sys
+import os
+import time
+import gc
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+
+# small enough for the recursive walkers, and far past what they can take
+DEPTHS = [100, 10_000, 50_000]
+
+
+def else_if_ladder(depth: int) -> str:
+    rungs = " else ".join(f"if (x == {i}) x = {i + 1};" for i in range(depth))
+    return "int main(void) { int x = 0; " + rungs + " return x; }"
+
+
+def nested_loops(depth: int) -> str:
+    loops = "for (int i = 0; i < 1; i = i + 1) " * depth
+    return "int main(void) { int x = 0; " + loops + "x = x + 1; return x; }"
+
+
+def nested_blocks(depth: int) -> str:
+    return "int main(void) { " + "{ " * depth + "return 1; " + "} " * depth + "}"
+
+
+def nested_switches(depth: int) -> str:
+    switches = "switch (1) { case 1: " * depth + "return 1;" + " }" * depth
+    return "int main(void) { " + switches + " return 0; }"
+
+
+def timed(walk):
+    gc.collect()
+    start = time.perf_counter()
+    try:
+        result = walk()
+    except RecursionError:
+        return None, None
+    return result, time.perf_counter() - start
+
+
+def per_level(elapsed: float | None, depth: int) -> str:
+    return "RecursionError" if elapsed is None else f"{elapsed * 1e6 / depth:.2f}"
+
+
+def main():
+    print(
+        f"{'input':>16} {'depth':>7} {'mode':>10} {'resolve us':>14} {'lower us':>14}"
+    )
+    for make in [else_if_ladder, nested_loops, nested_blocks, nested_switches]:
+        for depth in DEPTHS:
+            source = make(depth)
+            for iterative in [False, True]:
+                mode = "iterative" if iterative else "recursive"
+                program = Parser(Lexer(source, False).lex(), False, True).parse()
+                # typechecking prints every expression
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+                    devnull
+                ):
+                    semantic = SemanticAnalysis(iterative=iterative)
+                    resolved, resolve_time = timed(lambda: semantic.parse(program))
+                    if resolved is None:
+                        # lowered all the same, from a tree resolved without recursion
+                        program = Parser(
+                            Lexer(source, False).lex(), False, True
+                        ).parse()
+                        resolved = SemanticAnalysis(iterative=True).parse(program)
+                    ast = resolved[0]
+                    tacky = Tacky(ast, False, iterative)
+                    _, lower_time = timed(lambda: tacky.parse(ast))
+                # per level of nesting
+                print(
+                    f"{make.__name__:>16} {depth:>7} {mode:>10} "
+                    f"{per_level(resolve_time, depth):>14} {per_level(lower_time, depth):>14}"
+                )
+                del program, resolved
+
+
+if __name__ == "__main__":
+    main()
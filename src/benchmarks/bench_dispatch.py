@@ -0,0 +1,122 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from parser.ParserConstructs import *
+from Visitor import Visitor
+
+# the node classes in the order Tacky.emit_ir used to test them
+CHAIN = [
+    ProgramNode,
+    FunctionDeclarationNode,
+    BlockNode,
+    FunctionCallNode,
+    ConstantNode,
+    UnaryNode,
+    BinaryNode,
+    VarNode,
+    AssignmentNode,
+    DeclarationNode,
+    ReturnNode,
+    IfNode,
+    ConditionalNode,
+    GotoNode,
+    LabeledStatementNode,
+    InitDeclNode,
+    InitExprNode,
+    BreakNode,
+    ContinueNode,
+    DoWhileNode,
+    WhileNode,
+    ForNode,
+    CaseNode,
+    DefaultNode,
+    SwitchNode,
+]
+CALLS = 200_000
+PROGRAM = """
+int f{index}(int a, int b) {{
+    int x = a * 2 + b;
+    for (int i = 0; i < b; i = i + 1) {{
+        if (x > 10 && i != 3)
+            x = x - i;
+        else
+            x += a ? b : -b;
+    }}
+    while (x > 100) {{ x = x / 2; if (x == 7) break; }}
+    switch (x) {{ case 1: x = 2; break; default: x++; }}
+    return x;
+}}
+"""
+
+
+def isinstance_chain():
+    # the shape the walkers had: one isinstance test per class until one matches
+    lines = ["def dispatch(self, node):"]
+    for position, node_class in enumerate(CHAIN):
+        keyword = "if" if position == 0 else "elif"
+        lines.append(f"    {keyword} isinstance(node, {node_class.__name__}):")
+        lines.append(f"        return {position}")
+    namespace = dict(globals())
+    exec("\n".join(lines), namespace)
+    return namespace["dispatch"]
+
+
+class Walker:
+    dispatch_chain = isinstance_chain()
+
+    @Visitor
+    def dispatch(self, node):
+        return -1
+
+
+for position, node_class in enumerate(CHAIN):
+    Walker.dispatch.register(node_class)(lambda self, node, position=position: position)
+
+
+def nodes_of(program: ProgramNode) -> list:
+    nodes = []
+    pending = [program]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif type(node).__module__ == ProgramNode.__module__ and hasattr(
+            node, "__slots__"
+        ):
+            nodes.append(node)
+            for cls in type(node).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    pending.append(getattr(node, name, None))
+    return nodes
+
+
+def per_call(dispatch, nodes: list) -> float:
+    start = time.perf_counter()
+    for node in nodes:
+        dispatch(node)
+    return (time.perf_counter() - start) * 1e9 / len(nodes)
+
+
+def main():
+    walker = Walker()
+    print(f"{'node':>24} {'position':>9} {'isinstance ns':>14} {'table ns':>9}")
+    for position in [0, len(CHAIN) // 2, len(CHAIN) - 1]:
+        node_class = CHAIN[position]
+        nodes = [node_class.__new__(node_class)] * CALLS
+        chain = per_call(walker.dispatch_chain, nodes)
+        table = per_call(walker.dispatch, nodes)
+        print(f"{node_class.__name__:>24} {position:>9} {chain:>14.1f} {table:>9.1f}")
+
+    source = "".join(PROGRAM.format(index=i) for i in range(200))
+    nodes = nodes_of(Parser(Lexer(source, False).lex(), False).parse())
+    chain = per_call(walker.dispatch_chain, nodes)
+    table = per_call(walker.dispatch, nodes)
+    print(f"{'program nodes':>24} {len(nodes):>9} {chain:>14.1f} {table:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
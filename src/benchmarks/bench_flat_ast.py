@@ -0,0 +1,80 @@
+import sys
+import os
+import gc
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+
+STATEMENTS = [10_000, 100_000, 1_000_000]
+# a few hundred statements per function keeps semantic analysis, which copies the
+# scope on every function, from dominating
+BODY = """
+    x = x + {index} * a;
+    if (x > 1000) x = x % 1000;
+    y += x - (a << 2);
+    z = y ? z + 1 : z - x;"""
+
+
+def make_program(statements: int) -> str:
+    repeats = 100
+    per_function = 4 * repeats + 4
+    functions = []
+    for index in range(max(1, statements // per_function)):
+        body = "".join(BODY.format(index=i) for i in range(repeats))
+        functions.append(
+            f"int f{index}(int a) {{\n    int x = a;\n    int y = 0;\n    int z = 1;"
+            f"{body}\n    return x + y + z;\n}}\n"
+        )
+    return "".join(functions)
+
+
+def compile_ast(tokens, flat: bool) -> tuple[float, float, float]:
+    parser = Parser(tokens, False)
+    start = time.perf_counter()
+    ast = parser.parse_flat() if flat else parser.parse()
+    parsed = time.perf_counter()
+    # the type checker prints every expression it checks
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        ast, _ = SemanticAnalysis().parse(ast)
+        analysed = time.perf_counter()
+        Tacky(ast, False).parse(ast)
+    return parsed - start, analysed - parsed, time.perf_counter() - analysed
+
+
+def ast_memory(tokens, flat: bool) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    parser = Parser(tokens, False)
+    ast = parser.parse_flat() if flat else parser.parse()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ast
+    return size, peak
+
+
+def main():
+    print(
+        f"{'statements':>10} {'ast':>7} {'MB':>7} {'peak MB':>8} "
+        f"{'parse s':>8} {'semantic s':>10} {'tacky s':>8}"
+    )
+    for statements in STATEMENTS:
+        tokens = Lexer(make_program(statements), False).lex()
+        for flat in [False, True]:
+            size, peak = ast_memory(tokens, flat)
+            gc.collect()
+            parse, semantic, tacky = compile_ast(tokens, flat)
+            print(
+                f"{statements:>10} {'flat' if flat else 'object':>7} "
+                f"{size / 2**20:>7.1f} {peak / 2**20:>8.1f} "
+                f"{parse:>8.2f} {semantic:>10.2f} {tacky:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+from assembler.Assembler import AssemblyParser
+from Identifier import intern
+
+LOOKUPS = 1_000_000
+
+
+def make_function(statements: int) -> str:
+    # every statement makes a few temporaries, each one a new stack slot
+    body = "".join(
+        f"\n    int x{i} = a * {i} + (b - {i}) / 3;" for i in range(statements)
+    )
+    return (
+        f"int main(void) {{\n    int a = 1;\n    int b = 2;{body}\n    return a;\n}}\n"
+    )
+
+
+def assemble(source: str) -> float:
+    program = Parser(Lexer(source, False).lex(), False).parse()
+    # the passes print their progress
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        program, symbol_table = SemanticAnalysis().parse(program)
+        ir = Tacky(program, False).parse(program)
+        start = time.perf_counter()
+        AssemblyParser("bench.s").parse(ir, symbol_table)
+        return time.perf_counter() - start
+
+
+def lookup_ns(keys: list, probes: list) -> float:
+    table = {key: i for i, key in enumerate(keys)}
+    probes = probes * (LOOKUPS // len(probes))
+    start = time.perf_counter()
+    for key in probes:
+        table[key]
+    return (time.perf_counter() - start) * 1e9 / len(probes)
+
+
+def main():
+    print(f"{'statements':>10} {'slots':>8} {'seconds':>10} {'us/slot':>10}")
+    for statements in [100, 1000, 4000]:
+        slots = statements * 3 + 2
+        elapsed = assemble(make_function(statements))
+        print(
+            f"{statements:>10} {slots:>8} {elapsed:>10.3f} {elapsed*1e6/slots:>10.2f}"
+        )
+
+    # fresh strings, as the passes used to build with f-strings, against ids
+    names = [f"tmp.{i}" for i in range(1000)]
+    copies = ["".join(["tmp.", str(i)]) for i in range(1000)]
+    ids = [intern(name) for name in names]
+    strings = lookup_ns(names, names)
+    fresh = lookup_ns(names, copies)
+    ids = lookup_ns(ids, ids)
+    print(f"\n{'key':>16} {'ns/lookup':>10}")
+    print(f"{'same string':>16} {strings:>10.1f}")
+    print(f"{'equal string':>16} {fresh:>10.1f}")
+    print(f"{'identifier':>16} {ids:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+
+FUNCTIONS = 1000
+FUNCTION = """
+int f{index}(int a, int b) {{
+    int x = a * {index} + b;
+    for (int i = 0; i < b; i = i + 1) {{
+        if (x > 10 && i != 3)
+            x = x - i;
+        else
+            x = x + f{callee}(a, i);
+    }}
+    return x;
+}}
+"""
+
+
+def make_program(edited: int = None, arity_of: int = None) -> str:
+    functions = []
+    for index in range(FUNCTIONS):
+        function = FUNCTION.format(index=index, callee=max(index - 1, 0))
+        if index == edited:
+            function = function.replace("int x = a", "int x = 1 + a")
+        if index == arity_of:
+            function = function.replace("int b)", "int b, int c)")
+        if arity_of is not None and index == arity_of + 1:
+            function = function.replace("(a, i)", "(a, i, 0)")
+        functions.append(function)
+    return "".join(functions)
+
+
+def check(semantic: SemanticAnalysis, source: str) -> float:
+    program = Parser(Lexer(source, False).lex(), False).parse()
+    # typechecking prints every expression
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        semantic.parse(program)
+        return time.perf_counter() - start
+
+
+def main():
+    print(f"{FUNCTIONS} functions")
+    print(f"{'edit':>24} {'full s':>8} {'incremental s':>14} {'rechecked':>10}")
+    semantic = SemanticAnalysis(incremental=True)
+    check(semantic, make_program())
+    for name, source in [
+        ("none", make_program()),
+        ("one body", make_program(edited=FUNCTIONS // 2)),
+        ("one signature", make_program(arity_of=FUNCTIONS // 2)),
+        ("back to the start", make_program()),
+    ]:
+        full = check(SemanticAnalysis(), source)
+        incremental = check(semantic, source)
+        print(
+            f"{name:>24} {full:>8.3f} {incremental:>14.3f} {len(semantic.checked):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
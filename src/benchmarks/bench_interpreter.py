@@ -0,0 +1,115 @@
+import sys
+import os
+import time
+import json
+import glob
+import tempfile
+import subprocess
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+from tacky.Interpreter import Interpreter, StepLimit
+from assembler.Assembler import AssemblyParser
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "..", "tester", "tests")
+EXPECTED = os.path.join(TESTS, "..", "expected_results.json")
+PROPERTIES = os.path.join(TESTS, "..", "test_properties.json")
+CHAPTERS = range(1, 10)
+# jumps and calls, enough for all but a couple of very long running programs
+MAX_STEPS = 1_000_000
+# programs also built with gcc, that's slow enough to only time a few
+GCC_SAMPLE = 40
+
+
+def valid_programs() -> list[str]:
+    with open(PROPERTIES) as f:
+        properties = json.load(f)
+    # multi-file programs need linking
+    linked = set(properties["libs"]) | set(properties["assembly_libs"])
+    programs = []
+    for chapter in CHAPTERS:
+        pattern = os.path.join(TESTS, f"chapter_{chapter}", "valid", "**", "*.c")
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if "libraries" in path.split(os.sep):
+                continue
+            if os.path.relpath(path, TESTS) not in linked:
+                programs.append(path)
+    return programs
+
+
+def frontend(path: str):
+    with open(path) as f:
+        source = f.read()
+    # the passes print their progress
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        program = Parser(Lexer(source, False).lex(), False).parse()
+        program, symbol_table = SemanticAnalysis().parse(program)
+        return Tacky(program, False).parse(program), symbol_table
+
+
+def interpret(path: str) -> tuple[int, str] | None:
+    interpreter = Interpreter(frontend(path)[0])
+    try:
+        status = interpreter.run(MAX_STEPS) & 0xFF
+    except StepLimit:
+        return None
+    return status, interpreter.output.decode()
+
+
+def compile_and_run(path: str, directory: str) -> tuple[int, str]:
+    ir, symbol_table = frontend(path)
+    assembly = os.path.join(directory, "program.s")
+    executable = os.path.join(directory, "program")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        assm = AssemblyParser(assembly)
+        assm.parse(ir, symbol_table)
+    with open(assembly, "w") as f:
+        f.write(assm.generate())
+    subprocess.run(["gcc", assembly, "-o", executable], check=True)
+    result = subprocess.run([executable], capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+def check(programs: list[str], run) -> tuple[int, int, float]:
+    with open(EXPECTED) as f:
+        expected = json.load(f)
+    passed = stopped = 0
+    start = time.perf_counter()
+    for path in programs:
+        result = run(path)
+        if result is None:
+            stopped += 1
+            continue
+        status, output = result
+        wanted = expected[os.path.relpath(path, TESTS)]
+        if status == wanted["return_code"] and output == wanted.get("stdout", ""):
+            passed += 1
+    return passed, stopped, time.perf_counter() - start
+
+
+def main():
+    programs = valid_programs()
+    print(
+        f"{'route':>12} {'programs':>9} {'passed':>7} {'stopped':>8} "
+        f"{'seconds':>8} {'ms each':>8}"
+    )
+    sample = programs[:: len(programs) // GCC_SAMPLE][:GCC_SAMPLE]
+    with tempfile.TemporaryDirectory() as directory:
+        routes = [
+            ("interpreter", programs, interpret),
+            ("gcc", sample, lambda path: compile_and_run(path, directory)),
+        ]
+        for name, checked, run in routes:
+            passed, stopped, elapsed = check(checked, run)
+            print(
+                f"{name:>12} {len(checked):>9} {passed:>7} {stopped:>8} "
+                f"{elapsed:>8.2f} {elapsed * 1e3 / len(checked):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+from tacky import IRFormat
+from bench_dispatch import PROGRAM
+
+FUNCTIONS = 1_000
+
+
+def frontend(source: str):
+    # the passes print their progress
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        program = Parser(Lexer(source, False).lex(), False).parse()
+        ast, _ = SemanticAnalysis().parse(program)
+        return Tacky(ast, False).parse(ast)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    source = "".join(PROGRAM.format(index=i) for i in range(FUNCTIONS))
+    ir, frontend_time = timed(frontend, source)
+    instructions = sum(len(IRFormat.instructions(f)) for f in ir.function_definitions)
+    print(f"{FUNCTIONS} functions, {instructions} instructions")
+    print(f"{'from':>10} {'KB':>8} {'write s':>8} {'read s':>8}")
+    print(f"{'source':>10} {len(source) / 1024:>8.0f} {'':>8} {frontend_time:>8.3f}")
+    for name, write, read in [
+        ("text", IRFormat.to_text, IRFormat.from_text),
+        ("binary", IRFormat.serialize, IRFormat.deserialize),
+    ]:
+        data, write_time = timed(write, ir)
+        _, read_time = timed(read, data)
+        print(
+            f"{name:>10} {len(data) / 1024:>8.0f} {write_time:>8.3f} {read_time:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
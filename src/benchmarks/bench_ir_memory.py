@@ -0,0 +1,46 @@
+import sys
+import os
+import gc
+import time
+import tracemalloc
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+from tacky.Tacky import Tacky
+from bench_parser import FUNCTION
+from bench_dispatch import PROGRAM
+
+FUNCTIONS = 1_000
+
+
+def lower(source: str) -> tuple[int, int, float]:
+    program = Parser(Lexer(source, False).lex(), False).parse()
+    # typechecking prints every expression
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ast, _ = SemanticAnalysis().parse(program)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    ir = Tacky(ast, False).parse(ast)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    instructions = sum(len(function.body) for function in ir.function_definitions)
+    return instructions, size, elapsed
+
+
+def main():
+    print(f"{'source':>12} {'instructions':>13} {'bytes/instr':>12} {'us/instr':>9}")
+    for name, template in [("statements", FUNCTION), ("control flow", PROGRAM)]:
+        source = "".join(template.format(index=i) for i in range(FUNCTIONS))
+        instructions, size, elapsed = lower(source)
+        print(
+            f"{name:>12} {instructions:>13} {size / instructions:>12.1f} {elapsed * 1e6 / instructions:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+
+FUNCTIONS = 1_000
+STATEMENT = """
+    x = x * {index} + a;
+    if (x > b) {{
+        x = x - b;
+    }}"""
+
+
+def make_program(statements: int) -> str:
+    body = "".join(STATEMENT.format(index=i) for i in range(statements // 2))
+    return "".join(
+        f"int f{index}(int a, int b) {{\n    int x = a;{body}\n    return x;\n}}\n"
+        for index in range(FUNCTIONS)
+    )
+
+
+def signatures(tokens, lazy_bodies: bool) -> float:
+    # what a symbol index needs: every function's name and parameters
+    start = time.perf_counter()
+    program = Parser(tokens, False, lazy_bodies=lazy_bodies).parse()
+    index = {function.identifier: function.params for function in program.functions}
+    elapsed = time.perf_counter() - start
+    assert len(index) == FUNCTIONS
+    return elapsed
+
+
+def main():
+    print(f"{FUNCTIONS} functions")
+    print(
+        f"{'statements':>10} {'tokens':>10} {'eager s':>8} {'lazy s':>8} {'speedup':>8}"
+    )
+    for statements in [2, 20, 200]:
+        tokens = Lexer(make_program(statements), False).lex()
+        eager = signatures(tokens, False)
+        lazy = signatures(tokens, True)
+        print(
+            f"{statements:>10} {len(tokens):>10} {eager:>8.3f} {lazy:>8.3f} {eager / lazy:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import os
+import glob
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "tester", "tests")
+
+
+def load_corpus() -> str:
+    sources = []
+    for path in sorted(glob.glob(os.path.join(TEST_DIR, "**", "*.c"), recursive=True)):
+        with open(path) as f:
+            content = f.read()
+        try:
+            Lexer(content, False).lex()
+        except Exception:
+            continue  # invalid_lex programs
+        sources.append(content)
+    return "\n".join(sources)
+
+
+def main():
+    corpus = load_corpus()
+    print(f"{'copies':>8} {'bytes':>12} {'tokens':>10} {'seconds':>10} {'us/KB':>8}")
+    for copies in [1, 2, 4, 8, 16]:
+        content = corpus * copies
+        start = time.perf_counter()
+        tokens = Lexer(content, False).lex()
+        elapsed = time.perf_counter() - start
+        per_kb = elapsed * 1e6 / (len(content) / 1024)
+        print(
+            f"{copies:>8} {len(content):>12} {len(tokens):>10} {elapsed:>10.3f} {per_kb:>8.1f}"
+        )
+
+    jobs = os.cpu_count()
+    print(f"\nparallel lexing with {jobs} processes")
+    print(f"{'copies':>8} {'bytes':>12} {'serial':>10} {'parallel':>10}")
+    for copies in [16, 64]:
+        content = corpus * copies
+        start = time.perf_counter()
+        Lexer(content, False).lex()
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        Lexer(content, False).lex_parallel(jobs)
+        parallel = time.perf_counter() - start
+        print(f"{copies:>8} {len(content):>12} {serial:>10.3f} {parallel:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
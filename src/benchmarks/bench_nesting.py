@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import gc
+from enum import Enum
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+
+# small enough for the recursive parser, and far past what it can take
+DEPTHS = [100, 10_000, 100_000]
+
+
+def parentheses(depth: int) -> str:
+    return "int main(void) { return " + "(" * depth + "1" + ")" * depth + "; }"
+
+
+def else_if_ladder(depth: int) -> str:
+    rungs = " else ".join(f"if (x == {i}) x = {i + 1};" for i in range(depth))
+    return "int main(void) { int x = 0; " + rungs + " return x; }"
+
+
+def nested_blocks(depth: int) -> str:
+    return "int main(void) { " + "{ " * depth + "return 1; " + "} " * depth + "}"
+
+
+def assignment_chain(depth: int) -> str:
+    return "int main(void) { int a; " + "a = " * depth + "1; return a; }"
+
+
+def addition_chain(depth: int) -> str:
+    return "int main(void) { int a = 1; return " + " + ".join(["a"] * depth) + "; }"
+
+
+def count_nodes(ast) -> int:
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif hasattr(node, "__dict__") and not isinstance(node, Enum):
+            count += 1
+            stack.extend(node.__dict__.values())
+    return count
+
+
+def main():
+    print(
+        f"{'input':>18} {'depth':>8} {'mode':>10} {'tokens':>8} {'nodes':>8} {'us/token':>8}"
+    )
+    for make in [
+        parentheses,
+        else_if_ladder,
+        nested_blocks,
+        assignment_chain,
+        addition_chain,
+    ]:
+        for depth in DEPTHS:
+            tokens = Lexer(make(depth), False).lex()
+            for iterative in [False, True]:
+                mode = "iterative" if iterative else "recursive"
+                gc.collect()
+                start = time.perf_counter()
+                try:
+                    ast = Parser(tokens, False, iterative).parse()
+                except RecursionError:
+                    ast = None
+                elapsed = time.perf_counter() - start
+                if ast is None:
+                    print(f"{make.__name__:>18} {depth:>8} {mode:>10}  RecursionError")
+                    continue
+                nodes = count_nodes(ast)
+                print(
+                    f"{make.__name__:>18} {depth:>8} {mode:>10} {len(tokens):>8} {nodes:>8} {elapsed * 1e6 / len(tokens):>8.2f}"
+                )
+                del ast
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+
+FUNCTION = """
+int f{index}(int a, int b) {{
+    int x = a * 2 + b;
+    if (x > 10) {{
+        x = x - 1;
+    }} else
+        x = x + 3;
+    for (int j = 0; j < b; j = j + 1)
+        x += j;
+    return x ? x : -a;
+}}
+"""
+
+EXPRESSIONS = """
+int g{index}(int a, int b) {{
+    int c = (a + b) * (a - b) / (b | 1) % 7 + (a << 2) - (-b >> 1);
+    c = c && a || !b && (a ^ b) & ~c | a <= b == (b > c) != (a >= c < b);
+    c += a ? b * 3 + 1 : c - (a + b * (c - a / (b + 1)));
+    return f(a, b + c, -c) * (c = a + b) - ++a + b-- * g(c & 3, a);
+}}
+"""
+
+
+def make_program(template: str, token_count: int) -> str:
+    per_function = len(Lexer(template.format(index=0), False).lex())
+    functions = max(1, token_count // per_function)
+    return "".join(template.format(index=i) for i in range(functions))
+
+
+def main():
+    for name, template in [("statements", FUNCTION), ("expressions", EXPRESSIONS)]:
+        print(f"{name}\n{'tokens':>10} {'seconds':>10} {'us/token':>10}")
+        for token_count in [1_000, 10_000, 100_000, 1_000_000]:
+            tokens = Lexer(make_program(template, token_count), False).lex()
+            start = time.perf_counter()
+            Parser(tokens, False).parse()
+            elapsed = time.perf_counter() - start
+            print(
+                f"{len(tokens):>10} {elapsed:>10.3f} {elapsed * 1e6 / len(tokens):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from tacky.IRFormat import instructions
+from tacky.Optimizer import PassManager, LEVELS, PASSES
+from bench_interpreter import valid_programs, frontend, check, MAX_STEPS
+from tacky.Interpreter import Interpreter, StepLimit
+
+# programs the passes once got wrong, with the status they exit with
+REGRESSIONS = [
+    # x = y is rewritten to x = z, writing z mustn't change what x holds
+    ("int f(int z){int y=z; int x=y; z=5; return x;} int main(void){return f(3);}", 3),
+    (
+        "int f(int z, int c){int y=z; int x=y; if (c) z=5; return x + z;}"
+        " int main(void){return f(3, 1);}",
+        8,
+    ),
+    (
+        "int main(void){int z=1; int y=z; int x=y;"
+        " for (int i=0; i<3; i=i+1) z=z+1; return x * 10 + z;}",
+        14,
+    ),
+    ("int main(void){int a=2; int b=a; int c=b; a=7; b=9; return c;}", 2),
+]
+
+
+def check_regressions(passes: list[str]) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for index, (source, status) in enumerate(REGRESSIONS):
+            path = os.path.join(directory, f"regression_{index}.c")
+            with open(path, "w") as f:
+                f.write(source)
+            ir = PassManager(passes).run(frontend(path)[0])
+            result = Interpreter(ir).run(MAX_STEPS) & 0xFF
+            if result != status:
+                raise Exception(
+                    f"{passes} made {source!r} exit with {result}, not {status}"
+                )
+
+
+def optimized(programs: list[str], passes: list[str]):
+    """Each program's Tacky with the passes run over it, and the pass manager."""
+    manager = PassManager(passes)
+    irs = [frontend(path)[0] for path in programs]
+    start = time.perf_counter()
+    for ir in irs:
+        manager.run(ir)
+    return irs, manager, time.perf_counter() - start
+
+
+def functions(ir) -> int:
+    return sum(1 for function in ir.function_definitions if function.body)
+
+
+def count(ir) -> int:
+    return sum(len(instructions(function)) for function in ir.function_definitions)
+
+
+def main():
+    for passes in [[name] for name in PASSES] + list(LEVELS.values()):
+        check_regressions(passes)
+    programs = valid_programs()
+    unoptimized = sum(count(frontend(path)[0]) for path in programs)
+    print(
+        f"{'level':>5} {'instrs':>7} {'of':>7} {'pass runs':>10} {'cfgs built':>11} "
+        f"{'analyses':>9} {'computed':>9} {'seconds':>8} {'passed':>7}"
+    )
+    for level, passes in LEVELS.items():
+        irs, manager, elapsed = optimized(programs, passes)
+        by_path = dict(zip(programs, irs))
+
+        def interpret(path: str):
+            interpreter = Interpreter(by_path[path])
+            try:
+                status = interpreter.run(MAX_STEPS) & 0xFF
+            except StepLimit:
+                return None
+            return status, interpreter.output.decode()
+
+        passed, stopped, _ = check(programs, interpret)
+        print(
+            f"{level:>5} {sum(map(count, irs)):>7} {unoptimized:>7} "
+            f"{manager.runs:>10} {sum(map(functions, irs)):>11} "
+            f"{manager.requested:>9} {manager.computed:>9} "
+            f"{elapsed:>8.3f} {passed:>4}/{len(programs) - stopped}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from bench_lexer import load_corpus
+
+LINES = 50000
+EDITS = 1000
+
+
+def main():
+    corpus = load_corpus()
+    lines = corpus.splitlines(keepends=True)
+    content = "".join(lines * (LINES // len(lines) + 1))
+    content = "".join(content.splitlines(keepends=True)[:LINES])
+
+    lexer = Lexer(content, False)
+    start = time.perf_counter()
+    lexer.lex()
+    full = time.perf_counter() - start
+    print(f"full lex of {LINES} lines, {len(lexer.tokens)} tokens: {full * 1e3:.1f} ms")
+
+    # typing: insert characters one after another at a few places in the file, the
+    # first edit at each place pays for moving the offset gap there
+    random.seed(0)
+    jumps, typing = [], []
+    for _ in range(EDITS // 100):
+        offset = random.randrange(len(lexer.content))
+        for i in range(100):
+            start = time.perf_counter()
+            lexer.relex(offset + i, 0, "x")
+            (typing if i else jumps).append(time.perf_counter() - start)
+    print(f"1 character edit, new place: {sum(jumps) * 1e6 / len(jumps):.1f} us")
+    print(f"1 character edit, typing: {sum(typing) * 1e6 / len(typing):.1f} us")
+
+    expected = Lexer(lexer.content, False).lex()
+    assert [(t.type, t.value) for t in lexer.tokens] == [
+        (t.type, t.value) for t in expected
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import os
+import time
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Lexer import Lexer
+from parser.Parser import Parser
+from SemanticAnalysis import SemanticAnalysis
+
+LOCALS = 50
+BLOCK = """
+    {{
+        int y{index} = x{index} + a;
+        for (int i = 0; i < b; i = i + 1) {{
+            int z = y{index} * i;
+            y{index} = y{index} + z;
+        }}
+        x{index} = y{index};
+    }}"""
+
+
+def make_function(index: int, blocks: int) -> str:
+    # every block sees all of the function's locals
+    locals_ = "".join(f"\n    int x{i} = {i};" for i in range(LOCALS))
+    body = "".join(BLOCK.format(index=i % LOCALS) for i in range(blocks))
+    return f"int f{index}(int a, int b) {{{locals_}{body}\n    return x0;\n}}\n"
+
+
+def analyse(source: str) -> float:
+    program = Parser(Lexer(source, False).lex(), False).parse()
+    # typechecking prints every expression
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        SemanticAnalysis().parse(program)
+        return time.perf_counter() - start
+
+
+def main():
+    for name, make_program in [
+        ("functions", lambda size: "".join(make_function(i, 10) for i in range(size))),
+        ("blocks in one function", lambda size: make_function(0, size * 10)),
+    ]:
+        print(f"{name}\n{'lines':>10} {'seconds':>10} {'us/line':>10}")
+        for size in [10, 100, 1000]:
+            source = make_program(size)
+            lines = source.count("\n")
+            elapsed = analyse(source)
+            print(f"{lines:>10} {elapsed:>10.3f} {elapsed * 1e6 / lines:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,71 @@
 #!/home/benth/miniconda3/envs/main/bin/python
 
 import click
-from Lexer import Lexer
+from Lexer import Lexer, TokenStream, map_source
+from Preprocessor import Preprocessor
 from SemanticAnalysis import SemanticAnalysis
 from parser.Parser import Parser
+from parser.ASTCache import ASTCache
 from tacky.Tacky import Tacky
+from tacky import IRFormat
+from tacky.Interpreter import Interpreter, StepLimit
+from tacky.Optimizer import PassManager, select_passes
 from assembler.Assembler import AssemblyParser
 import subprocess
+import contextlib
+import sys
+import os
+
+
+def read_source(input_file, stream: bool, preprocess: bool, include_dirs, debug: bool):
+    if preprocess:
+        preprocessor = Preprocessor(include_dirs, debug)
+        return preprocessor.process(input_file.read(), input_file.name)
+    if stream:
+        return map_source(input_file.name)
+    return input_file.read()
+
+
+def lex_input(content, stream: bool, debug: bool, jobs: int):
+    lexer = Lexer(content, debug)
+    if stream:
+        # tokens are lexed as the parser asks for them
+        return TokenStream(lexer.stream())
+
+    tokens = lexer.lex_parallel(jobs) if jobs > 1 else lexer.lex()
+    if debug:
+        print(str(lexer))
+    return tokens
+
+
+def parse_input(
+    input_file,
+    stream: bool,
+    debug: bool,
+    preprocess: bool,
+    include_dirs,
+    jobs: int,
+    iterative: bool,
+    block_items: bool,
+    lazy_bodies: bool,
+    flat_ast: bool,
+    ast_cache: str | None,
+):
+    content = read_source(input_file, stream, preprocess, include_dirs, debug)
+    if ast_cache:
+        cache = ASTCache(ast_cache)
+        key = cache.key(content, f"block_items={block_items}")
+        ast = cache.load(key)
+        if ast is not None:
+            # the parser is only kept for pretty printing
+            return Parser([], debug), ast
+
+    tokens = lex_input(content, stream, debug, jobs)
+    parser = Parser(tokens, debug, iterative, block_items, lazy_bodies)
+    ast = parser.parse_flat() if flat_ast else parser.parse()
+    if ast_cache:
+        cache.store(key, ast)
+    return parser, ast
 
 
 @click.command()
@@ -19,82 +78,255 @@ import subprocess
 @click.option("-s", is_flag=True, help="Generate assembly")
 @click.option("-c", is_flag=True, help="Generate assembly")
 @click.option("--debug", is_flag=True, help="Debug")
-def main(input_file, lex, parse, validate, tacky, codegen, s, c, debug):
-
-    content = input_file.read()
+@click.option("--stream", is_flag=True, help="Lex lazily from a memory-mapped file")
+@click.option("--preprocess", is_flag=True, help="Run the built-in preprocessor")
+@click.option("-I", "include_dirs", multiple=True, help="Add an #include search path")
+@click.option("--jobs", default=1, help="Lex large files in this many processes")
+@click.option(
+    "--iterative", is_flag=True, help="Parse, resolve and lower without recursion"
+)
+@click.option(
+    "--lazy-bodies", is_flag=True, help="Parse function bodies when first needed"
+)
+@click.option("--flat-ast", is_flag=True, help="Keep the AST in flat arrays")
+@click.option(
+    "--ast-cache",
+    type=click.Path(file_okay=False),
+    help="Reuse ASTs of unchanged sources from this directory",
+)
+@click.option(
+    "--no-block-items", is_flag=True, help="Don't wrap block contents in BlockItemNode"
+)
+@click.option(
+    "--save-ir",
+    type=click.Path(dir_okay=False),
+    help="Write the Tacky IR to this file, as text if it ends in .tir",
+)
+@click.option(
+    "--run-ir", is_flag=True, help="Run the program with the Tacky interpreter"
+)
+@click.option(
+    "--max-steps",
+    type=click.IntRange(0),
+    default=1_000_000,
+    help="Stop --run-ir after this many jumps and calls, 0 for no limit",
+)
+@click.option(
+    "-O",
+    "optimization_level",
+    type=click.IntRange(0, 2),
+    default=0,
+    help="Optimize, -O1 folds constants and removes unreachable code, -O2 runs every pass",
+)
+@click.option("--fold-constants", is_flag=True, help="Fold constant expressions")
+@click.option(
+    "--eliminate-unreachable-code", is_flag=True, help="Remove code that can't run"
+)
+@click.option(
+    "--propagate-copies",
+    is_flag=True,
+    help="Replace copied variables with what they hold",
+)
+@click.option(
+    "--eliminate-dead-stores", is_flag=True, help="Remove stores that are never read"
+)
+def main(
+    input_file,
+    lex,
+    parse,
+    validate,
+    tacky,
+    codegen,
+    s,
+    c,
+    debug,
+    stream,
+    preprocess,
+    include_dirs,
+    jobs,
+    iterative,
+    no_block_items,
+    flat_ast,
+    ast_cache,
+    lazy_bodies,
+    save_ir,
+    run_ir,
+    max_steps,
+    optimization_level,
+    fold_constants,
+    eliminate_unreachable_code,
+    propagate_copies,
+    eliminate_dead_stores,
+):
+    passes = select_passes(
+        optimization_level,
+        {
+            "fold-constants": fold_constants,
+            "eliminate-unreachable-code": eliminate_unreachable_code,
+            "propagate-copies": propagate_copies,
+            "eliminate-dead-stores": eliminate_dead_stores,
+        },
+    )
 
     if lex:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
+        if stream:
+            content = read_source(input_file, stream, preprocess, include_dirs, debug)
+            for token in Lexer(content, debug).stream():
+                if debug:
+                    print(token)
+        else:
+            content = read_source(input_file, stream, preprocess, include_dirs, debug)
+            lex_input(content, stream, debug, jobs)
 
     elif parse:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
+        # nothing after --parse reads the bodies, they're read here so a syntax
+        # error in one fails as it does without --lazy-bodies
+        for function in ast.functions:
+            function.body
         if debug:
             parser.pretty_print(ast)
 
     elif validate:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             parser.pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             parser.pretty_print(ast)
 
     elif tacky:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             parser.pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             parser.pretty_print(ast)
 
-        tacky = Tacky(ast, debug)
+        tacky = Tacky(ast, debug, iterative)
         ir = tacky.parse(ast)
+        if passes:
+            PassManager(passes, debug).run(ir)
+        if save_ir:
+            IRFormat.save(ir, save_ir)
         if debug:
             tacky.pretty_print(ir)
 
-    elif codegen:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
+    elif run_ir:
+        # the passes print as they go, stdout is left to the program
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+            sys.stderr if debug else devnull
+        ):
+            parser, ast = parse_input(
+                input_file,
+                stream,
+                debug,
+                preprocess,
+                include_dirs,
+                jobs,
+                iterative,
+                not no_block_items,
+                lazy_bodies,
+                flat_ast,
+                ast_cache,
+            )
+            if debug:
+                parser.pretty_print(ast)
+
+            semantic = SemanticAnalysis(iterative=iterative)
+            ast, symbol_table = semantic.parse(ast)
+            if debug:
+                parser.pretty_print(ast)
+
+            tacky = Tacky(ast, debug, iterative)
+            ir = tacky.parse(ast)
+            if passes:
+                PassManager(passes, debug).run(ir)
+            if save_ir:
+                IRFormat.save(ir, save_ir)
+            if debug:
+                tacky.pretty_print(ir)
+
+        interpreter = Interpreter(ir)
+        try:
+            status = interpreter.run(max_steps)
+        except StepLimit:
+            raise Exception(
+                f"Stopped after {max_steps} steps, raise --max-steps or pass 0 to "
+                "run the program for longer"
+            ) from None
+        click.echo(bytes(interpreter.output), nl=False)
+        # the exit status a shell sees
+        sys.exit(status & 0xFF)
 
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+    elif codegen:
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             parser.pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             parser.pretty_print(ast)
 
-        tacky = Tacky(ast, debug)
+        tacky = Tacky(ast, debug, iterative)
         ir = tacky.parse(ast)
+        if passes:
+            PassManager(passes, debug).run(ir)
+        if save_ir:
+            IRFormat.save(ir, save_ir)
         if debug:
             tacky.pretty_print(ir)
 
@@ -107,23 +339,33 @@ def main(input_file, lex, parse, validate, tacky, codegen, s, c, debug):
         # assembly.parse()
 
     elif s:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             parser.pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             parser.pretty_print(ast)
 
-        tacky = Tacky(ast, debug)
+        tacky = Tacky(ast, debug, iterative)
         ir = tacky.parse(ast)
+        if passes:
+            PassManager(passes, debug).run(ir)
+        if save_ir:
+            IRFormat.save(ir, save_ir)
         if debug:
             tacky.pretty_print(ir)
 
@@ -140,23 +382,33 @@ def main(input_file, lex, parse, validate, tacky, codegen, s, c, debug):
             print(content)
 
     elif c:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             parser.pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             parser.pretty_print(ast)
 
-        tacky = Tacky(ast, debug)
+        tacky = Tacky(ast, debug, iterative)
         ir = tacky.parse(ast)
+        if passes:
+            PassManager(passes, debug).run(ir)
+        if save_ir:
+            IRFormat.save(ir, save_ir)
         if debug:
             tacky.pretty_print(ir)
 
@@ -178,23 +430,33 @@ def main(input_file, lex, parse, validate, tacky, codegen, s, c, debug):
         )
 
     else:
-        lexer = Lexer(content, debug)
-        tokens = lexer.lex()
-        if debug:
-            print(str(lexer))
-
-        parser = Parser(tokens, debug)
-        ast = parser.parse()
+        parser, ast = parse_input(
+            input_file,
+            stream,
+            debug,
+            preprocess,
+            include_dirs,
+            jobs,
+            iterative,
+            not no_block_items,
+            lazy_bodies,
+            flat_ast,
+            ast_cache,
+        )
         if debug:
             pretty_print(ast)
 
-        semantic = SemanticAnalysis()
+        semantic = SemanticAnalysis(iterative=iterative)
         ast, symbol_table = semantic.parse(ast)
         if debug:
             semantic.pretty_print()
 
-        tacky = Tacky(ast, debug)
+        tacky = Tacky(ast, debug, iterative)
         ir = tacky.parse(ast)
+        if passes:
+            PassManager(passes, debug).run(ir)
+        if save_ir:
+            IRFormat.save(ir, save_ir)
         if debug:
             tacky.pretty_print(ir)
 
@@ -0,0 +1,60 @@
+import os
+import hashlib
+
+from .ParserConstructs import ProgramNode
+from .FlatAST import serialize, deserialize
+
+
+class ASTCache:
+    """Directory of serialized ASTs keyed by a hash of the source they came from.
+
+    Cached programs load as FlatAST views, which every pass walks like the objects.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.prefix = os.path.join(directory, "")
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, content: str | bytes, options: str = "") -> str:
+        # options that change the shape of the tree are part of the key
+        digest = hashlib.sha256(
+            content.encode() if isinstance(content, str) else content
+        )
+        digest.update(options.encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return f"{self.prefix}{key}.ast"
+
+    def load(self, key: str) -> ProgramNode | None:
+        # os.read skips the buffered file object, which costs more than the
+        # unpacking for the small files that make up most builds
+        try:
+            descriptor = os.open(self.path(key), os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            data = os.read(descriptor, os.fstat(descriptor).st_size)
+        finally:
+            os.close(descriptor)
+        try:
+            return deserialize(data)
+        except Exception:
+            return None  # from another format version, it gets parsed and replaced
+
+    def store(self, key: str, program: ProgramNode) -> None:
+        # written aside and renamed, so a reader never sees half a file
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}"
+        try:
+            data = serialize(program)
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except Exception:
+            # a program the cache can't keep still compiles, it's parsed next time
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
@@ -0,0 +1,444 @@
+import sys
+import struct
+import zlib
+from array import array
+
+from .ParserConstructs import *
+
+NODE, LIST, STR, STRS, INT, BOOL = range(6)
+
+# the fields packed for each node class, in column order
+FIELDS = {
+    ProgramNode: [("functions", LIST)],
+    FunctionDeclarationNode: [("identifier", STR), ("params", STRS), ("body", NODE)],
+    VariableDeclarationNode: [("identifier", STR), ("exp", NODE)],
+    BlockNode: [("children", LIST)],
+    BlockItemNode: [("child", NODE)],
+    ReturnNode: [("exp", NODE)],
+    LabeledStatementNode: [("label", STR), ("child", NODE)],
+    CompoundStatementNode: [("child", NODE)],
+    GotoNode: [("label", STR)],
+    IfNode: [("condition", NODE), ("then", NODE), ("else_", NODE)],
+    WhileNode: [("condition", NODE), ("body", NODE), ("label", STR)],
+    DoWhileNode: [("condition", NODE), ("body", NODE), ("label", STR)],
+    InitDeclNode: [("declaration", NODE), ("label", STR)],
+    InitExprNode: [("expression", NODE), ("label", STR)],
+    ForNode: [
+        ("condition", NODE),
+        ("body", NODE),
+        ("init", NODE),
+        ("post", NODE),
+        ("label", STR),
+    ],
+    BreakNode: [("label", STR), ("target_type", STR)],
+    ContinueNode: [("label", STR)],
+    CaseNode: [("condition", NODE), ("body", LIST), ("label", STR)],
+    DefaultNode: [("body", LIST), ("label", STR)],
+    SwitchNode: [
+        ("condition", NODE),
+        ("body", NODE),
+        ("label", STR),
+        ("case_targets", STRS),
+        ("default_target", STR),
+    ],
+    ConstantNode: [("value", INT)],
+    VarNode: [("identifier", STR)],
+    UnaryNode: [("exp", NODE), ("operator", UnaryOperatorNode), ("postfix", BOOL)],
+    BinaryNode: [("operator", BinaryOperatorNode), ("exp_1", NODE), ("exp_2", NODE)],
+    AssignmentNode: [
+        ("lvalue", NODE),
+        ("rvalue", NODE),
+        ("type", EqualAssignOperatorNode),
+    ],
+    ConditionalNode: [("condition", NODE), ("then", NODE), ("else_", NODE)],
+    FunctionCallNode: [("identifier", STR), ("arguments", LIST)],
+}
+COLUMNS = max(len(fields) for fields in FIELDS.values())
+NODE_CLASSES = list(FIELDS)
+NODE_KINDS = {node_class: kind for kind, node_class in enumerate(NODE_CLASSES)}
+NODE_FIELDS = [FIELDS[node_class] for node_class in NODE_CLASSES]
+# packed like any other function, reading its body parses it
+NODE_KINDS[LazyFunctionDeclarationNode] = NODE_KINDS[FunctionDeclarationNode]
+EMPTY_ROW = array("i", [-1] * COLUMNS)
+# the range of the values array, constants past it are kept as decimal strings
+VALUE_MIN, VALUE_MAX = -(2**63), 2**63 - 1
+
+MAGIC = b"BCAST"
+# 2: constants past 64 bits are complemented string indices
+FORMAT_VERSION = 2
+# magic, version, schema, root, the node, item and value counts, the string bytes
+HEADER = struct.Struct("<5sHIiIIII")
+# changes with the node layout, so files written for another one are refused
+SCHEMA = zlib.crc32(
+    repr(
+        [
+            (
+                node_class.__name__,
+                [
+                    (name, field if isinstance(field, int) else [m.name for m in field])
+                    for name, field in fields
+                ],
+            )
+            for node_class, fields in FIELDS.items()
+        ]
+    ).encode()
+)
+
+
+class FlatAST:
+    """Struct-of-arrays AST: one row per node across parallel typed arrays.
+
+    A row is the node's kind (its class) in kinds and COLUMNS ints in fields, one per
+    node field. Child nodes are row indices, strings are indices into an interned
+    string table, constants index the values array (or, complemented, the string
+    table if they don't fit in 64 bits) and lists are runs in items, each starting
+    with their length; -1 stands for None.
+
+    Nodes are read through views, throwaway subclasses of the node classes whose
+    attributes are properties over the arrays, so the passes that isinstance their
+    way through the object AST walk this one unchanged. Assigning a node object
+    to a view packs it in.
+    """
+
+    def __init__(self) -> None:
+        self.kinds = array("B")
+        self.fields = array("i")
+        self.values = array("q")
+        self.items = array("i")
+        self.strings = []
+        self.string_indices = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def view(self, index: int):
+        return VIEW_CLASSES[self.kinds[index]](self, index)
+
+    def program(self, functions: list[int]) -> ProgramNode:
+        index = self.row(ProgramNode)
+        self.fields[index * COLUMNS] = self.sequence(functions)
+        return self.view(index)
+
+    def row(self, node_class) -> int:
+        self.kinds.append(NODE_KINDS[node_class])
+        self.fields.extend(EMPTY_ROW)
+        return len(self.kinds) - 1
+
+    def string(self, value: str | None) -> int:
+        if value is None:
+            return -1
+        index = self.string_indices.get(value)
+        if index is None:
+            index = self.string_indices[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def constant(self, value: int, position: int = -1) -> int:
+        # written over the value at position, if there is one
+        if VALUE_MIN <= value <= VALUE_MAX:
+            if position >= 0:
+                self.values[position] = value
+                return position
+            self.values.append(value)
+            return len(self.values) - 1
+        return ~self.string(str(value))
+
+    def sequence(self, indices: list[int]) -> int:
+        start = len(self.items)
+        self.items.append(len(indices))
+        self.items.extend(indices)
+        return start
+
+    def resequence(self, start: int, indices: list[int]) -> int:
+        # a run as long as the old one is written over it
+        if start >= 0 and self.items[start] == len(indices):
+            self.items[start + 1 : start + 1 + len(indices)] = array("i", indices)
+            return start
+        return self.sequence(indices)
+
+    def replace(self, index: int, node) -> int:
+        # packs a node standing in for row index, over it if it's the same kind of
+        # node and isn't built around it
+        if (
+            index < 0
+            or node is None
+            or type(node) in VIEW_TYPES
+            or NODE_KINDS[type(node)] != self.kinds[index]
+            or self.contains(node, index)
+        ):
+            return self.add(node)
+        return self.add(node, index)
+
+    def contains(self, node, index: int) -> bool:
+        # whether a node object has row index under it
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if type(node) in VIEW_TYPES:
+                if node.flat is self and node.index == index:
+                    return True
+                continue
+            for name, field in NODE_FIELDS[NODE_KINDS[type(node)]]:
+                if field == NODE:
+                    child = getattr(node, name, None)
+                    if child is not None:
+                        pending.append(child)
+                elif field == LIST:
+                    pending.extend(
+                        item
+                        for item in getattr(node, name, None) or []
+                        if item is not None
+                    )
+        return False
+
+    def add(self, node, root: int = None) -> int:
+        # packs a node object, and everything under it, returning its row
+        if node is None:
+            return -1
+        if type(node) in VIEW_TYPES and node.flat is self:
+            return node.index
+
+        if root is None:
+            root = self.row(type(node))
+        pending = [(node, root)]
+        fields = self.fields
+        while pending:
+            node, index = pending.pop()
+            for position, (name, field) in enumerate(
+                NODE_FIELDS[self.kinds[index]], index * COLUMNS
+            ):
+                value = getattr(node, name, None)
+                if field == NODE:
+                    fields[position] = self.child(value, pending)
+                # a row packed over keeps its runs and values where they fit
+                elif field == LIST:
+                    fields[position] = self.resequence(
+                        fields[position],
+                        [self.child(item, pending) for item in value or []],
+                    )
+                elif field == STR:
+                    fields[position] = self.string(value)
+                elif field == STRS:
+                    fields[position] = self.resequence(
+                        fields[position], [self.string(item) for item in value]
+                    )
+                elif field == INT:
+                    fields[position] = self.constant(value, fields[position])
+                elif field == BOOL:
+                    fields[position] = bool(value)
+                else:
+                    fields[position] = ENUM_CODES[value]
+        return root
+
+    def child(self, node, pending: list) -> int:
+        if node is None:
+            return -1
+        if type(node) in VIEW_TYPES and node.flat is self:
+            return node.index
+        index = self.row(type(node))
+        pending.append((node, index))
+        return index
+
+
+class FlatList:
+    # the node list in a run of FlatAST.items, indexed and assigned like a list
+    __slots__ = ("flat", "start")
+
+    def __init__(self, flat: FlatAST, start: int) -> None:
+        self.flat = flat
+        self.start = start
+
+    def __len__(self) -> int:
+        return self.flat.items[self.start]
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < len(self):
+            raise IndexError("FlatList index out of range")
+        index = self.flat.items[self.start + 1 + position]
+        return None if index < 0 else self.flat.view(index)
+
+    def __setitem__(self, position: int, node) -> None:
+        if not 0 <= position < len(self):
+            raise IndexError("FlatList index out of range")
+        items = self.flat.items
+        position += self.start + 1
+        items[position] = self.flat.replace(items[position], node)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _view_init(self, flat: FlatAST, index: int) -> None:
+    self.flat = flat
+    self.index = index
+
+
+def _field_property(column: int, field) -> property:
+    if field == NODE:
+
+        def getter(self):
+            index = self.flat.fields[self.index * COLUMNS + column]
+            return None if index < 0 else self.flat.view(index)
+
+        def setter(self, node):
+            position = self.index * COLUMNS + column
+            fields = self.flat.fields
+            fields[position] = self.flat.replace(fields[position], node)
+
+    elif field == LIST:
+
+        def getter(self):
+            return FlatList(self.flat, self.flat.fields[self.index * COLUMNS + column])
+
+        def setter(self, nodes):
+            indices = [self.flat.add(node) for node in nodes]
+            position = self.index * COLUMNS + column
+            fields = self.flat.fields
+            fields[position] = self.flat.resequence(fields[position], indices)
+
+    elif field == STR:
+
+        def getter(self):
+            index = self.flat.fields[self.index * COLUMNS + column]
+            return None if index < 0 else self.flat.strings[index]
+
+        def setter(self, value):
+            self.flat.fields[self.index * COLUMNS + column] = self.flat.string(value)
+
+    elif field == STRS:
+
+        def getter(self):
+            start = self.flat.fields[self.index * COLUMNS + column]
+            items = self.flat.items[start + 1 : start + 1 + self.flat.items[start]]
+            return [self.flat.strings[index] for index in items]
+
+        def setter(self, values):
+            indices = [self.flat.string(value) for value in values]
+            position = self.index * COLUMNS + column
+            fields = self.flat.fields
+            fields[position] = self.flat.resequence(fields[position], indices)
+
+    elif field == INT:
+
+        def getter(self):
+            position = self.flat.fields[self.index * COLUMNS + column]
+            if position < 0:
+                return int(self.flat.strings[~position])
+            return self.flat.values[position]
+
+        def setter(self, value):
+            position = self.index * COLUMNS + column
+            fields = self.flat.fields
+            fields[position] = self.flat.constant(value, fields[position])
+
+    elif field == BOOL:
+
+        def getter(self):
+            return bool(self.flat.fields[self.index * COLUMNS + column])
+
+        def setter(self, value):
+            self.flat.fields[self.index * COLUMNS + column] = bool(value)
+
+    else:
+        members = list(field)
+
+        def getter(self):
+            return members[self.flat.fields[self.index * COLUMNS + column]]
+
+        def setter(self, value):
+            self.flat.fields[self.index * COLUMNS + column] = ENUM_CODES[value]
+
+    return property(getter, setter)
+
+
+ENUM_CODES = {
+    member: code
+    for enum in [UnaryOperatorNode, BinaryOperatorNode, EqualAssignOperatorNode]
+    for code, member in enumerate(enum)
+}
+VIEW_CLASSES = [
+    type(
+        node_class.__name__,
+        (node_class,),
+        {
+            "__slots__": ("flat", "index"),
+            "__init__": _view_init,
+            **{
+                name: _field_property(column, field)
+                for column, (name, field) in enumerate(FIELDS[node_class])
+            },
+        },
+    )
+    for node_class in NODE_CLASSES
+]
+VIEW_TYPES = set(VIEW_CLASSES)
+# a view into another FlatAST is packed like the node it stands for
+NODE_KINDS.update(zip(VIEW_CLASSES, range(len(NODE_CLASSES))))
+
+
+def serialize(program: ProgramNode) -> bytes:
+    """Packs a program, object or flat, into a versioned little-endian byte string."""
+    if type(program) in VIEW_TYPES:
+        flat, root = program.flat, program.index
+    else:
+        flat = FlatAST()
+        root = flat.add(program)
+
+    # each string is NUL terminated, so an empty one still takes up room
+    # formatted, a resolved name is an Identifier and is written as its name
+    strings = "".join(f"{value}\0" for value in flat.strings).encode()
+    arrays = [flat.fields, flat.items, flat.values]
+    if sys.byteorder == "big":
+        arrays = [array(data.typecode, data) for data in arrays]
+        for data in arrays:
+            data.byteswap()
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        SCHEMA,
+        root,
+        len(flat.kinds),
+        len(flat.items),
+        len(flat.values),
+        len(strings),
+    )
+    return b"".join(
+        [header, flat.kinds.tobytes(), *(data.tobytes() for data in arrays), strings]
+    )
+
+
+def deserialize(data: bytes) -> ProgramNode:
+    if len(data) < HEADER.size:
+        raise Exception("Truncated AST data")
+    magic, version, schema, root, nodes, items, values, strings = HEADER.unpack_from(
+        data
+    )
+    if magic != MAGIC:
+        raise Exception("Not a serialized AST")
+    if version != FORMAT_VERSION or schema != SCHEMA:
+        raise Exception(f"Unsupported AST format version {version}")
+
+    size = HEADER.size + nodes * (1 + 4 * COLUMNS) + items * 4 + values * 8 + strings
+    if len(data) != size:
+        raise Exception("Truncated AST data")
+
+    flat = FlatAST()
+    buffer = memoryview(data)
+    position = HEADER.size + nodes
+    flat.kinds.frombytes(buffer[HEADER.size : position])
+    flat.fields.frombytes(buffer[position : position + nodes * COLUMNS * 4])
+    position += nodes * COLUMNS * 4
+    flat.items.frombytes(buffer[position : position + items * 4])
+    position += items * 4
+    flat.values.frombytes(buffer[position : position + values * 8])
+    position += values * 8
+    if sys.byteorder == "big":
+        for data in [flat.fields, flat.items, flat.values]:
+            data.byteswap()
+    flat.strings = bytes(buffer[position:]).decode().split("\0")[:-1]
+    flat.string_indices = dict(zip(flat.strings, range(len(flat.strings))))
+    return flat.view(root)
@@ -1,582 +1,741 @@
+import re
 from typing import Self
 from enum import Enum
+from array import array
+from types import GeneratorType
 
 
 from .ParserConstructs import *
+from .FlatAST import FlatAST, FlatList
+from Lexer import TokenArray
+from Visitor import Visitor, run_recursive, run_iterative
+
+# left operand types a binary operator can follow, anything else (a conditional) is
+# rejected
+BINARY_LEFT_OPERANDS = {
+    UnaryNode,
+    BinaryNode,
+    VarNode,
+    ConstantNode,
+    AssignmentNode,
+    FunctionCallNode,
+}
+POSTFIX_KINDS = (TokenKind.INCREMENT, TokenKind.DOUBLE_HYPHEN)
+# finds the braces in a bytes-like array of token kinds
+BRACE_REGEX = re.compile(
+    b"["
+    + re.escape(bytes([TokenKind.OPEN_BRACE]))
+    + re.escape(bytes([TokenKind.CLOSE_BRACE]))
+    + b"]"
+)
+
+# what an entry on parse_expression_iterative's stack is waiting for
+UNARY, PAREN, CALL, BINARY, ASSIGN, MIDDLE, CONDITION = range(7)
+
+
+class _TokenKinds:
+    # kind of each token in a lazily lexed TokenStream
+    def __init__(self, tokens) -> None:
+        self.tokens = tokens
+
+    def __getitem__(self, position: int) -> int:
+        return TokenKind[self.tokens[position].type]
 
 
 class Parser:
-    def __init__(self, tokens: list[Token], debug) -> None:
+    """Recursive descent parser over a shared cursor into the token stream.
+
+    Works on a token list, a TokenArray or a lazily lexed TokenStream. Decisions are
+    made on integer token kinds: statements dispatch through a dict on the keyword
+    and expressions are parsed Pratt style from tables indexed by kind.
+
+    Statement parsers are generators that yield the parser for each nested statement
+    and get its node sent back. Normally they are driven recursively; with iterative
+    set they are run from an explicit stack and expressions are parsed without
+    recursion too, so nesting depth is only limited by memory.
+
+    With block_items off, blocks hold their statements and declarations directly
+    instead of wrapping each one in a BlockItemNode.
+
+    With lazy_bodies set, a function body is skipped by matching its braces and only
+    parsed when its body is first read, so a pass over the signatures costs little
+    more than finding the braces.
+    """
+
+    def __init__(
+        self,
+        tokens: list[Token],
+        debug,
+        iterative: bool = False,
+        block_items: bool = True,
+        lazy_bodies: bool = False,
+    ) -> None:
         self.tokens = tokens
+        self.position = 0
         self.ast = None
         self.debug = debug
+        self.block_items = block_items
+        self.lazy_bodies = lazy_bodies
+        # a TokenStream can let go of tokens the cursor has moved past
+        self.release = getattr(tokens, "drop_before", None)
+
+        if isinstance(tokens, TokenArray):
+            self.kinds = (
+                tokens.kinds[tokens.offset :] if tokens.offset else tokens.kinds
+            )
+            self.lexeme = tokens.lexeme
+        else:
+            if isinstance(tokens, list):
+                self.kinds = array("B", [TokenKind[token.type] for token in tokens])
+            else:
+                self.kinds = _TokenKinds(tokens)
+            self.lexeme = lambda position: tokens[position].value
+
+        self.statement_parsers = {
+            TokenKind.OPEN_BRACE: self.parse_block,
+            TokenKind.RETURN: self.parse_return,
+            TokenKind.WHILE: self.parse_while,
+            TokenKind.FOR: self.parse_for,
+            TokenKind.BREAK: self.parse_break,
+            TokenKind.CONTINUE: self.parse_continue,
+            TokenKind.DO: self.parse_do_while,
+            TokenKind.IF: self.parse_if,
+            TokenKind.GOTO: self.parse_goto,
+            TokenKind.IDENTIFIER: self.parse_identifier_statement,
+            TokenKind.SWITCH: self.parse_switch,
+            TokenKind.CASE: self.parse_case,
+            TokenKind.DEFAULT: self.parse_default,
+            TokenKind.SEMICOLON: self.parse_empty_statement,
+        }
+        if iterative:
+            self.run = run_iterative
+            self.parse_expression = self.parse_expression_iterative
+        else:
+            self.run = run_recursive
+
+    def peek(self, offset: int = 0) -> int:
+        return self.kinds[self.position + offset]
+
+    def advance(self) -> int:
+        position = self.position
+        self.position += 1
+        if self.release is not None:
+            self.release(position)  # the consumed token is still read for its lexeme
+        return position
+
+    def at_end(self) -> bool:
+        try:
+            self.kinds[self.position]
+        except IndexError:
+            return True
+        return False
+
+    def expect(self, expected: int) -> int:
+        # returns the position of the token, for its lexeme
+        if self.kinds[self.position] == expected:
+            return self.advance()
+        raise Exception(
+            f"Syntax Error: Expected {Token(TOKEN_NAMES[expected])}, got {self.tokens[self.position]}"
+        )
 
     def parse(self) -> ProgramNode:
 
-        tokens = self.tokens
         functions = []
-        while tokens:
-            tokens, function = self.parse_function(tokens)
+        while not self.at_end():
+            function = self.run(self.parse_function())
             functions.append(function)
         program_node = ProgramNode(functions)
 
         return program_node
 
-    def parse_function(
-        self, tokens: list[Token]
-    ) -> tuple[list[Token], FunctionDeclarationNode]:
+    def parse_flat(self) -> ProgramNode:
+        # each function is packed into the FlatAST as soon as it's parsed, so only
+        # one function's worth of node objects is ever alive
+        flat = FlatAST()
+        functions = []
+        while not self.at_end():
+            functions.append(flat.add(self.run(self.parse_function())))
+        return flat.program(functions)
+
+    def parse_function(self) -> FunctionDeclarationNode:
 
-        tokens, _ = self.expect(Token("INT"), tokens)
+        self.expect(TokenKind.INT)
         return_type = "INT"
-        tokens, token = self.expect(Token("IDENTIFIER"), tokens)
-        name = token.value
+        name = self.lexeme(self.expect(TokenKind.IDENTIFIER))
 
-        tokens, function_params = self.parse_function_parameter_list(tokens)
-        for i, param in enumerate(function_params):
-            function_params[i] = param
+        function_params = self.parse_function_parameter_list()
 
-        tokens, block_node = self.parse_block(tokens)
+        # skipping needs random access to the kinds, so not for a TokenStream
+        if (
+            self.lazy_bodies
+            and isinstance(self.kinds, array)
+            and self.peek() == TokenKind.OPEN_BRACE
+        ):
+            body_start = self.position
+            self.position = self.matching_brace(body_start) + 1
+            return LazyFunctionDeclarationNode(name, function_params, self, body_start)
+
+        block_node = yield self.parse_block()
         # if block_node.children == []:
         # block_node = BlockNode([])
 
-        return tokens, FunctionDeclarationNode(name, function_params, block_node)
-
-    def parse_function_parameter_list(
-        self, tokens: list[Token]
-    ) -> tuple[list[Token], list[str]]:
+        return FunctionDeclarationNode(name, function_params, block_node)
+
+    def matching_brace(self, start: int) -> int:
+        depth = 0
+        for brace in BRACE_REGEX.finditer(self.kinds, start):
+            depth += 1 if self.kinds[brace.start()] == TokenKind.OPEN_BRACE else -1
+            if depth == 0:
+                return brace.start()
+        raise Exception("Syntax Error: Expected CLOSE_BRACE, got end of file")
+
+    def parse_body(self, start: int) -> BlockNode:
+        # the cursor is put back afterwards, bodies can be read in any order
+        position = self.position
+        self.position = start
+        try:
+            return self.run(self.parse_block())
+        finally:
+            self.position = position
+
+    def parse_function_parameter_list(self) -> list[str]:
         parameters = []
 
-        tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
+        self.expect(TokenKind.OPEN_PAREN)
 
-        if tokens[0] == Token("VOID"):
-            tokens = tokens[1:]
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-            return tokens, parameters
+        if self.peek() == TokenKind.VOID:
+            self.advance()
+            self.expect(TokenKind.CLOSE_PAREN)
+            return parameters
 
-        while tokens[0] != Token("CLOSE_PAREN"):
-            if tokens[0] == Token("COMMA"):
-                tokens = tokens[1:]
+        while self.peek() != TokenKind.CLOSE_PAREN:
+            if self.peek() == TokenKind.COMMA:
+                self.advance()
 
-            tokens, _ = self.expect(Token("INT"), tokens)
-            tokens, parameter = self.expect(Token("IDENTIFIER"), tokens)
-            parameters.append(parameter.value)
+            self.expect(TokenKind.INT)
+            parameter = self.lexeme(self.expect(TokenKind.IDENTIFIER))
+            parameters.append(parameter)
 
-        tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-        return tokens, parameters
+        self.expect(TokenKind.CLOSE_PAREN)
+        return parameters
 
-    def parse_argument_list(
-        self, tokens: list[Token]
-    ) -> tuple[list[Token], list[ExpressionNode]]:
+    def parse_argument_list(self) -> list[ExpressionNode]:
         arguments = []
 
-        tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
+        self.expect(TokenKind.OPEN_PAREN)
 
-        while tokens[0] != Token("CLOSE_PAREN"):
+        while self.peek() != TokenKind.CLOSE_PAREN:
 
-            if tokens[0] == Token("COMMA"):
-                tokens = tokens[1:]
+            if self.peek() == TokenKind.COMMA:
+                self.advance()
 
-            tokens, expression = self.parse_expression(tokens)
+            expression = self.parse_expression()
             arguments.append(expression)
 
-        tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-        return tokens, arguments
+        self.expect(TokenKind.CLOSE_PAREN)
+        return arguments
 
-    def parse_variable_declaration(
-        self, tokens: list[Token]
-    ) -> tuple[list[Token], VariableDeclarationNode]:
-        tokens, _ = self.expect(Token("INT"), tokens)
-        tokens, identifier = self.expect(Token("IDENTIFIER"), tokens)
-        identifier = identifier.value
+    def parse_variable_declaration(self) -> VariableDeclarationNode:
+        self.expect(TokenKind.INT)
+        identifier = self.lexeme(self.expect(TokenKind.IDENTIFIER))
 
-        if tokens[0] == Token("EQUAL_ASSIGN"):
-            tokens = tokens[1:]
-            tokens, expression = self.parse_expression(tokens)
+        if self.peek() == TokenKind.EQUAL_ASSIGN:
+            self.advance()
+            expression = self.parse_expression()
             declaration = VariableDeclarationNode(identifier, expression)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+            self.expect(TokenKind.SEMICOLON)
         else:
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+            self.expect(TokenKind.SEMICOLON)
             declaration = VariableDeclarationNode(identifier, None)
 
-        return tokens, declaration
+        return declaration
 
-    def parse_block(self, tokens) -> tuple[list[Token], BlockNode]:
+    def parse_block(self) -> BlockNode:
         block_items = []
 
-        if tokens[0] == Token("SEMICOLON"):
-            tokens = tokens[1:]
-            return tokens, None
+        if self.peek() == TokenKind.SEMICOLON:
+            self.advance()
+            return None
 
-        tokens, _ = self.expect(Token("OPEN_BRACE"), tokens)
+        self.expect(TokenKind.OPEN_BRACE)
 
-        while tokens[0].type != "CLOSE_BRACE":
-            tokens, next_block_item = self.parse_block_item(tokens)
+        while self.peek() != TokenKind.CLOSE_BRACE:
+            next_block_item = yield self.parse_block_item()
             block_items.append(next_block_item)
 
-        tokens, _ = self.expect(Token("CLOSE_BRACE"), tokens)
-        return tokens, BlockNode(block_items)
+        self.expect(TokenKind.CLOSE_BRACE)
+        return BlockNode(block_items)
 
-    def parse_block_item(self, tokens) -> tuple[list[Token], BlockItemNode]:
-        if tokens[0] == Token("INT"):
-            tokens, declaration = self.parse_declaration(tokens)
-            block_item = BlockItemNode(declaration)
+    def parse_block_item(self) -> BlockItemNode | Statement | DeclarationNode:
+        if self.peek() == TokenKind.INT:
+            content = yield self.parse_declaration()
         else:
-            tokens, statement = self.parse_statement(tokens)
-            block_item = BlockItemNode(statement)
-        return tokens, block_item
+            content = yield self.parse_statement()
+        return self.block_item(content)
 
-    def parse_statement(self, tokens) -> tuple[list[Token], Statement]:
-        next_token = tokens[0]
+    def block_item(self, content) -> BlockItemNode | Statement | DeclarationNode:
+        return BlockItemNode(content) if self.block_items else content
 
-        if next_token == Token("OPEN_BRACE"):
-            tokens, block_node = self.parse_block(tokens)
-            return tokens, block_node
+    def parse_statement(self) -> Statement | GeneratorType:
+        # a node, or a generator for statements with statements inside
+        parse = self.statement_parsers.get(self.peek(), self.parse_expression_statement)
+        return parse()
 
-        elif next_token == Token("RETURN"):
-            tokens, _ = self.expect(Token("RETURN"), tokens)
-            tokens, expression = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+    def parse_return(self) -> ReturnNode:
+        self.expect(TokenKind.RETURN)
+        expression = self.parse_expression()
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, ReturnNode(expression)
+        return ReturnNode(expression)
 
-        elif next_token == Token("WHILE"):
-            tokens, _ = self.expect(Token("WHILE"), tokens)
-            tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
-            tokens, condition = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
+    def parse_while(self) -> WhileNode:
+        self.expect(TokenKind.WHILE)
+        self.expect(TokenKind.OPEN_PAREN)
+        condition = self.parse_expression()
+        self.expect(TokenKind.CLOSE_PAREN)
 
-            tokens, body = self.parse_statement(tokens)
+        body = yield self.parse_statement()
 
-            return tokens, WhileNode(condition, body)
+        return WhileNode(condition, body)
 
-        elif next_token == Token("FOR"):
-            tokens, _ = self.expect(Token("FOR"), tokens)
-            tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
+    def parse_for(self) -> ForNode:
+        self.expect(TokenKind.FOR)
+        self.expect(TokenKind.OPEN_PAREN)
 
-            # Parse the initialization statement
-            if tokens[0] == Token("INT"):
-                tokens, declaration = self.parse_variable_declaration(tokens)
-                init_statement = InitDeclNode(declaration)
-            else:
-                if tokens[0] == Token("SEMICOLON"):
-                    tokens = tokens[1:]
-                    init_statement = None
-                else:
-                    tokens, init_statement = self.parse_expression(tokens)
-                    init_statement = InitExprNode(init_statement)
-                    tokens, _ = self.expect(Token("SEMICOLON"), tokens)
-
-            # Parse the condition expression
-            if tokens[0] == Token("SEMICOLON"):
-                tokens = tokens[1:]
-                condition = None
+        # Parse the initialization statement
+        if self.peek() == TokenKind.INT:
+            declaration = self.parse_variable_declaration()
+            init_statement = InitDeclNode(declaration)
+        else:
+            if self.peek() == TokenKind.SEMICOLON:
+                self.advance()
+                init_statement = None
             else:
-                tokens, condition = self.parse_expression(tokens)
-                tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+                init_statement = self.parse_expression()
+                init_statement = InitExprNode(init_statement)
+                self.expect(TokenKind.SEMICOLON)
+
+        # Parse the condition expression
+        if self.peek() == TokenKind.SEMICOLON:
+            self.advance()
+            condition = None
+        else:
+            condition = self.parse_expression()
+            self.expect(TokenKind.SEMICOLON)
 
-            if tokens[0] == Token("CLOSE_PAREN"):
-                post = None
-            else:
-                # Parse the body of the loop
-                tokens, post = self.parse_expression(tokens)
+        if self.peek() == TokenKind.CLOSE_PAREN:
+            post = None
+        else:
+            # Parse the body of the loop
+            post = self.parse_expression()
 
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
+        self.expect(TokenKind.CLOSE_PAREN)
 
-            # Parse the body of the loop
-            tokens, body = self.parse_statement(tokens)
+        # Parse the body of the loop
+        body = yield self.parse_statement()
 
-            return tokens, ForNode(body, init_statement, condition, post)
+        return ForNode(body, init_statement, condition, post)
 
-        elif next_token == Token("BREAK"):
-            tokens, _ = self.expect(Token("BREAK"), tokens)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+    def parse_break(self) -> BreakNode:
+        self.expect(TokenKind.BREAK)
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, BreakNode()
+        return BreakNode()
 
-        elif next_token == Token("CONTINUE"):
-            tokens, _ = self.expect(Token("CONTINUE"), tokens)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+    def parse_continue(self) -> ContinueNode:
+        self.expect(TokenKind.CONTINUE)
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, ContinueNode()
+        return ContinueNode()
 
-        elif next_token == Token("DO"):
-            tokens, _ = self.expect(Token("DO"), tokens)
-            # Special handling for empty statement case
-            if tokens[0] == Token("SEMICOLON"):
-                tokens = tokens[1:]  # Consume the semicolon
-                body = None  # Empty statement
-            else:
-                tokens, body = self.parse_statement(tokens)
+    def parse_do_while(self) -> DoWhileNode:
+        self.expect(TokenKind.DO)
+        # Special handling for empty statement case
+        if self.peek() == TokenKind.SEMICOLON:
+            self.advance()  # Consume the semicolon
+            body = None  # Empty statement
+        else:
+            body = yield self.parse_statement()
 
-            tokens, _ = self.expect(Token("WHILE"), tokens)
-            tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
-            tokens, condition = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+        self.expect(TokenKind.WHILE)
+        self.expect(TokenKind.OPEN_PAREN)
+        condition = self.parse_expression()
+        self.expect(TokenKind.CLOSE_PAREN)
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, DoWhileNode(condition, body)
+        return DoWhileNode(condition, body)
 
-        elif next_token == Token("IF"):
-            tokens, _ = self.expect(Token("IF"), tokens)
-            tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
-            tokens, condition = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
+    def parse_if(self) -> IfNode:
+        self.expect(TokenKind.IF)
+        self.expect(TokenKind.OPEN_PAREN)
+        condition = self.parse_expression()
+        self.expect(TokenKind.CLOSE_PAREN)
 
-            tokens, then_block = self.parse_statement(tokens)
+        then_block = yield self.parse_statement()
 
-            if tokens[0] == Token("ELSE"):
-                tokens = tokens[1:]
-                if tokens[1] == Token("IF"):
-                    tokens, _ = self.expect(Token("IF"), tokens)
-                    tokens, condition = self.parse_expression(tokens)
-                    tokens, then = self.parse_statement(tokens)
-                    else_block = IfNode(condition, then)
+        if self.peek() == TokenKind.ELSE:
+            self.advance()
+            if self.peek(1) == TokenKind.IF:
+                self.expect(TokenKind.IF)
+                condition = self.parse_expression()
+                then = yield self.parse_statement()
+                else_block = IfNode(condition, then)
 
-                else:
-                    tokens, else_block = self.parse_statement(tokens)
             else:
-                else_block = None
+                else_block = yield self.parse_statement()
+        else:
+            else_block = None
 
-            return tokens, IfNode(condition, then_block, else_block)
+        return IfNode(condition, then_block, else_block)
 
-        elif next_token == Token("GOTO"):
-            tokens, _ = self.expect(Token("GOTO"), tokens)
-            tokens, label = self.expect(Token("IDENTIFIER"), tokens)
-            label = label.value
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+    def parse_goto(self) -> GotoNode:
+        self.expect(TokenKind.GOTO)
+        label = self.lexeme(self.expect(TokenKind.IDENTIFIER))
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, GotoNode(label)
-        elif next_token == Token("IDENTIFIER") and tokens[1] == Token("COLON"):
-            label_name = next_token.value
-            # label = LabelNode(label_name)
-            tokens = tokens[2:]  # Skip the identifier and colon
+        return GotoNode(label)
 
-            # Check if we're at a declaration (which would be invalid in C17)
-            if tokens[0] == Token("INT"):
-                raise Exception(
-                    f"Syntax Error: Label '{label_name}' cannot be followed by a declaration in C17"
-                )
-            if tokens[0] == Token("CLOSE_BRACE"):
-                raise Exception(
-                    f"Syntax Error: Label '{label_name}' has nothing after it"
-                )
+    def parse_identifier_statement(self) -> Statement:
+        if self.peek(1) != TokenKind.COLON:
+            return self.parse_expression_statement()
 
-            # If we're at an empty statement (semicolon), consume it and return the label
-            if tokens[0] == Token("SEMICOLON"):
-                tokens = tokens[1:]  # Skip the semicolon
-                return tokens, LabeledStatementNode(label_name, None)
-
-            # If we're at a regular statement, parse it
-            tokens, statement = self.parse_statement(tokens)
-            # If there's an empty statement after the label
-            return tokens, LabeledStatementNode(label_name, statement)
-
-        elif next_token == Token("SWITCH"):
-            tokens, _ = self.expect(Token("SWITCH"), tokens)
-            tokens, _ = self.expect(Token("OPEN_PAREN"), tokens)
-            tokens, condition = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-
-            tokens, body = self.parse_statement(tokens)
-
-            # Extract all case and default nodes from the body
-            switch_body = []
-            default = None
-
-            if isinstance(body, DefaultNode):
-                default = body
-                switch_body.append(BlockItemNode(body))
-            elif isinstance(body, CaseNode):
-                switch_body.append(BlockItemNode(body))
-
-            # If the body is a block node, we need to extract case and default statements
-            elif isinstance(body, BlockNode):
-                current_case = None
-
-                for item in body.children:
-                    content = item.child
-
-                    if isinstance(content, CaseNode):
-                        # Found a new case node
-                        switch_body.append(BlockItemNode(content))
-                        current_case = content
-
-                    elif isinstance(content, DefaultNode) or default:
-                        # Found the default node
-                        if default is not None:  # and content is default:
-                            raise Exception(
-                                "Switch statement can't have multiple default clauses"
-                            )
-                        default = content  # used just to check if we've already added a default
-                        current_case = None
-                        switch_body.append(BlockItemNode(content))
-
-                    elif current_case and content is not None:
-                        # This statement belongs to the current case
-                        # Append it to the current case's statement list
-                        if current_case.body is None:
-                            current_case.body = [content]
-                        elif isinstance(content, list):
-                            current_case.body.extend(BlockItemNode(content))
-                        else:
-                            current_case.body.append(BlockItemNode(content))
+        label_name = self.lexeme(self.position)
+        # label = LabelNode(label_name)
+        self.advance()  # Skip the identifier and colon
+        self.advance()
+
+        # Check if we're at a declaration (which would be invalid in C17)
+        if self.peek() == TokenKind.INT:
+            raise Exception(
+                f"Syntax Error: Label '{label_name}' cannot be followed by a declaration in C17"
+            )
+        if self.peek() == TokenKind.CLOSE_BRACE:
+            raise Exception(f"Syntax Error: Label '{label_name}' has nothing after it")
+
+        # If we're at an empty statement (semicolon), consume it and return the label
+        if self.peek() == TokenKind.SEMICOLON:
+            self.advance()  # Skip the semicolon
+            return LabeledStatementNode(label_name, None)
+
+        # If we're at a regular statement, parse it
+        statement = yield self.parse_statement()
+        # If there's an empty statement after the label
+        return LabeledStatementNode(label_name, statement)
+
+    def parse_switch(self) -> SwitchNode:
+        self.expect(TokenKind.SWITCH)
+        self.expect(TokenKind.OPEN_PAREN)
+        condition = self.parse_expression()
+        self.expect(TokenKind.CLOSE_PAREN)
+
+        body = yield self.parse_statement()
+
+        # Extract all case and default nodes from the body
+        switch_body = []
+        default = None
+
+        if isinstance(body, DefaultNode):
+            default = body
+            switch_body.append(self.block_item(body))
+        elif isinstance(body, CaseNode):
+            switch_body.append(self.block_item(body))
+
+        # If the body is a block node, we need to extract case and default statements
+        elif isinstance(body, BlockNode):
+            current_case = None
+
+            for item in body.children:
+                content = item.child if isinstance(item, BlockItemNode) else item
+
+                if isinstance(content, CaseNode):
+                    # Found a new case node
+                    switch_body.append(self.block_item(content))
+                    current_case = content
+
+                elif isinstance(content, DefaultNode) or default:
+                    # Found the default node
+                    if default is not None:  # and content is default:
+                        raise Exception(
+                            "Switch statement can't have multiple default clauses"
+                        )
+                    # used just to check if we've already added a default
+                    default = content
+                    current_case = None
+                    switch_body.append(self.block_item(content))
+
+                elif current_case and content is not None:
+                    # This statement belongs to the current case
+                    # Append it to the current case's statement list
+                    if current_case.body is None:
+                        current_case.body = [content]
+                    elif isinstance(content, list):
+                        current_case.body.extend(self.block_item(content))
                     else:
-                        # This is a statement outside any case/default - keep it
-                        switch_body.append(item)
+                        current_case.body.append(self.block_item(content))
+                else:
+                    # This is a statement outside any case/default - keep it
+                    switch_body.append(item)
 
-            return tokens, SwitchNode(condition, BlockNode(switch_body))
+        return SwitchNode(condition, BlockNode(switch_body))
 
-        elif next_token == Token("CASE"):
-            tokens, _ = self.expect(Token("CASE"), tokens)
-            tokens, expression = self.parse_expression(tokens)
+    def parse_case(self) -> CaseNode:
+        self.expect(TokenKind.CASE)
+        expression = self.parse_expression()
 
-            tokens, _ = self.expect(Token("COLON"), tokens)
+        self.expect(TokenKind.COLON)
 
-            if tokens[0] in [Token("CASE"), Token("DEFAULT"), Token("CLOSE_BRACE")]:
-                # Empty case body - no statements
-                return tokens, CaseNode(
-                    expression, [None]
-                )  # Use [None] or [] to indicate empty body
+        if self.peek() in [TokenKind.CASE, TokenKind.DEFAULT, TokenKind.CLOSE_BRACE]:
+            # Empty case body - no statements
+            return CaseNode(
+                expression, [None]
+            )  # Use [None] or [] to indicate empty body
 
-            tokens, statement = self.parse_statement(tokens)
+        statement = yield self.parse_statement()
 
-            return tokens, CaseNode(expression, [statement])
+        return CaseNode(expression, [statement])
 
-        elif next_token == Token("DEFAULT"):
-            tokens, _ = self.expect(Token("DEFAULT"), tokens)
-            tokens, _ = self.expect(Token("COLON"), tokens)
-            tokens, statement = self.parse_statement(tokens)
+    def parse_default(self) -> DefaultNode:
+        self.expect(TokenKind.DEFAULT)
+        self.expect(TokenKind.COLON)
+        statement = yield self.parse_statement()
 
-            return tokens, DefaultNode([statement])
+        return DefaultNode([statement])
 
-        elif next_token == Token("SEMICOLON"):
-            tokens = tokens[1:]
-            return tokens, None
-        else:
-            tokens, expression = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("SEMICOLON"), tokens)
+    def parse_empty_statement(self) -> None:
+        self.advance()
+        return None
+
+    def parse_expression_statement(self) -> ExpressionNode:
+        expression = self.parse_expression()
+        self.expect(TokenKind.SEMICOLON)
 
-            return tokens, expression
+        return expression
 
-    def parse_declaration(self, tokens) -> tuple[list[Token], DeclarationNode]:
-        if tokens[2] == Token("OPEN_PAREN"):
+    def parse_declaration(self) -> DeclarationNode:
+        if self.peek(2) == TokenKind.OPEN_PAREN:
             # Function declaration
-            tokens, function = self.parse_function(tokens)
-            return tokens, function
+            function = self.parse_function()
+            return function
         else:
             # Variable declaration
-            tokens, variable_declaration = self.parse_variable_declaration(tokens)
-            return tokens, variable_declaration
-
-    def parse_conditional_middle(self, tokens) -> tuple[list[Token], ExpressionNode]:
-        tokens, _ = self.expect(Token("QUESTION_MARK"), tokens)
-        tokens, middle = self.parse_expression(tokens)
-        tokens, _ = self.expect(Token("COLON"), tokens)
-        return tokens, middle
-
-    def parse_expression(
-        self, tokens, min_prec: int = 0
-    ) -> tuple[list[Token], ExpressionNode]:
-        tokens, left = self.parse_factor(tokens)
-        next_token = tokens[0]
-
-        while (
-            next_token in BINARY_TOKENS
-            and TOKEN_PRECEDENCE[next_token.type] >= min_prec
-        ):
-            if next_token in [  # handle assignment operators
-                Token(equal_node.name) for equal_node in EqualAssignOperatorNode
-            ]:
-                tokens = tokens[1:]  # consume the assignment operator
-                tokens, right = self.parse_expression(
-                    tokens, TOKEN_PRECEDENCE[next_token.type]
-                )
-                left = AssignmentNode(
-                    left, right, EqualAssignOperatorNode[next_token.type]
-                )
-
-            elif next_token == Token("QUESTION_MARK"):
-                tokens, middle = self.parse_conditional_middle(tokens)
-                tokens, right = self.parse_expression(
-                    tokens, TOKEN_PRECEDENCE[next_token.type]
-                )
+            variable_declaration = self.parse_variable_declaration()
+            return variable_declaration
+
+    def parse_conditional_middle(self) -> ExpressionNode:
+        self.expect(TokenKind.QUESTION_MARK)
+        middle = self.parse_expression()
+        self.expect(TokenKind.COLON)
+        return middle
+
+    def parse_expression(self, min_prec: int = 0) -> ExpressionNode:
+        # Pratt loop: keep taking operators that bind at least as tightly as min_prec,
+        # non-operators have a binding power of -1 so they always stop it
+        kinds = self.kinds
+        left = self.parse_factor()
+        kind = kinds[self.position]
+
+        while BINDING_POWER[kind] >= min_prec:
+            precedence = BINDING_POWER[kind]
+            assignment = ASSIGNMENT_OPERATOR_NODES[kind]
+            if assignment is not None:  # handle assignment operators
+                self.advance()  # consume the assignment operator
+                right = self.parse_expression(precedence)
+                left = AssignmentNode(left, right, assignment)
+
+            elif kind == TokenKind.QUESTION_MARK:
+                middle = self.parse_conditional_middle()
+                right = self.parse_expression(precedence)
                 left = ConditionalNode(left, middle, right)
 
             else:
-                if isinstance(left, UnaryNode):
-                    operator = self.parse_binary_operator(
-                        next_token, left.operator == UnaryOperatorNode.NEGATE
-                    )
-                elif isinstance(left, BinaryNode):
-                    operator = self.parse_binary_operator(next_token, False)
-                elif isinstance(left, VarNode):
-                    operator = self.parse_binary_operator(next_token, False)
-                elif isinstance(left, ConstantNode):
-                    operator = self.parse_binary_operator(next_token, False)
-                elif isinstance(left, AssignmentNode):
-                    operator = self.parse_binary_operator(next_token, False)
-                elif isinstance(left, FunctionCallNode):
-                    operator = self.parse_binary_operator(next_token, False)
-                else:
+                if type(left) not in BINARY_LEFT_OPERANDS:
                     raise Exception(f"Unexpected left operand type {type(left)}")
-                tokens = tokens[1:]
-                tokens, right = self.parse_expression(
-                    tokens, TOKEN_PRECEDENCE[next_token.type] + 1
-                )
+                operator = BINARY_OPERATOR_NODES[kind]
+                if isinstance(operator, tuple):
+                    # if the left value is negated, then the shift is arithmetic
+                    negated = (
+                        type(left) is UnaryNode
+                        and left.operator == UnaryOperatorNode.NEGATE
+                    )
+                    operator = operator[negated]
+                self.advance()
+                right = self.parse_expression(precedence + 1)
                 left = BinaryNode(operator, left, right)
 
-            next_token = tokens[0]
-
-        return tokens, left
+            kind = kinds[self.position]
+
+        return left
+
+    def parse_expression_iterative(self, min_prec: int = 0) -> ExpressionNode:
+        # Builds the same trees as parse_expression, but whatever is still waiting for
+        # its operand (prefix operators, parentheses, call arguments and the left side
+        # of an operator) goes on an explicit stack instead of into a Python frame.
+        kinds = self.kinds
+        stack = []
+        while True:
+            # go down into a factor until reaching a constant or variable
+            kind = kinds[self.position]
+            if kind == TokenKind.CONSTANT:
+                operand = self.parse_constant()
+
+            elif UNARY_OPERATOR_NODES[kind] is not None:
+                stack.append((UNARY, min_prec, UNARY_OPERATOR_NODES[kind]))
+                self.advance()
+                continue
+
+            elif kind == TokenKind.OPEN_PAREN:
+                self.advance()
+                stack.append((PAREN, min_prec, None))
+                min_prec = 0
+                continue
+
+            elif kind == TokenKind.IDENTIFIER:
+                identifier = self.lexeme(self.advance())
+                if not self.at_end() and self.peek() in POSTFIX_KINDS:
+                    operator = UNARY_OPERATOR_NODES[self.peek()]
+                    self.advance()
+                    operand = UnaryNode(VarNode(identifier), operator, True)
+                elif self.peek() == TokenKind.OPEN_PAREN:
+                    self.advance()
+                    if self.peek() == TokenKind.CLOSE_PAREN:
+                        self.advance()
+                        operand = FunctionCallNode(identifier, [])
+                    else:
+                        if self.peek() == TokenKind.COMMA:
+                            self.advance()
+                        stack.append((CALL, min_prec, (identifier, [])))
+                        min_prec = 0
+                        continue
+                else:
+                    operand = VarNode(identifier)
+            else:
+                raise Exception(
+                    f"Syntax Error: Unexpected token {self.tokens[self.position]}"
+                )
 
-    def parse_factor(
-        self, tokens
-    ) -> tuple[list[Token], UnaryNode | ExpressionNode | VarNode]:
-        next_token = tokens[0]
-        if next_token.type == "CONSTANT":
-            return self.parse_constant(tokens)
-        elif next_token in UNARY_TOKENS:
-            tokens, operator = self.parse_unary(tokens)
-            tokens, inner_expression = self.parse_factor(tokens)
+            # then back up, finishing everything the operand completes until an
+            # operator needs another operand
+            factor = True
+            while True:
+                if factor:
+                    while stack and stack[-1][0] == UNARY:
+                        operator = stack.pop()[2]
+                        if not self.at_end() and self.peek() in POSTFIX_KINDS:
+                            postfix_operator = UNARY_OPERATOR_NODES[self.peek()]
+                            self.advance()
+                            operand = UnaryNode(operand, postfix_operator, True)
+                        operand = UnaryNode(operand, operator)
+                    factor = False
+
+                kind = kinds[self.position]
+                precedence = BINDING_POWER[kind]
+                if precedence >= min_prec:
+                    assignment = ASSIGNMENT_OPERATOR_NODES[kind]
+                    if assignment is not None:
+                        stack.append((ASSIGN, min_prec, (operand, assignment)))
+                        min_prec = precedence
+                    elif kind == TokenKind.QUESTION_MARK:
+                        stack.append((MIDDLE, min_prec, (operand, precedence)))
+                        min_prec = 0
+                    else:
+                        if type(operand) not in BINARY_LEFT_OPERANDS:
+                            raise Exception(
+                                f"Unexpected left operand type {type(operand)}"
+                            )
+                        operator = BINARY_OPERATOR_NODES[kind]
+                        if isinstance(operator, tuple):
+                            negated = (
+                                type(operand) is UnaryNode
+                                and operand.operator == UnaryOperatorNode.NEGATE
+                            )
+                            operator = operator[negated]
+                        stack.append((BINARY, min_prec, (operand, operator)))
+                        min_prec = precedence + 1
+                    self.advance()
+                    break
+
+                if not stack:
+                    return operand
+                waiting, saved_prec, data = stack.pop()
+                min_prec = saved_prec
+                if waiting == BINARY:
+                    operand = BinaryNode(data[1], data[0], operand)
+                elif waiting == ASSIGN:
+                    operand = AssignmentNode(data[0], operand, data[1])
+                elif waiting == MIDDLE:
+                    self.expect(TokenKind.COLON)
+                    stack.append((CONDITION, saved_prec, (data[0], operand)))
+                    min_prec = data[1]
+                    break
+                elif waiting == CONDITION:
+                    operand = ConditionalNode(data[0], data[1], operand)
+                elif waiting == PAREN:
+                    self.expect(TokenKind.CLOSE_PAREN)
+                    factor = True
+                elif waiting == CALL:
+                    data[1].append(operand)
+                    if self.peek() != TokenKind.CLOSE_PAREN:
+                        if self.peek() == TokenKind.COMMA:
+                            self.advance()
+                        stack.append((CALL, saved_prec, data))
+                        min_prec = 0
+                        break
+                    self.advance()
+                    operand = FunctionCallNode(data[0], data[1])
+                    factor = True
+
+    def parse_factor(self) -> UnaryNode | ExpressionNode | VarNode:
+        kind = self.kinds[self.position]
+        if kind == TokenKind.CONSTANT:
+            return self.parse_constant()
+
+        elif UNARY_OPERATOR_NODES[kind] is not None:
+            operator = UNARY_OPERATOR_NODES[kind]
+            self.advance()
+            inner_expression = self.parse_factor()
 
             # Check for postfix operators after parsing the inner expression
-            if tokens and tokens[0] in [Token("INCREMENT"), Token("DOUBLE_HYPHEN")]:
-                next_token = tokens[0]
-                tokens = tokens[1:]  # consume the token
-                if next_token.type == "INCREMENT":
-                    postfix_operator = UnaryOperatorNode.INCREMENT
-                else:
-                    postfix_operator = UnaryOperatorNode.DECREMENT
+            if not self.at_end() and self.peek() in POSTFIX_KINDS:
+                postfix_operator = UNARY_OPERATOR_NODES[self.peek()]
+                self.advance()  # consume the token
                 inner_expression = UnaryNode(
                     inner_expression, postfix_operator, True
                 )  # Apply postfix first
 
-            return tokens, UnaryNode(inner_expression, operator)
+            return UnaryNode(inner_expression, operator)
 
-        elif next_token.type == "OPEN_PAREN":
-            tokens = tokens[1:]
-            tokens, expression = self.parse_expression(tokens)
-            tokens, _ = self.expect(Token("CLOSE_PAREN"), tokens)
-            return tokens, expression
+        elif kind == TokenKind.OPEN_PAREN:
+            self.advance()
+            expression = self.parse_expression()
+            self.expect(TokenKind.CLOSE_PAREN)
+            return expression
 
-        elif next_token.type == "IDENTIFIER":
-            tokens, identifier = self.expect(Token("IDENTIFIER"), tokens)
+        elif kind == TokenKind.IDENTIFIER:
+            identifier = self.lexeme(self.advance())
             # Check for postfix operators immediately after identifier
-            if tokens and tokens[0] in [Token("INCREMENT"), Token("DOUBLE_HYPHEN")]:
-                next_token = tokens[0]
-                tokens = tokens[1:]  # consume the token
-                if next_token.type == "INCREMENT":
-                    operator = UnaryOperatorNode.INCREMENT
-                else:
-                    operator = UnaryOperatorNode.DECREMENT
-                return tokens, UnaryNode(VarNode(identifier.value), operator, True)
+            if not self.at_end() and self.peek() in POSTFIX_KINDS:
+                operator = UNARY_OPERATOR_NODES[self.peek()]
+                self.advance()  # consume the token
+                return UnaryNode(VarNode(identifier), operator, True)
 
-            elif tokens[0] == Token("OPEN_PAREN"):
+            elif self.peek() == TokenKind.OPEN_PAREN:
                 # Function call
-                tokens, arguments = self.parse_argument_list(tokens)
-                return tokens, FunctionCallNode(identifier.value, arguments)
+                arguments = self.parse_argument_list()
+                return FunctionCallNode(identifier, arguments)
 
-            return tokens, VarNode(identifier.value)
+            return VarNode(identifier)
         else:
-            raise Exception(f"Syntax Error: Unexpected token {next_token}")
-
-    def parse_unary(self, tokens) -> tuple[list[UnaryNode], str]:
-        unary_operator = None
-        if tokens[0].value == "~":
-            unary_operator = UnaryOperatorNode.COMPLEMENT
-        elif tokens[0].value == "-":
-            unary_operator = UnaryOperatorNode.NEGATE
-        elif tokens[0].value == "!":
-            unary_operator = UnaryOperatorNode.NOT
-        elif tokens[0].value == "++":
-            unary_operator = UnaryOperatorNode.INCREMENT
-        elif tokens[0].value == "--":
-            unary_operator = UnaryOperatorNode.DECREMENT
-        else:
-            raise Exception(f"Unrecognised Unary Operator {tokens[0].value}")
-
-        return tokens[1:], unary_operator
-
-    def parse_binary_operator(
-        self, token, negated_left_value
-    ) -> (
-        BinaryOperatorNode
-    ):  # if the left value is negated, then the left shift is arithmetic
-        if token == Token("ADD"):
-            return BinaryOperatorNode.ADD
-        elif token == Token("HYPHEN"):
-            return BinaryOperatorNode.SUBTRACT
-        elif token == Token("MULTIPLY"):
-            return BinaryOperatorNode.MULTIPLY
-        elif token == Token("DIVIDE"):
-            return BinaryOperatorNode.DIVIDE
-        elif token == Token("REMAINDER"):
-            return BinaryOperatorNode.REMAINDER
-        elif token == Token("AND_BITWISE"):
-            return BinaryOperatorNode.AND_BITWISE
-        elif token == Token("OR_BITWISE"):
-            return BinaryOperatorNode.OR_BITWISE
-        elif token == Token("XOR_BITWISE"):
-            return BinaryOperatorNode.XOR_BITWISE
-        elif token == Token("LEFT_SHIFT"):
-            if negated_left_value:
-                return BinaryOperatorNode.LEFT_SHIFT_ARITHMETIC
-            else:
-                return BinaryOperatorNode.LEFT_SHIFT_LOGICAL
-        elif token == Token("RIGHT_SHIFT"):
-            if negated_left_value:
-                return BinaryOperatorNode.RIGHT_SHIFT_ARITHMETIC
-            else:
-                return BinaryOperatorNode.RIGHT_SHIFT_LOGICAL
-        elif token == Token("AND_LOGICAL"):
-            return BinaryOperatorNode.AND_LOGICAL
-        elif token == Token("OR_LOGICAL"):
-            return BinaryOperatorNode.OR_LOGICAL
-        elif token == Token("EQUAL"):
-            return BinaryOperatorNode.EQUAL
-        elif token == Token("NOT_EQUAL"):
-            return BinaryOperatorNode.NOT_EQUAL
-        elif token == Token("LESS_OR_EQUAL"):
-            return BinaryOperatorNode.LESS_OR_EQUAL
-        elif token == Token("GREATER_OR_EQUAL"):
-            return BinaryOperatorNode.GREATER_OR_EQUAL
-        elif token == Token("LESS_THAN"):
-            return BinaryOperatorNode.LESS_THAN
-        elif token == Token("GREATER_THAN"):
-            return BinaryOperatorNode.GREATER_THAN
-        elif token == Token("LEFT_SHIFT_ASSIGN"):
-            return BinaryOperatorNode.LEFT_SHIFT_ASSIGN
-        elif token == Token("RIGHT_SHIFT_ASSIGN"):
-            return BinaryOperatorNode.RIGHT_SHIFT_ASSIGN
-        elif token == Token("ADD_ASSIGN"):
-            return BinaryOperatorNode.ADD_ASSIGN
-        elif token == Token("SUB_ASSIGN"):
-            return BinaryOperatorNode.SUB_ASSIGN
-        elif token == Token("MULT_ASSIGN"):
-            return BinaryOperatorNode.MULT_ASSIGN
-        elif token == Token("DIV_ASSIGN"):
-            return BinaryOperatorNode.DIV_ASSIGN
-        elif token == Token("AND_ASSIGN"):
-            return BinaryOperatorNode.AND_ASSIGN
-        elif token == Token("OR_ASSIGN"):
-            return BinaryOperatorNode.OR_ASSIGN
-        elif token == Token("XOR_ASSIGN"):
-            return BinaryOperatorNode.XOR_ASSIGN
-        elif token == Token("REM_ASSIGN"):
-            return BinaryOperatorNode.REM_ASSIGN
-        else:
-            raise Exception(f"Unrecognised Binary Operator {token.value}")
-
-    def parse_constant(self, tokens) -> tuple[list[Token], ConstantNode]:
-        tokens, constant_token = self.expect(Token("CONSTANT"), tokens)
+            raise Exception(
+                f"Syntax Error: Unexpected token {self.tokens[self.position]}"
+            )
 
-        return tokens, ConstantNode(constant_token.value)
+    def parse_constant(self) -> ConstantNode:
+        constant = self.lexeme(self.expect(TokenKind.CONSTANT))
 
-    def expect(self, expected: Token, tokens: list[Token]) -> tuple[list[Token], Token]:
-        if tokens[0].type == expected.type:
-            return tokens[1:], tokens[0]
-        raise Exception(f"Syntax Error: Expected {expected}, got {tokens[0]}")
+        # a leading zero makes the literal octal, as gas read it when we emitted text
+        return ConstantNode(int(constant, 8 if constant[0] == "0" else 10))
 
+    @Visitor
     def pretty_print(self, ast, indent=0):
         """
         Pretty print the AST with proper indentation.
@@ -586,191 +745,238 @@ class Parser:
             indent: Current indentation level (default 0)
         """
         indent_str = "  " * indent
+        print(f"{indent_str}Unknown Node Type: {type(ast).__name__}")
 
-        if isinstance(ast, ProgramNode):
-            print(f"{indent_str}Program:")
-            for function in ast.functions:
-                self.pretty_print(function, indent + 1)
-
-        elif isinstance(ast, FunctionDeclarationNode):
-            if ast.body:
-                print(f"{indent_str}Function: {ast.identifier}")
-                # print(f"{indent_str}Return Type: {ast.return_type}")
-                # print(f"{indent_str}Parameters: {', '.join(str(ast.params)}")\
-                for param in ast.params:
-                    print(f"{indent_str}    Parameter: {param}")
-                print(f"{indent_str}Body:")
-                self.pretty_print(ast.body, indent + 1)
-            else:
-                print(f"{indent_str}Function Declaration: {ast.identifier}")
-                # print(f"{indent_str}Return Type: {ast.return_type}")
-                # print(f"{indent_str}    Parameters: {', '.join(ast.params)}")
-                for param in ast.params:
-                    print(f"{indent_str}    Parameter: {param}")
-
-        elif isinstance(ast, BlockNode):
-            print(f"{indent_str}Block:")
-            for child in ast.children:
-                self.pretty_print(child, indent + 1)
-
-        elif isinstance(ast, BlockItemNode):
-            self.pretty_print(ast.child, indent)
-
-        elif isinstance(ast, DeclarationNode):
-            init_str = ""
-            if ast.exp:
-                init_str = f" = {ast.exp}"
-            print(f"{indent_str}Declaration: {ast.identifier}{init_str}")
-
-        elif isinstance(ast, ReturnNode):
-            print(f"{indent_str}Return:")
-            self.pretty_print(ast.exp, indent + 1)
-
-        elif isinstance(ast, IfNode):
-            print(f"{indent_str}If:")
-            print(f"{indent_str}  Condition:")
-            self.pretty_print(ast.condition, indent + 2)
-            print(f"{indent_str}  Then:")
-            self.pretty_print(ast.then, indent + 2)
-            if ast.else_:
-                print(f"{indent_str}  Else:")
-                self.pretty_print(ast.else_, indent + 2)
-
-        elif isinstance(ast, WhileNode):
-            print(f"{indent_str}While (label: {ast.label or 'None'}):")
-            print(f"{indent_str}  Condition:")
-            self.pretty_print(ast.condition, indent + 2)
-            print(f"{indent_str}  Body:")
-            self.pretty_print(ast.body, indent + 2)
-
-        elif isinstance(ast, DoWhileNode):
-            print(f"{indent_str}Do-While (label: {ast.label or 'None'}):")
-            print(f"{indent_str}  Body:")
-            self.pretty_print(ast.body, indent + 2)
-            print(f"{indent_str}  Condition:")
-            self.pretty_print(ast.condition, indent + 2)
+    @pretty_print.register(ProgramNode)
+    def pretty_print_program(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Program:")
+        for function in ast.functions:
+            self.pretty_print(function, indent + 1)
 
-        elif isinstance(ast, ForNode):
-            print(f"{indent_str}For (label: {ast.label or 'None'}):")
-            print(f"{indent_str}  Init:")
-            if ast.init:
-                self.pretty_print(ast.init, indent + 2)
-            else:
-                print(f"{indent_str}    None")
-            print(f"{indent_str}  Condition:")
-            if ast.condition:
-                self.pretty_print(ast.condition, indent + 2)
-            else:
-                print(f"{indent_str}    None")
-            print(f"{indent_str}  Update:")
-            if ast.post:
-                self.pretty_print(ast.post, indent + 2)
-            else:
-                print(f"{indent_str}    None")
-            print(f"{indent_str}  Body:")
-            self.pretty_print(ast.body, indent + 2)
+    @pretty_print.register(FunctionDeclarationNode)
+    def pretty_print_function(self, ast, indent=0):
+        indent_str = "  " * indent
+        if ast.body:
+            print(f"{indent_str}Function: {ast.identifier}")
+            # print(f"{indent_str}Return Type: {ast.return_type}")
+            # print(f"{indent_str}Parameters: {', '.join(str(ast.params)}")\
+            for param in ast.params:
+                print(f"{indent_str}    Parameter: {param}")
+            print(f"{indent_str}Body:")
+            self.pretty_print(ast.body, indent + 1)
+        else:
+            print(f"{indent_str}Function Declaration: {ast.identifier}")
+            # print(f"{indent_str}Return Type: {ast.return_type}")
+            # print(f"{indent_str}    Parameters: {', '.join(ast.params)}")
+            for param in ast.params:
+                print(f"{indent_str}    Parameter: {param}")
+
+    @pretty_print.register(BlockNode)
+    def pretty_print_block(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Block:")
+        for child in ast.children:
+            self.pretty_print(child, indent + 1)
 
-        elif isinstance(ast, SwitchNode):
-            print(f"{indent_str}Switch ({ast.label}):")
-            if ast.case_targets:
-                print(f"{indent_str}  Case Targets:")
-                for case_target in ast.case_targets:
-                    print(f"{indent_str}    {case_target}")
-            if ast.default_target:
-                print(f"{indent_str}  Default:")
-                print(f"{indent_str}    {ast.default_target}")
-            print(f"{indent_str}  Expression:")
-            self.pretty_print(ast.condition, indent + 2)
+    @pretty_print.register(BlockItemNode)
+    def pretty_print_block_item(self, ast, indent=0):
+        self.pretty_print(ast.child, indent)
 
-            print(f"{indent_str}  Body:")
-            self.pretty_print(ast.body, indent + 2)
+    @pretty_print.register(DeclarationNode)
+    def pretty_print_declaration(self, ast, indent=0):
+        indent_str = "  " * indent
+        init_str = ""
+        if ast.exp:
+            init_str = f" = {ast.exp}"
+        print(f"{indent_str}Declaration: {ast.identifier}{init_str}")
 
-        elif isinstance(ast, CaseNode):
-            print(f"{indent_str}Case ({ast.label}):")
-            print(f"{indent_str}  Condition:")
-            self.pretty_print(ast.condition, indent + 2)
-            print(f"{indent_str}  Statement:")
-            if ast.body:
-                self.pretty_print(ast.body, indent + 2)
+    @pretty_print.register(ReturnNode)
+    def pretty_print_return(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Return:")
+        self.pretty_print(ast.exp, indent + 1)
 
-            else:
-                print(f"{indent_str}    None")
+    @pretty_print.register(IfNode)
+    def pretty_print_if(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}If:")
+        print(f"{indent_str}  Condition:")
+        self.pretty_print(ast.condition, indent + 2)
+        print(f"{indent_str}  Then:")
+        self.pretty_print(ast.then, indent + 2)
+        if ast.else_:
+            print(f"{indent_str}  Else:")
+            self.pretty_print(ast.else_, indent + 2)
 
-        elif isinstance(ast, DefaultNode):
-            print(f"{indent_str}Default ({ast.label}):")
-            if ast.body:
-                self.pretty_print(ast.body, indent + 1)
-            else:
-                print(f"{indent_str}  None")
+    @pretty_print.register(WhileNode)
+    def pretty_print_while(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}While (label: {ast.label or 'None'}):")
+        print(f"{indent_str}  Condition:")
+        self.pretty_print(ast.condition, indent + 2)
+        print(f"{indent_str}  Body:")
+        self.pretty_print(ast.body, indent + 2)
+
+    @pretty_print.register(DoWhileNode)
+    def pretty_print_do_while(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Do-While (label: {ast.label or 'None'}):")
+        print(f"{indent_str}  Body:")
+        self.pretty_print(ast.body, indent + 2)
+        print(f"{indent_str}  Condition:")
+        self.pretty_print(ast.condition, indent + 2)
+
+    @pretty_print.register(ForNode)
+    def pretty_print_for(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}For (label: {ast.label or 'None'}):")
+        print(f"{indent_str}  Init:")
+        if ast.init:
+            self.pretty_print(ast.init, indent + 2)
+        else:
+            print(f"{indent_str}    None")
+        print(f"{indent_str}  Condition:")
+        if ast.condition:
+            self.pretty_print(ast.condition, indent + 2)
+        else:
+            print(f"{indent_str}    None")
+        print(f"{indent_str}  Update:")
+        if ast.post:
+            self.pretty_print(ast.post, indent + 2)
+        else:
+            print(f"{indent_str}    None")
+        print(f"{indent_str}  Body:")
+        self.pretty_print(ast.body, indent + 2)
 
-        elif isinstance(ast, BreakNode):
-            print(
-                f"{indent_str}Break (target: {ast.label if hasattr(ast, 'label') else 'None'})"
-            )
+    @pretty_print.register(SwitchNode)
+    def pretty_print_switch(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Switch ({ast.label}):")
+        if ast.case_targets:
+            print(f"{indent_str}  Case Targets:")
+            for case_target in ast.case_targets:
+                print(f"{indent_str}    {case_target}")
+        if ast.default_target:
+            print(f"{indent_str}  Default:")
+            print(f"{indent_str}    {ast.default_target}")
+        print(f"{indent_str}  Expression:")
+        self.pretty_print(ast.condition, indent + 2)
+
+        print(f"{indent_str}  Body:")
+        self.pretty_print(ast.body, indent + 2)
+
+    @pretty_print.register(CaseNode)
+    def pretty_print_case(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Case ({ast.label}):")
+        print(f"{indent_str}  Condition:")
+        self.pretty_print(ast.condition, indent + 2)
+        print(f"{indent_str}  Statement:")
+        if ast.body:
+            self.pretty_print(ast.body, indent + 2)
 
-        elif isinstance(ast, ContinueNode):
-            print(
-                f"{indent_str}Continue (target: {ast.label if hasattr(ast, 'label') else 'None'})"
-            )
+        else:
+            print(f"{indent_str}    None")
 
-        elif isinstance(ast, GotoNode):
-            print(f"{indent_str}Goto: {ast.label}")
+    @pretty_print.register(DefaultNode)
+    def pretty_print_default(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Default ({ast.label}):")
+        if ast.body:
+            self.pretty_print(ast.body, indent + 1)
+        else:
+            print(f"{indent_str}  None")
 
-        elif isinstance(ast, LabeledStatementNode):
-            print(f"{indent_str}Label: {ast.label}")
-            if ast.child:
-                self.pretty_print(ast.child, indent + 1)
+    @pretty_print.register(BreakNode)
+    def pretty_print_break(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(
+            f"{indent_str}Break (target: {ast.label if hasattr(ast, 'label') else 'None'})"
+        )
 
-        elif isinstance(ast, VarNode):
-            print(f"{indent_str}Variable: {ast.identifier}")
+    @pretty_print.register(ContinueNode)
+    def pretty_print_continue(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(
+            f"{indent_str}Continue (target: {ast.label if hasattr(ast, 'label') else 'None'})"
+        )
 
-        elif isinstance(ast, ConstantNode):
-            print(f"{indent_str}Constant: {ast.value}")
+    @pretty_print.register(GotoNode)
+    def pretty_print_goto(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Goto: {ast.label}")
 
-        elif isinstance(ast, BinaryNode):
-            print(f"{indent_str}Binary Operation: {ast.operator}")
-            print(f"{indent_str}  Left:")
-            self.pretty_print(ast.exp_1, indent + 2)
-            print(f"{indent_str}  Right:")
-            self.pretty_print(ast.exp_2, indent + 2)
+    @pretty_print.register(LabeledStatementNode)
+    def pretty_print_labeled_statement(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Label: {ast.label}")
+        if ast.child:
+            self.pretty_print(ast.child, indent + 1)
 
-        elif isinstance(ast, UnaryNode):
-            position = "Postfix" if ast.postfix else "Prefix"
-            print(f"{indent_str}{position} Unary Operation: {ast.operator}")
-            print(f"{indent_str}  Operand:")
-            self.pretty_print(ast.exp, indent + 2)
+    @pretty_print.register(VarNode)
+    def pretty_print_var(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Variable: {ast.identifier}")
 
-        elif isinstance(ast, AssignmentNode):
-            print(
-                f"{indent_str}Assignment: {ast.type if hasattr(ast, 'type') else '='}"
-            )
-            print(f"{indent_str}  Left:")
-            self.pretty_print(ast.lvalue, indent + 2)
-            print(f"{indent_str}  Right:")
-            self.pretty_print(ast.rvalue, indent + 2)
-
-        elif isinstance(ast, ConditionalNode):
-            print(f"{indent_str}Conditional (Ternary):")
-            print(f"{indent_str}  Condition:")
-            self.pretty_print(ast.condition, indent + 2)
-            print(f"{indent_str}  Then:")
-            self.pretty_print(ast.then, indent + 2)
-            print(f"{indent_str}  Else:")
-            self.pretty_print(ast.else_, indent + 2)
+    @pretty_print.register(ConstantNode)
+    def pretty_print_constant(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Constant: {ast.value}")
 
-        elif isinstance(ast, list):
-            print(f"{indent_str}List:")
-            for item in ast:
-                self.pretty_print(item, indent + 2)
+    @pretty_print.register(BinaryNode)
+    def pretty_print_binary(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Binary Operation: {ast.operator}")
+        print(f"{indent_str}  Left:")
+        self.pretty_print(ast.exp_1, indent + 2)
+        print(f"{indent_str}  Right:")
+        self.pretty_print(ast.exp_2, indent + 2)
+
+    @pretty_print.register(UnaryNode)
+    def pretty_print_unary(self, ast, indent=0):
+        indent_str = "  " * indent
+        position = "Postfix" if ast.postfix else "Prefix"
+        print(f"{indent_str}{position} Unary Operation: {ast.operator}")
+        print(f"{indent_str}  Operand:")
+        self.pretty_print(ast.exp, indent + 2)
 
-        elif isinstance(ast, FunctionCallNode):
-            print(f"{indent_str}Function Call: {ast.identifier}")
-            print(f"{indent_str}  Arguments:")
-            for arg in ast.arguments:
-                self.pretty_print(arg, indent + 2)
+    @pretty_print.register(AssignmentNode)
+    def pretty_print_assignment(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Assignment: {ast.type if hasattr(ast, 'type') else '='}")
+        print(f"{indent_str}  Left:")
+        self.pretty_print(ast.lvalue, indent + 2)
+        print(f"{indent_str}  Right:")
+        self.pretty_print(ast.rvalue, indent + 2)
+
+    @pretty_print.register(ConditionalNode)
+    def pretty_print_conditional(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Conditional (Ternary):")
+        print(f"{indent_str}  Condition:")
+        self.pretty_print(ast.condition, indent + 2)
+        print(f"{indent_str}  Then:")
+        self.pretty_print(ast.then, indent + 2)
+        print(f"{indent_str}  Else:")
+        self.pretty_print(ast.else_, indent + 2)
+
+    @pretty_print.register(list, FlatList)
+    def pretty_print_list(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}List:")
+        for item in ast:
+            self.pretty_print(item, indent + 2)
 
-        elif ast is None:
-            print(f"{indent_str}None")
+    @pretty_print.register(FunctionCallNode)
+    def pretty_print_function_call(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}Function Call: {ast.identifier}")
+        print(f"{indent_str}  Arguments:")
+        for arg in ast.arguments:
+            self.pretty_print(arg, indent + 2)
 
-        else:
-            print(f"{indent_str}Unknown Node Type: {type(ast).__name__}")
+    @pretty_print.register(type(None))
+    def pretty_print_none(self, ast, indent=0):
+        indent_str = "  " * indent
+        print(f"{indent_str}None")
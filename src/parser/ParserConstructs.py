@@ -4,7 +4,7 @@ from typing import Self
 import sys
 
 sys.path.append("..")
-from Lexer import Token
+from Lexer import Token, TokenKind, TOKEN_NAMES
 
 
 class UnaryOperatorNode(Enum):
@@ -101,8 +101,6 @@ TOKEN_PRECEDENCE = {
     "LEFT_SHIFT_ASSIGN": 3,
     "RIGHT_SHIFT_ASSIGN": 3,
     "QUESTION_MARK": 4,
-    "OR_LOGICAL": 5,
-    "AND_LOGICAL": 6,
     "OR_LOGICAL": 7,
     "AND_LOGICAL": 8,
     "OR_BITWISE": 9,
@@ -121,53 +119,63 @@ TOKEN_PRECEDENCE = {
     "MULTIPLY": 16,
     "DIVIDE": 16,
     "REMAINDER": 16,
-    "INCREMENT": 17,
-    "DOUBLE_HYPHEN": 17,
 }
 
-UNARY_TOKENS = [
-    Token("TILDA"),
-    Token("HYPHEN"),
-    Token("NOT"),
-    Token("INCREMENT"),
-    Token("DOUBLE_HYPHEN"),
-]
+UNARY_OPERATORS = {
+    "TILDA": UnaryOperatorNode.COMPLEMENT,
+    "HYPHEN": UnaryOperatorNode.NEGATE,
+    "NOT": UnaryOperatorNode.NOT,
+    "INCREMENT": UnaryOperatorNode.INCREMENT,
+    "DOUBLE_HYPHEN": UnaryOperatorNode.DECREMENT,
+}
+
+# (logical, arithmetic) for the shifts, arithmetic is used when the left operand is
+# negated
+BINARY_OPERATORS = {
+    "ADD": BinaryOperatorNode.ADD,
+    "HYPHEN": BinaryOperatorNode.SUBTRACT,
+    "MULTIPLY": BinaryOperatorNode.MULTIPLY,
+    "DIVIDE": BinaryOperatorNode.DIVIDE,
+    "REMAINDER": BinaryOperatorNode.REMAINDER,
+    "AND_BITWISE": BinaryOperatorNode.AND_BITWISE,
+    "OR_BITWISE": BinaryOperatorNode.OR_BITWISE,
+    "XOR_BITWISE": BinaryOperatorNode.XOR_BITWISE,
+    "LEFT_SHIFT": (
+        BinaryOperatorNode.LEFT_SHIFT_LOGICAL,
+        BinaryOperatorNode.LEFT_SHIFT_ARITHMETIC,
+    ),
+    "RIGHT_SHIFT": (
+        BinaryOperatorNode.RIGHT_SHIFT_LOGICAL,
+        BinaryOperatorNode.RIGHT_SHIFT_ARITHMETIC,
+    ),
+    "AND_LOGICAL": BinaryOperatorNode.AND_LOGICAL,
+    "OR_LOGICAL": BinaryOperatorNode.OR_LOGICAL,
+    "EQUAL": BinaryOperatorNode.EQUAL,
+    "NOT_EQUAL": BinaryOperatorNode.NOT_EQUAL,
+    "LESS_OR_EQUAL": BinaryOperatorNode.LESS_OR_EQUAL,
+    "GREATER_OR_EQUAL": BinaryOperatorNode.GREATER_OR_EQUAL,
+    "LESS_THAN": BinaryOperatorNode.LESS_THAN,
+    "GREATER_THAN": BinaryOperatorNode.GREATER_THAN,
+}
 
-BINARY_TOKENS = [
-    Token("EQUAL_ASSIGN"),
-    Token("ADD"),
-    Token("HYPHEN"),
-    Token("MULTIPLY"),
-    Token("DIVIDE"),
-    Token("REMAINDER"),
-    Token("AND_BITWISE"),
-    Token("OR_BITWISE"),
-    Token("XOR_BITWISE"),
-    Token("LEFT_SHIFT"),
-    Token("RIGHT_SHIFT"),
-    Token("AND_LOGICAL"),
-    Token("OR_LOGICAL"),
-    Token("EQUAL"),
-    Token("NOT_EQUAL"),
-    Token("LESS_OR_EQUAL"),
-    Token("GREATER_OR_EQUAL"),
-    Token("LESS_THAN"),
-    Token("GREATER_THAN"),
-    Token("LEFT_SHIFT_ASSIGN"),
-    Token("RIGHT_SHIFT_ASSIGN"),
-    Token("ADD_ASSIGN"),
-    Token("SUB_ASSIGN"),
-    Token("MULT_ASSIGN"),
-    Token("DIV_ASSIGN"),
-    Token("REM_ASSIGN"),
-    Token("AND_ASSIGN"),
-    Token("OR_ASSIGN"),
-    Token("XOR_ASSIGN"),
-    Token("QUESTION_MARK"),
+# Lookup tables indexed by TokenKind for the Pratt parser, -1/None where the token
+# isn't that kind of operator
+BINDING_POWER = [TOKEN_PRECEDENCE.get(name, -1) for name in TOKEN_NAMES]
+UNARY_OPERATOR_NODES = [UNARY_OPERATORS.get(name) for name in TOKEN_NAMES]
+BINARY_OPERATOR_NODES = [BINARY_OPERATORS.get(name) for name in TOKEN_NAMES]
+ASSIGNMENT_OPERATOR_NODES = [
+    (
+        EqualAssignOperatorNode[name]
+        if name in EqualAssignOperatorNode.__members__
+        else None
+    )
+    for name in TOKEN_NAMES
 ]
 
 
 class ExpressionNode:
+    __slots__ = ()
+
     def __init__(
         self,
     ):
@@ -178,6 +186,8 @@ class ExpressionNode:
 
 
 class Statement:
+    __slots__ = ("child",)
+
     def __init__(self, child) -> None:
         self.child = child
 
@@ -186,6 +196,8 @@ class Statement:
 
 
 class ReturnNode(Statement):
+    __slots__ = ("exp",)
+
     def __init__(self, exp: ExpressionNode) -> None:
         self.exp = exp
 
@@ -196,6 +208,8 @@ class ReturnNode(Statement):
 class LabeledStatementNode(Statement):
     """Represents a label attached to a statement."""
 
+    __slots__ = ("label",)
+
     def __init__(self, label: str, child: ReturnNode | ExpressionNode | None):
         super().__init__(child)
         self.label = label
@@ -208,6 +222,8 @@ class LabeledStatementNode(Statement):
 
 
 class DeclarationNode:
+    __slots__ = ("identifier", "exp")
+
     def __init__(self, identifier: str, exp: ExpressionNode | None) -> None:
         self.identifier = identifier
         self.exp = exp
@@ -217,6 +233,8 @@ class DeclarationNode:
 
 
 class BlockItemNode:
+    __slots__ = ("child",)
+
     def __init__(self, child: Statement | DeclarationNode) -> None:
         self.child = child
 
@@ -225,6 +243,8 @@ class BlockItemNode:
 
 
 class BlockNode:
+    __slots__ = ("children",)
+
     def __init__(self, children: list[BlockItemNode]) -> None:
         self.children = children
 
@@ -233,6 +253,8 @@ class BlockNode:
 
 
 class VariableDeclarationNode(DeclarationNode):
+    __slots__ = ()
+
     def __init__(self, identifier: str, exp: ExpressionNode | None) -> None:
         super().__init__(identifier, exp)
 
@@ -241,6 +263,8 @@ class VariableDeclarationNode(DeclarationNode):
 
 
 class FunctionDeclarationNode(DeclarationNode):
+    __slots__ = ("params", "body")
+
     def __init__(self, identifier: str, params: list[str], body: BlockNode) -> None:
         self.identifier = identifier
         self.params = params
@@ -250,7 +274,33 @@ class FunctionDeclarationNode(DeclarationNode):
         return f"FUNCTION_DECLARATION({self.identifier} {self.params} {self.body})"
 
 
+class LazyFunctionDeclarationNode(FunctionDeclarationNode):
+    """A function whose body is parsed from its token range the first time it's read."""
+
+    __slots__ = ("parser", "body_start")
+
+    def __init__(
+        self, identifier: str, params: list[str], parser, body_start: int
+    ) -> None:
+        super().__init__(identifier, params, None)
+        self.parser = parser
+        self.body_start = body_start
+
+    @property
+    def body(self) -> BlockNode:
+        if self.parser is not None:
+            self.body = self.parser.parse_body(self.body_start)
+        return FunctionDeclarationNode.body.__get__(self)
+
+    @body.setter
+    def body(self, body: BlockNode) -> None:
+        self.parser = None
+        FunctionDeclarationNode.body.__set__(self, body)
+
+
 class CompoundStatementNode(Statement):
+    __slots__ = ()
+
     def __init__(self, child: BlockNode) -> None:
         self.child = child
 
@@ -259,6 +309,8 @@ class CompoundStatementNode(Statement):
 
 
 class GotoNode(Statement):
+    __slots__ = ("label",)
+
     def __init__(self, label: str) -> None:
         self.label = label
 
@@ -267,6 +319,8 @@ class GotoNode(Statement):
 
 
 class IfNode(Statement):
+    __slots__ = ("condition", "then", "else_")
+
     def __init__(
         self, condition: ExpressionNode, then: Statement, else_: Statement = None
     ) -> None:
@@ -279,6 +333,8 @@ class IfNode(Statement):
 
 
 class WhileNode(Statement):
+    __slots__ = ("condition", "body", "label")
+
     def __init__(
         self, condition: ExpressionNode, body: Statement, label: str = ""
     ) -> None:
@@ -291,6 +347,8 @@ class WhileNode(Statement):
 
 
 class DoWhileNode(Statement):
+    __slots__ = ("condition", "body", "label")
+
     def __init__(
         self, condition: ExpressionNode, body: Statement, label: str = ""
     ) -> None:
@@ -303,6 +361,8 @@ class DoWhileNode(Statement):
 
 
 class InitDeclNode:
+    __slots__ = ("declaration", "label")
+
     def __init__(self, declaration: DeclarationNode, label: str = "") -> None:
         self.declaration = declaration
         self.label = label
@@ -312,6 +372,8 @@ class InitDeclNode:
 
 
 class InitExprNode:
+    __slots__ = ("expression", "label")
+
     def __init__(self, expression: ExpressionNode = None, label: str = "") -> None:
         self.expression = expression
         self.label = label
@@ -321,6 +383,8 @@ class InitExprNode:
 
 
 class ForNode(Statement):
+    __slots__ = ("condition", "body", "init", "post", "label")
+
     def __init__(
         self,
         body: Statement,
@@ -342,6 +406,8 @@ class ForNode(Statement):
 
 
 class BreakNode(Statement):
+    __slots__ = ("label", "target_type")
+
     def __init__(self, label: str = "", target_type: str = None) -> None:
         self.label = label
         self.target_type = target_type
@@ -351,6 +417,8 @@ class BreakNode(Statement):
 
 
 class ContinueNode(Statement):
+    __slots__ = ("label",)
+
     def __init__(self, label: str = "") -> None:
         self.label = label
 
@@ -359,6 +427,8 @@ class ContinueNode(Statement):
 
 
 class CaseNode(Statement):
+    __slots__ = ("condition", "body", "label")
+
     def __init__(
         self,
         condition: ExpressionNode,
@@ -373,6 +443,8 @@ class CaseNode(Statement):
 
 
 class DefaultNode(Statement):
+    __slots__ = ("body", "label")
+
     def __init__(self, body: list[Statement]) -> None:
         self.body = body
         self.label = ""
@@ -382,6 +454,8 @@ class DefaultNode(Statement):
 
 
 class SwitchNode(Statement):
+    __slots__ = ("condition", "body", "label", "case_targets", "default_target")
+
     def __init__(
         self,
         condition: ExpressionNode,
@@ -419,7 +493,9 @@ class SwitchNode(Statement):
 
 
 class ConstantNode(ExpressionNode):
-    def __init__(self, value: str) -> None:
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
         self.value = value
 
     def __repr__(self) -> str:
@@ -427,6 +503,8 @@ class ConstantNode(ExpressionNode):
 
 
 class VarNode(ExpressionNode):
+    __slots__ = ("identifier",)
+
     def __init__(self, identifier: str) -> None:
         self.identifier = identifier
 
@@ -435,6 +513,8 @@ class VarNode(ExpressionNode):
 
 
 class UnaryNode(ExpressionNode):
+    __slots__ = ("exp", "operator", "postfix")
+
     def __init__(
         self,
         exp: ExpressionNode,
@@ -450,6 +530,8 @@ class UnaryNode(ExpressionNode):
 
 
 class BinaryNode(ExpressionNode):
+    __slots__ = ("operator", "exp_1", "exp_2")
+
     def __init__(
         self,
         operator: BinaryOperatorNode,
@@ -465,6 +547,8 @@ class BinaryNode(ExpressionNode):
 
 
 class AssignmentNode(ExpressionNode):
+    __slots__ = ("lvalue", "rvalue", "type")
+
     def __init__(
         self,
         lvalue: ExpressionNode,
@@ -480,6 +564,8 @@ class AssignmentNode(ExpressionNode):
 
 
 class ConditionalNode(ExpressionNode):
+    __slots__ = ("condition", "then", "else_")
+
     def __init__(
         self, condition: ExpressionNode, then: ExpressionNode, else_: ExpressionNode
     ) -> None:
@@ -492,6 +578,8 @@ class ConditionalNode(ExpressionNode):
 
 
 class FunctionCallNode(ExpressionNode):
+    __slots__ = ("identifier", "arguments")
+
     def __init__(
         self,
         identifier: str,
@@ -505,6 +593,8 @@ class FunctionCallNode(ExpressionNode):
 
 
 class ProgramNode:
+    __slots__ = ("functions",)
+
     def __init__(self, functions: list[FunctionDeclarationNode]) -> None:
         self.functions = functions
 
@@ -0,0 +1,102 @@
+from .TackyConstructs import *
+from .IRFormat import instructions
+
+JUMPS = (IRJumpNode, IRJumpIfZeroNode, IRJumpIfNotZeroNode)
+CONDITIONAL_JUMPS = (IRJumpIfZeroNode, IRJumpIfNotZeroNode)
+
+
+class BasicBlock:
+    __slots__ = ("index", "instructions", "successors", "predecessors")
+
+    def __init__(self, index: int, instructions: list[IRNode]) -> None:
+        self.index = index
+        self.instructions = instructions
+        self.successors = []
+        self.predecessors = []
+
+    def __repr__(self) -> str:
+        return f"""BasicBlock({self.index}, {len(self.instructions)} instructions)"""
+
+
+class ControlFlowGraph:
+    """A function's instructions split into basic blocks, in their original order.
+
+    The first block is the entry. A block that doesn't end in a jump or a return
+    falls through to the next one, even once passes have emptied it, so the
+    function is the blocks' instructions one after the other.
+    """
+
+    def __init__(self, function: IRFunctionNode) -> None:
+        self.blocks = []
+        current = []
+        for instruction in instructions(function):
+            if type(instruction) is IRLabelNode and current:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+            current.append(instruction)
+            if type(instruction) in JUMPS or type(instruction) is IRReturnNode:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+        if current:
+            self.blocks.append(BasicBlock(len(self.blocks), current))
+
+        labels = {}
+        for block in self.blocks:
+            if type(block.instructions[0]) is IRLabelNode:
+                labels[block.instructions[0].identifier] = block
+        for block, following in zip(self.blocks, self.blocks[1:] + [None]):
+            last = block.instructions[-1]
+            if type(last) in JUMPS:
+                self.add_edge(block, labels[last.target])
+            if type(last) is not IRJumpNode and type(last) is not IRReturnNode:
+                if following is not None:
+                    self.add_edge(block, following)
+
+    def add_edge(self, source: BasicBlock, destination: BasicBlock) -> None:
+        if destination not in source.successors:
+            source.successors.append(destination)
+            destination.predecessors.append(source)
+
+    def remove_edge(self, source: BasicBlock, destination: BasicBlock) -> None:
+        source.successors.remove(destination)
+        destination.predecessors.remove(source)
+
+    def following(self, block: BasicBlock) -> BasicBlock | None:
+        index = block.index + 1
+        return self.blocks[index] if index < len(self.blocks) else None
+
+    def remove_blocks(self, removed: set[BasicBlock]) -> None:
+        for block in removed:
+            for successor in list(block.successors):
+                self.remove_edge(block, successor)
+            for predecessor in list(block.predecessors):
+                self.remove_edge(predecessor, block)
+        self.blocks = [block for block in self.blocks if block not in removed]
+        for index, block in enumerate(self.blocks):
+            block.index = index
+
+    def reverse_postorder(self) -> list[BasicBlock]:
+        """The blocks reachable from the entry, each before its successors but for
+        back edges."""
+        if not self.blocks:
+            return []
+        order = []
+        visited = {self.blocks[0]}
+        stack = [(self.blocks[0], iter(self.blocks[0].successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+    def instructions(self) -> list[IRNode]:
+        return [
+            instruction for block in self.blocks for instruction in block.instructions
+        ]
@@ -0,0 +1,180 @@
+from collections import deque
+
+from .TackyConstructs import *
+from .CFG import ControlFlowGraph, CONDITIONAL_JUMPS
+
+# Dataflow facts are ints used as bitsets, bit i standing for register i or the
+# analysis' i-th fact, so meets and transfers are a few int operations per block
+# whatever the number of facts.
+
+STORES = (IRCopyNode, IRUnaryNode, IRBinaryNode)
+
+
+def uses(instruction: IRNode) -> list[IRConstantNode | IRVarNode]:
+    if type(instruction) in CONDITIONAL_JUMPS:
+        return [instruction.condition]
+    return instruction.sources
+
+
+def destination(instruction: IRNode) -> IRVarNode | None:
+    if type(instruction) in STORES or type(instruction) is IRFunctionCallNode:
+        return instruction.dst
+    return None
+
+
+def bits(facts: int):
+    """The indices of the bits set in facts, lowest first."""
+    while facts:
+        lowest = facts & -facts
+        yield lowest.bit_length() - 1
+        facts ^= lowest
+
+
+def solve(
+    cfg: ControlFlowGraph,
+    forward: bool,
+    must: bool,
+    gen: list[int],
+    kill: list[int],
+    boundary: int = 0,
+    universe: int = 0,
+) -> tuple[list[int], list[int]]:
+    """The facts at the start and at the end of each block, by block index.
+
+    A block turns the facts it is given into gen | (facts & ~kill). It is given the
+    union of what its predecessors hold at their ends (successors at their starts
+    for a backward problem), or the intersection if must is set, in which case a
+    block not worked out yet holds the universe. The entry, or for a backward
+    problem a block with no successors, is also given the boundary.
+
+    Blocks are visited in reverse postorder (postorder going backward) and then
+    only when what they are given changes, so an acyclic function takes one visit
+    per block and loops a visit more per loop they're nested in.
+    """
+    blocks = cfg.blocks
+    order = cfg.reverse_postorder()
+    if not forward:
+        order.reverse()
+    # blocks the entry doesn't reach still get facts, they're solved last
+    if len(order) != len(blocks):
+        ordered = set(order)
+        order += [block for block in blocks if block not in ordered]
+
+    kept = [~facts for facts in kill]
+    given = [0] * len(blocks)
+    result = [universe if must else 0] * len(blocks)
+    entry = blocks[0] if blocks and forward else None
+    worklist = deque(order)
+    queued = [True] * len(blocks)
+    while worklist:
+        block = worklist.popleft()
+        index = block.index
+        queued[index] = False
+        edges = block.predecessors if forward else block.successors
+        if must:
+            facts = universe
+            for other in edges:
+                facts &= result[other.index]
+            if block is entry or not edges:
+                facts &= boundary
+        else:
+            facts = 0
+            for other in edges:
+                facts |= result[other.index]
+            if block is entry or not edges:
+                facts |= boundary
+        given[index] = facts
+        facts = gen[index] | (facts & kept[index])
+        if facts != result[index]:
+            result[index] = facts
+            for other in block.successors if forward else block.predecessors:
+                if not queued[other.index]:
+                    queued[other.index] = True
+                    worklist.append(other)
+    if forward:
+        return given, result
+    return result, given
+
+
+def liveness(cfg: ControlFlowGraph) -> list[int]:
+    """The registers live at the end of each block."""
+    gen = []
+    kill = []
+    for block in cfg.blocks:
+        used = defined = 0
+        for instruction in reversed(block.instructions):
+            dst = destination(instruction)
+            if dst is not None:
+                bit = 1 << dst.register
+                used &= ~bit
+                defined |= bit
+            for source in uses(instruction):
+                if type(source) is IRVarNode:
+                    used |= 1 << source.register
+        gen.append(used)
+        kill.append(defined)
+    return solve(cfg, False, False, gen, kill)[1]
+
+
+def copy_fact(instruction: IRCopyNode) -> tuple:
+    # copies of the same value to the same register are the same fact
+    source = instruction.sources[0]
+    if type(source) is IRVarNode:
+        return (instruction.dst.register, True, source.register)
+    return (instruction.dst.register, False, source.value)
+
+
+class Copies:
+    """The function's copies as numbered facts, each copy's fact and what it copies,
+    and for each register the facts writing it ends.
+
+    reaching holds the facts that hold at the start of each block, on every path
+    there.
+    """
+
+    def __init__(self, cfg: ControlFlowGraph) -> None:
+        self.index = {}
+        self.facts = []
+        self.sources = []
+        self.mentions = {}
+        for block in cfg.blocks:
+            for instruction in block.instructions:
+                if type(instruction) is IRCopyNode:
+                    fact = copy_fact(instruction)
+                    if fact in self.index:
+                        continue
+                    bit = 1 << len(self.facts)
+                    self.index[fact] = len(self.facts)
+                    self.facts.append(fact)
+                    self.sources.append(instruction.sources[0])
+                    self.mentions[fact[0]] = self.mentions.get(fact[0], 0) | bit
+                    if fact[1]:
+                        self.mentions[fact[2]] = self.mentions.get(fact[2], 0) | bit
+        self.reaching = []
+
+
+def reaching_copies(cfg: ControlFlowGraph) -> Copies:
+    copies = Copies(cfg)
+    gen = []
+    kill = []
+    for block in cfg.blocks:
+        # a copy is generated if nothing after it in the block writes what it mentions
+        generated = 0
+        written = set()
+        for instruction in reversed(block.instructions):
+            dst = destination(instruction)
+            if dst is None:
+                continue
+            if type(instruction) is IRCopyNode:
+                fact = copy_fact(instruction)
+                if fact[0] not in written and not (fact[1] and fact[2] in written):
+                    generated |= 1 << copies.index[fact]
+            written.add(dst.register)
+        ended = 0
+        for register in written:
+            ended |= copies.mentions.get(register, 0)
+        gen.append(generated)
+        kill.append(ended & ~generated)
+    universe = (1 << len(copies.facts)) - 1
+    copies.reaching = solve(cfg, True, True, gen, kill, 0, universe)[0]
+    return copies
@@ -0,0 +1,453 @@
+import re
+import sys
+import struct
+from array import array
+from collections import defaultdict
+
+from .TackyConstructs import *
+from Identifier import intern
+from SemanticAnalysis import FunctionSymbolType
+
+# Tacky programs as text or bytes, and back. Both keep each function's registers, so
+# a loaded program numbers its variables as the one that was saved. Entries in a body
+# that aren't instructions (statement results Tacky appends) aren't saved.
+
+# instruction opcodes
+RETURN, COPY, JUMP, LABEL, CALL, UNARY, BINARY = range(7)
+JUMP_IF_ZERO, JUMP_IF_NOT_ZERO = range(7, 9)
+UNARY_OPERATORS = list(IRUnaryOperator)
+BINARY_OPERATORS = list(IRBinaryOperator)
+UNARY_CODES = {operator: code for code, operator in enumerate(UNARY_OPERATORS)}
+BINARY_CODES = {operator: code for code, operator in enumerate(BINARY_OPERATORS)}
+
+MAGIC = b"BCTIR"
+FORMAT_VERSION = 2
+# magic, version, the int, constant and wide constant counts, the string bytes
+HEADER = struct.Struct("<5sHIIII")
+# the constants a 64 bit int holds, any others are written out as strings
+CONSTANT_MIN, CONSTANT_MAX = -(2**63), 2**63 - 1
+
+INSTRUCTION_TYPES = (
+    IRReturnNode,
+    IRCopyNode,
+    IRJumpNode,
+    IRJumpIfZeroNode,
+    IRJumpIfNotZeroNode,
+    IRLabelNode,
+    IRFunctionCallNode,
+    IRUnaryNode,
+    IRBinaryNode,
+)
+
+
+def instructions(function: IRFunctionNode) -> list[IRNode]:
+    return [item for item in function.body if type(item) in INSTRUCTION_TYPES]
+
+
+def function_symbols(program: IRProgramNode) -> dict:
+    """The symbol table AssemblyParser reads, rebuilt from the program.
+
+    A definition has a body and a declaration doesn't, and a function only declared
+    inside another one isn't in the program, so it comes out as not defined.
+    """
+    symbols = defaultdict(lambda: FunctionSymbolType(0))
+    for function in program.function_definitions:
+        defined = bool(function.body) or symbols[function.identifier].defined
+        symbols[function.identifier] = FunctionSymbolType(len(function.params), defined)
+    return symbols
+
+
+######################## TEXT ########################
+# function main(a, b)
+#     locals x.0 tmp.0
+#     binary Add a, 1 -> tmp.0
+
+
+def _operand_text(operand: IRConstantNode | IRVarNode) -> str:
+    if isinstance(operand, IRConstantNode):
+        return str(operand.value)
+    return str(operand.name)
+
+
+def _instruction_text(instruction: IRNode) -> str:
+    if isinstance(instruction, IRReturnNode):
+        return f"return {_operand_text(instruction.sources[0])}"
+    if isinstance(instruction, IRCopyNode):
+        source, destination = instruction.sources[0], instruction.dst
+        return f"copy {_operand_text(source)} -> {_operand_text(destination)}"
+    if isinstance(instruction, IRJumpNode):
+        return f"jump {instruction.target}"
+    if isinstance(instruction, (IRJumpIfZeroNode, IRJumpIfNotZeroNode)):
+        name = (
+            "jump_if_zero"
+            if isinstance(instruction, IRJumpIfZeroNode)
+            else "jump_if_not_zero"
+        )
+        return f"{name} {_operand_text(instruction.condition)}, {instruction.target}"
+    if isinstance(instruction, IRLabelNode):
+        return f"label {instruction.identifier}"
+    if isinstance(instruction, IRFunctionCallNode):
+        arguments = ", ".join(_operand_text(source) for source in instruction.sources)
+        return f"call {instruction.identifier}({arguments}) -> {_operand_text(instruction.dst)}"
+    if isinstance(instruction, IRUnaryNode):
+        source, destination = instruction.sources[0], instruction.dst
+        return f"unary {instruction.op.value} {_operand_text(source)} -> {_operand_text(destination)}"
+    if isinstance(instruction, IRBinaryNode):
+        operands = ", ".join(_operand_text(source) for source in instruction.sources)
+        return f"binary {instruction.op.value} {operands} -> {_operand_text(instruction.dst)}"
+    raise Exception(f"Unknown instruction {instruction}")
+
+
+def to_text(program: IRProgramNode) -> str:
+    lines = []
+    for function in program.function_definitions:
+        lines.append(
+            f"function {function.identifier}({', '.join(map(str, function.params))})"
+        )
+        local_names = function.registers[len(function.params) :]
+        if local_names:
+            lines.append(f"    locals {' '.join(map(str, local_names))}")
+        for instruction in instructions(function):
+            lines.append(f"    {_instruction_text(instruction)}")
+    return "".join(line + "\n" for line in lines)
+
+
+FUNCTION_REGEX = re.compile(r"function (\S+)\((.*)\)$")
+INTEGER_REGEX = re.compile(r"-?\d+$")
+
+
+class _TextFunction:
+    # the variables of the function being read, made as they're named
+    def __init__(self, identifier: str, params: list[str]) -> None:
+        self.identifier = intern(identifier)
+        self.params = [intern(param) for param in params]
+        self.registers = list(self.params)
+        self.variables = {
+            param: IRVarNode(param, register)
+            for register, param in enumerate(self.params)
+        }
+        self.body = []
+
+    def operand(self, text: str) -> IRConstantNode | IRVarNode:
+        if INTEGER_REGEX.match(text):
+            return IRConstantNode(int(text))
+        name = intern(text)
+        node = self.variables.get(name)
+        if node is None:
+            node = self.variables[name] = IRVarNode(name, len(self.registers))
+            self.registers.append(name)
+        return node
+
+    def instruction(self, text: str) -> IRNode:
+        keyword, _, rest = text.partition(" ")
+        if keyword == "return":
+            return IRReturnNode(self.operand(rest))
+        if keyword == "copy":
+            source, destination = rest.split(" -> ")
+            return IRCopyNode(self.operand(source), self.operand(destination))
+        if keyword == "jump":
+            return IRJumpNode(rest)
+        if keyword in ("jump_if_zero", "jump_if_not_zero"):
+            condition, target = rest.split(", ")
+            node_class = (
+                IRJumpIfZeroNode if keyword == "jump_if_zero" else IRJumpIfNotZeroNode
+            )
+            return node_class(self.operand(condition), target)
+        if keyword == "label":
+            return IRLabelNode(rest)
+        if keyword == "call":
+            call, destination = rest.split(" -> ")
+            identifier, _, arguments = call[:-1].partition("(")
+            return IRFunctionCallNode(
+                intern(identifier),
+                [
+                    self.operand(argument)
+                    for argument in arguments.split(", ")
+                    if argument
+                ],
+                self.operand(destination),
+            )
+        if keyword == "unary":
+            operator, operands = rest.split(" ", 1)
+            source, destination = operands.split(" -> ")
+            return IRUnaryNode(
+                IRUnaryOperator(operator),
+                self.operand(source),
+                self.operand(destination),
+            )
+        if keyword == "binary":
+            operator, operands = rest.split(" ", 1)
+            sources, destination = operands.split(" -> ")
+            source_1, source_2 = sources.split(", ")
+            return IRBinaryNode(
+                IRBinaryOperator(operator),
+                self.operand(source_1),
+                self.operand(source_2),
+                self.operand(destination),
+            )
+        raise Exception(f"Unknown IR instruction '{text}'")
+
+    def node(self) -> IRFunctionNode:
+        return IRFunctionNode(self.identifier, self.params, self.body, self.registers)
+
+
+def from_text(text: str) -> IRProgramNode:
+    functions = []
+    function = None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            match = FUNCTION_REGEX.match(line)
+            if match:
+                if function is not None:
+                    functions.append(function.node())
+                params = match.group(2)
+                function = _TextFunction(
+                    match.group(1), params.split(", ") if params else []
+                )
+            elif function is None:
+                raise Exception("instruction outside a function")
+            elif line.startswith("locals "):
+                for name in line.split()[1:]:
+                    function.operand(name)
+            else:
+                function.body.append(function.instruction(line))
+        except Exception as error:
+            raise Exception(f"IR line {number}: {error}")
+    if function is not None:
+        functions.append(function.node())
+    return IRProgramNode(functions)
+
+
+####################### BINARY #######################
+# An array of 32 bit ints, the constants as 64 bit ints, the wide constants and a
+# string table. A function is its name, parameter count, register names and
+# instructions, each an opcode and its fields. An operand is its register, or -1 -
+# the constant's index. A constant too wide for 64 bits is a 0 in the constants,
+# with its index and the index of its digits in the string table among the wide
+# constants.
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.ints = array("i")
+        self.constants = array("q")
+        self.constant_indices = {}
+        self.wide = array("i")
+        self.strings = []
+        self.string_indices = {}
+
+    def string(self, value) -> int:
+        value = str(value)
+        index = self.string_indices.get(value)
+        if index is None:
+            index = self.string_indices[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def operand(self, operand: IRConstantNode | IRVarNode) -> int:
+        if type(operand) is IRVarNode:
+            return operand.register
+        index = self.constant_indices.get(operand.value)
+        if index is None:
+            index = self.constant_indices[operand.value] = len(self.constants)
+            if CONSTANT_MIN <= operand.value <= CONSTANT_MAX:
+                self.constants.append(operand.value)
+            else:
+                self.constants.append(0)
+                self.wide.extend((index, self.string(operand.value)))
+        return -1 - index
+
+    def function(self, function: IRFunctionNode) -> None:
+        ints = self.ints
+        operand = self.operand
+        string = self.string
+        ints.extend((string(function.identifier), len(function.params)))
+        ints.append(len(function.registers))
+        ints.extend(string(name) for name in function.registers)
+        body = instructions(function)
+        ints.append(len(body))
+        for instruction in body:
+            node_type = type(instruction)
+            if node_type is IRReturnNode:
+                ints.extend((RETURN, operand(instruction.sources[0])))
+            elif node_type is IRCopyNode:
+                source, destination = instruction.sources[0], instruction.dst
+                ints.extend((COPY, operand(source), operand(destination)))
+            elif node_type is IRJumpNode:
+                ints.extend((JUMP, string(instruction.target)))
+            elif node_type is IRJumpIfZeroNode or node_type is IRJumpIfNotZeroNode:
+                ints.extend(
+                    (
+                        (
+                            JUMP_IF_ZERO
+                            if node_type is IRJumpIfZeroNode
+                            else JUMP_IF_NOT_ZERO
+                        ),
+                        operand(instruction.condition),
+                        string(instruction.target),
+                    )
+                )
+            elif node_type is IRLabelNode:
+                ints.extend((LABEL, string(instruction.identifier)))
+            elif node_type is IRFunctionCallNode:
+                ints.extend(
+                    (CALL, string(instruction.identifier), len(instruction.sources))
+                )
+                ints.extend(operand(source) for source in instruction.sources)
+                ints.append(operand(instruction.dst))
+            elif node_type is IRUnaryNode:
+                source, destination = instruction.sources[0], instruction.dst
+                ints.extend(
+                    (
+                        UNARY,
+                        UNARY_CODES[instruction.op],
+                        operand(source),
+                        operand(destination),
+                    )
+                )
+            else:
+                source_1, source_2 = instruction.sources
+                ints.extend(
+                    (
+                        BINARY,
+                        BINARY_CODES[instruction.op],
+                        operand(source_1),
+                        operand(source_2),
+                        operand(instruction.dst),
+                    )
+                )
+
+
+def serialize(program: IRProgramNode) -> bytes:
+    """Packs a program into a versioned little-endian byte string."""
+    writer = _Writer()
+    writer.ints.append(len(program.function_definitions))
+    for function in program.function_definitions:
+        writer.function(function)
+
+    arrays = [writer.ints, writer.constants, writer.wide]
+    if sys.byteorder == "big":
+        arrays = [array(data.typecode, data) for data in arrays]
+        for data in arrays:
+            data.byteswap()
+    # each string is NUL terminated, so an empty one still takes up room
+    strings = "".join(value + "\0" for value in writer.strings).encode()
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        len(writer.ints),
+        len(writer.constants),
+        len(writer.wide) // 2,
+        len(strings),
+    )
+    return b"".join([header, *(data.tobytes() for data in arrays), strings])
+
+
+def deserialize(data: bytes) -> IRProgramNode:
+    if len(data) < HEADER.size:
+        raise Exception("Truncated IR data")
+    magic, version, count, constant_count, wide_count, strings_size = (
+        HEADER.unpack_from(data)
+    )
+    if magic != MAGIC:
+        raise Exception("Not a serialized IR program")
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported IR format version {version}")
+    size = HEADER.size + count * 4 + constant_count * 8 + wide_count * 8
+    if len(data) != size + strings_size:
+        raise Exception("Truncated IR data")
+
+    buffer = memoryview(data)
+    position = HEADER.size + count * 4
+    ints = array("i")
+    ints.frombytes(buffer[HEADER.size : position])
+    constants = array("q")
+    constants.frombytes(buffer[position : position + constant_count * 8])
+    position += constant_count * 8
+    wide = array("i")
+    wide.frombytes(buffer[position : position + wide_count * 8])
+    if sys.byteorder == "big":
+        ints.byteswap()
+        constants.byteswap()
+        wide.byteswap()
+    position += wide_count * 8
+    strings = bytes(buffer[position:]).decode().split("\0")[:-1]
+    names = [intern(string) for string in strings]
+    values = constants.tolist()
+    for index, string in zip(wide[::2], wide[1::2]):
+        values[index] = int(strings[string])
+    # indexed by operand, registers from the front and constants from the back
+    constant_nodes = [IRConstantNode(value) for value in reversed(values)]
+
+    values = iter(ints)
+    functions = []
+    for _ in range(next(values)):
+        identifier = names[next(values)]
+        param_count = next(values)
+        registers = [names[next(values)] for _ in range(next(values))]
+        operands = [
+            IRVarNode(name, register) for register, name in enumerate(registers)
+        ] + constant_nodes
+
+        body = []
+        for _ in range(next(values)):
+            opcode = next(values)
+            if opcode == RETURN:
+                body.append(IRReturnNode(operands[next(values)]))
+            elif opcode == COPY:
+                source = operands[next(values)]
+                body.append(IRCopyNode(source, operands[next(values)]))
+            elif opcode == JUMP:
+                body.append(IRJumpNode(strings[next(values)]))
+            elif opcode == JUMP_IF_ZERO or opcode == JUMP_IF_NOT_ZERO:
+                node_class = (
+                    IRJumpIfZeroNode if opcode == JUMP_IF_ZERO else IRJumpIfNotZeroNode
+                )
+                condition = operands[next(values)]
+                body.append(node_class(condition, strings[next(values)]))
+            elif opcode == LABEL:
+                body.append(IRLabelNode(strings[next(values)]))
+            elif opcode == CALL:
+                callee = names[next(values)]
+                arguments = [operands[next(values)] for _ in range(next(values))]
+                body.append(
+                    IRFunctionCallNode(callee, arguments, operands[next(values)])
+                )
+            elif opcode == UNARY:
+                operator = UNARY_OPERATORS[next(values)]
+                source = operands[next(values)]
+                body.append(IRUnaryNode(operator, source, operands[next(values)]))
+            elif opcode == BINARY:
+                operator = BINARY_OPERATORS[next(values)]
+                source_1 = operands[next(values)]
+                source_2 = operands[next(values)]
+                body.append(
+                    IRBinaryNode(operator, source_1, source_2, operands[next(values)])
+                )
+            else:
+                raise Exception(f"Unknown IR opcode {opcode}")
+        functions.append(
+            IRFunctionNode(identifier, registers[:param_count], body, registers)
+        )
+    return IRProgramNode(functions)
+
+
+def save(program: IRProgramNode, path: str) -> None:
+    # text for a .tir file, bytes otherwise
+    if path.endswith(".tir"):
+        with open(path, "w") as f:
+            f.write(to_text(program))
+    else:
+        with open(path, "wb") as f:
+            f.write(serialize(program))
+
+
+def load(path: str) -> IRProgramNode:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(MAGIC):
+        return deserialize(data)
+    return from_text(data.decode())
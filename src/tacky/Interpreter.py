@@ -0,0 +1,259 @@
+from .TackyConstructs import *
+from .IRFormat import instructions
+
+# Runs a Tacky program in process, as the compiled program would run: ints are 32
+# bits and wrap around, and shifts and division behave as the emitted instructions.
+
+BIAS = 0x80000000
+MASK = 0xFFFFFFFF
+INT_MIN = -BIAS
+# calls deeper than this would have run out of stack
+MAX_CALL_DEPTH = 100_000
+
+# opcodes, most frequent first
+BINARY, COPY, JUMP_IF_ZERO, JUMP_IF_NOT_ZERO, JUMP, UNARY, CALL, RETURN = range(8)
+
+
+def wrap(value: int) -> int:
+    return ((value + BIAS) & MASK) - BIAS
+
+
+def divide(a: int, b: int) -> int:
+    if b == 0 or (a == INT_MIN and b == -1):
+        raise Exception("Floating point exception: integer division overflow")
+    quotient = abs(a) // abs(b)
+    return -quotient if (a < 0) != (b < 0) else quotient
+
+
+def remainder(a: int, b: int) -> int:
+    return a - b * divide(a, b)
+
+
+BINARY_OPERATIONS = {
+    IRBinaryOperator.ADD: lambda a, b: ((a + b + BIAS) & MASK) - BIAS,
+    IRBinaryOperator.SUBTRACT: lambda a, b: ((a - b + BIAS) & MASK) - BIAS,
+    IRBinaryOperator.MULTIPLY: lambda a, b: ((a * b + BIAS) & MASK) - BIAS,
+    IRBinaryOperator.DIVIDE: divide,
+    IRBinaryOperator.REMAINDER: remainder,
+    IRBinaryOperator.AND_BITWISE: lambda a, b: a & b,
+    IRBinaryOperator.OR_BITWISE: lambda a, b: a | b,
+    IRBinaryOperator.XOR_BITWISE: lambda a, b: a ^ b,
+    # shll/shrl/sarl only look at the low 5 bits of the count
+    IRBinaryOperator.LEFT_SHIFT_LOGICAL: lambda a, b: wrap(a << (b & 31)),
+    IRBinaryOperator.RIGHT_SHIFT_LOGICAL: lambda a, b: wrap((a & MASK) >> (b & 31)),
+    IRBinaryOperator.LEFT_SHIFT_ARITHMETIC: lambda a, b: wrap(a << (b & 31)),
+    IRBinaryOperator.RIGHT_SHIFT_ARITHMETIC: lambda a, b: a >> (b & 31),
+    IRBinaryOperator.AND_LOGICAL: lambda a, b: int(bool(a) and bool(b)),
+    IRBinaryOperator.OR_LOGICAL: lambda a, b: int(bool(a) or bool(b)),
+    IRBinaryOperator.EQUAL: lambda a, b: int(a == b),
+    IRBinaryOperator.NOT_EQUAL: lambda a, b: int(a != b),
+    IRBinaryOperator.LESS_THAN: lambda a, b: int(a < b),
+    IRBinaryOperator.GREATER_THAN: lambda a, b: int(a > b),
+    IRBinaryOperator.LESS_OR_EQUAL: lambda a, b: int(a <= b),
+    IRBinaryOperator.GREATER_OR_EQUAL: lambda a, b: int(a >= b),
+}
+
+UNARY_OPERATIONS = {
+    IRUnaryOperator.COMPLEMENT: lambda a: ~a,
+    IRUnaryOperator.NEGATE: lambda a: wrap(-a),
+    IRUnaryOperator.NOT: lambda a: int(not a),
+    IRUnaryOperator.INCREMENT: lambda a: wrap(a + 1),
+    IRUnaryOperator.DECREMENT: lambda a: wrap(a - 1),
+}
+
+
+class ProgramExit(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f"exit({status})")
+        self.status = status
+
+
+class StepLimit(Exception):
+    def __init__(self) -> None:
+        super().__init__("Stopped after too many steps")
+
+
+class CompiledFunction:
+    """A function ready to run.
+
+    Each instruction is a tuple starting with its opcode, labels are gone and jumps
+    hold the index they go to. Operands index the frame, the registers followed by
+    the function's constants, so a call's frame is its arguments and the template.
+    """
+
+    __slots__ = ("name", "code", "template")
+
+    def __init__(self, function: IRFunctionNode) -> None:
+        self.name = str(function.identifier)
+        self.code = []
+        self.template = [0] * (len(function.registers) - len(function.params))
+
+
+class Interpreter:
+    def __init__(self, program: IRProgramNode) -> None:
+        if program.main is None:
+            raise Exception("Undefined reference to main")
+        self.output = bytearray()
+        self.builtins = {"putchar": self.putchar, "exit": self.exit}
+        self.functions = {}
+        definitions = [
+            function for function in program.function_definitions if function.body
+        ]
+        for function in definitions:
+            self.functions[str(function.identifier)] = CompiledFunction(function)
+        for function in definitions:
+            self.compile(function, self.functions[str(function.identifier)])
+
+    def putchar(self, c: int) -> int:
+        self.output.append(c & 0xFF)
+        return c
+
+    def exit(self, status: int) -> int:
+        raise ProgramExit(status)
+
+    def compile(self, function: IRFunctionNode, compiled: CompiledFunction) -> None:
+        template = compiled.template
+        # the template leaves out the parameters
+        offset = len(function.params)
+        constants = {}
+
+        def operand(node: IRConstantNode | IRVarNode) -> int:
+            if type(node) is IRVarNode:
+                return node.register
+            value = wrap(node.value)
+            index = constants.get(value)
+            if index is None:
+                index = constants[value] = offset + len(template)
+                template.append(value)
+            return index
+
+        # labels first, so jumps can be given indices as they are compiled
+        labels = {}
+        body = instructions(function)
+        index = 0
+        for instruction in body:
+            if type(instruction) is IRLabelNode:
+                labels[instruction.identifier] = index
+            else:
+                index += 1
+
+        code = compiled.code
+        for instruction in body:
+            node_type = type(instruction)
+            if node_type is IRBinaryNode:
+                source_1, source_2 = instruction.sources
+                code.append(
+                    (
+                        BINARY,
+                        BINARY_OPERATIONS[instruction.op],
+                        operand(source_1),
+                        operand(source_2),
+                        operand(instruction.dst),
+                    )
+                )
+            elif node_type is IRCopyNode:
+                code.append(
+                    (COPY, operand(instruction.sources[0]), operand(instruction.dst))
+                )
+            elif node_type is IRJumpIfZeroNode or node_type is IRJumpIfNotZeroNode:
+                code.append(
+                    (
+                        (
+                            JUMP_IF_ZERO
+                            if node_type is IRJumpIfZeroNode
+                            else JUMP_IF_NOT_ZERO
+                        ),
+                        operand(instruction.condition),
+                        labels[instruction.target],
+                    )
+                )
+            elif node_type is IRJumpNode:
+                code.append((JUMP, labels[instruction.target]))
+            elif node_type is IRUnaryNode:
+                code.append(
+                    (
+                        UNARY,
+                        UNARY_OPERATIONS[instruction.op],
+                        operand(instruction.sources[0]),
+                        operand(instruction.dst),
+                    )
+                )
+            elif node_type is IRFunctionCallNode:
+                name = str(instruction.identifier)
+                callee = self.functions.get(name) or self.builtins.get(name)
+                if callee is None:
+                    raise Exception(f"Undefined reference to {name}")
+                arguments = tuple(operand(source) for source in instruction.sources)
+                code.append((CALL, callee, arguments, operand(instruction.dst)))
+            elif node_type is IRReturnNode:
+                code.append((RETURN, operand(instruction.sources[0])))
+        # reaching the end of a function returns 0
+        code.append((RETURN, operand(IRConstantNode(0))))
+
+    def run(self, max_steps: int = None) -> int:
+        """Runs main and returns its exit status, what it writes is in self.output.
+
+        A step is a jump taken or a call, a program past max_steps is stopped.
+        """
+        try:
+            return self.call(self.functions["main"], [], max_steps or -1)
+        except ProgramExit as program_exit:
+            return program_exit.status
+
+    def call(self, function: CompiledFunction, frame: list[int], steps: int) -> int:
+        code = function.code
+        frame += function.template
+        pc = 0
+        # the caller's code, where it resumes, its frame and the register for the result
+        stack = []
+        while True:
+            instruction = code[pc]
+            pc += 1
+            opcode = instruction[0]
+            if opcode == BINARY:
+                _, operation, source_1, source_2, destination = instruction
+                frame[destination] = operation(frame[source_1], frame[source_2])
+            elif opcode == COPY:
+                frame[instruction[2]] = frame[instruction[1]]
+            elif opcode == JUMP_IF_ZERO:
+                if not frame[instruction[1]]:
+                    pc = instruction[2]
+                    steps -= 1
+                    if not steps:
+                        raise StepLimit()
+            elif opcode == JUMP_IF_NOT_ZERO:
+                if frame[instruction[1]]:
+                    pc = instruction[2]
+                    steps -= 1
+                    if not steps:
+                        raise StepLimit()
+            elif opcode == JUMP:
+                pc = instruction[1]
+                steps -= 1
+                if not steps:
+                    raise StepLimit()
+            elif opcode == UNARY:
+                frame[instruction[3]] = instruction[1](frame[instruction[2]])
+            elif opcode == CALL:
+                _, callee, sources, destination = instruction
+                values = [frame[source] for source in sources]
+                steps -= 1
+                if not steps:
+                    raise StepLimit()
+                if type(callee) is CompiledFunction:
+                    if len(stack) == MAX_CALL_DEPTH:
+                        raise Exception("Segmentation fault: call stack overflow")
+                    stack.append((code, pc, frame, destination))
+                    code = callee.code
+                    # the arguments are the first registers
+                    values += callee.template
+                    frame = values
+                    pc = 0
+                else:
+                    frame[destination] = wrap(callee(*values))
+            else:
+                value = frame[instruction[1]]
+                if not stack:
+                    return value
+                code, pc, frame, destination = stack.pop()
+                frame[destination] = value
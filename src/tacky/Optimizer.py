@@ -0,0 +1,310 @@
+from collections import deque
+
+from .TackyConstructs import *
+from .CFG import ControlFlowGraph, JUMPS, CONDITIONAL_JUMPS
+from .Dataflow import STORES, uses, destination, bits, copy_fact
+from .Dataflow import liveness, reaching_copies
+from .Interpreter import BINARY_OPERATIONS, UNARY_OPERATIONS, wrap
+
+# What a pass changed, which decides the analyses thrown away afterwards. A pass
+# keeps the CFG up to date itself, so only the analyses built on it go.
+UNCHANGED, INSTRUCTIONS_CHANGED, CONTROL_FLOW_CHANGED = range(3)
+
+
+def same(a: IRConstantNode | IRVarNode, b: IRConstantNode | IRVarNode) -> bool:
+    if type(a) is IRVarNode:
+        return type(b) is IRVarNode and a.register == b.register
+    return type(b) is IRConstantNode and a.value == b.value
+
+
+def replace_uses(instruction: IRNode, replace) -> bool:
+    """Swaps each operand the instruction reads for replace(operand)."""
+    if type(instruction) in CONDITIONAL_JUMPS:
+        new = replace(instruction.condition)
+        if new is instruction.condition:
+            return False
+        instruction.condition = new
+        return True
+    sources = [replace(source) for source in instruction.sources]
+    if all(new is old for new, old in zip(sources, instruction.sources)):
+        return False
+    # call arguments stay a list
+    if type(instruction) is IRFunctionCallNode:
+        instruction.sources = sources
+    else:
+        instruction.sources = tuple(sources)
+    return True
+
+
+# name -> (analysis, whether it reads the instructions or only the control flow)
+ANALYSES = {
+    "liveness": (liveness, True),
+    "copies": (reaching_copies, True),
+}
+
+
+class Analyses:
+    """One function's CFG and the analyses of it asked for so far.
+
+    An analysis is worked out when first asked for and kept until a pass changes
+    what it depends on.
+    """
+
+    def __init__(self, function: IRFunctionNode) -> None:
+        self.cfg = ControlFlowGraph(function)
+        self.cache = {}
+        self.requested = 0
+        self.computed = 0
+
+    def get(self, name: str):
+        self.requested += 1
+        result = self.cache.get(name)
+        if result is None:
+            result = self.cache[name] = ANALYSES[name][0](self.cfg)
+            self.computed += 1
+        return result
+
+    def invalidate(self, change: int) -> None:
+        if change == CONTROL_FLOW_CHANGED:
+            self.cache.clear()
+        elif change == INSTRUCTIONS_CHANGED:
+            for name in list(self.cache):
+                if ANALYSES[name][1]:
+                    del self.cache[name]
+
+
+####################### PASSES #######################
+
+# flag name -> pass, in the order they run
+PASSES = {}
+
+
+def register(name: str):
+    def decorator(function):
+        PASSES[name] = function
+        return function
+
+    return decorator
+
+
+def fold(instruction: IRNode) -> int | None:
+    values = [wrap(source.value) for source in instruction.sources]
+    try:
+        if type(instruction) is IRUnaryNode:
+            return UNARY_OPERATIONS[instruction.op](*values)
+        return BINARY_OPERATIONS[instruction.op](*values)
+    except Exception:
+        # dividing by zero is left to happen when the program runs
+        return None
+
+
+@register("fold-constants")
+def fold_constants(analyses: Analyses) -> int:
+    cfg = analyses.cfg
+    change = UNCHANGED
+    for block in cfg.blocks:
+        body = block.instructions
+        for index, instruction in enumerate(body):
+            node_type = type(instruction)
+            if node_type is IRUnaryNode or node_type is IRBinaryNode:
+                if all(
+                    type(source) is IRConstantNode for source in instruction.sources
+                ):
+                    value = fold(instruction)
+                    if value is not None:
+                        body[index] = IRCopyNode(IRConstantNode(value), instruction.dst)
+                        change = max(change, INSTRUCTIONS_CHANGED)
+            elif node_type in CONDITIONAL_JUMPS:
+                if type(instruction.condition) is IRConstantNode:
+                    taken = (instruction.condition.value == 0) == (
+                        node_type is IRJumpIfZeroNode
+                    )
+                    if taken:
+                        body[index] = IRJumpNode(instruction.target)
+                    else:
+                        del body[index]
+                    # a conditional jump ends its block, which falls through or jumps
+                    following = cfg.following(block)
+                    if len(block.successors) == 2:
+                        target = [b for b in block.successors if b is not following][0]
+                        cfg.remove_edge(block, following if taken else target)
+                    change = CONTROL_FLOW_CHANGED
+    return change
+
+
+@register("eliminate-unreachable-code")
+def eliminate_unreachable_code(analyses: Analyses) -> int:
+    cfg = analyses.cfg
+    change = UNCHANGED
+    reachable = set(cfg.reverse_postorder())
+    if len(reachable) != len(cfg.blocks):
+        cfg.remove_blocks(set(cfg.blocks) - reachable)
+        change = CONTROL_FLOW_CHANGED
+
+    # an empty block only falls through, its predecessors can fall straight past it
+    empty = {block for block in cfg.blocks if not block.instructions}
+    if empty:
+        following = None
+        for block in reversed(cfg.blocks):
+            if block.instructions:
+                following = block
+                continue
+            for predecessor in list(block.predecessors):
+                cfg.remove_edge(predecessor, block)
+                if following is not None:
+                    cfg.add_edge(predecessor, following)
+        cfg.remove_blocks(empty)
+        change = CONTROL_FLOW_CHANGED
+
+    # jumps to where the block falls through to anyway
+    for block in cfg.blocks:
+        if block.instructions and type(block.instructions[-1]) in JUMPS:
+            following = cfg.following(block)
+            if following is not None and block.successors == [following]:
+                block.instructions.pop()
+                change = max(change, INSTRUCTIONS_CHANGED)
+
+    targets = set()
+    for block in cfg.blocks:
+        if block.instructions and type(block.instructions[-1]) in JUMPS:
+            targets.add(block.instructions[-1].target)
+    for block in cfg.blocks:
+        body = block.instructions
+        if body and type(body[0]) is IRLabelNode and body[0].identifier not in targets:
+            del body[0]
+            change = max(change, INSTRUCTIONS_CHANGED)
+    return change
+
+
+@register("propagate-copies")
+def propagate_copies(analyses: Analyses) -> int:
+    cfg = analyses.cfg
+    copies = analyses.get("copies")
+    change = UNCHANGED
+    for block in cfg.blocks:
+        reaching = copies.reaching[block.index]
+        # register -> what the copy to it that holds copied, there's at most one
+        values = {copies.facts[i][0]: copies.sources[i] for i in bits(reaching)}
+
+        def holds(dst, source) -> bool:
+            value = values.get(dst.register) if type(dst) is IRVarNode else None
+            return value is not None and same(value, source)
+
+        def replace(operand):
+            if type(operand) is IRVarNode:
+                value = values.get(operand.register)
+                if value is not None and not same(value, operand):
+                    return value
+            return operand
+
+        kept = []
+        for instruction in block.instructions:
+            fact = None
+            if type(instruction) is IRCopyNode:
+                source, dst = instruction.sources[0], instruction.dst
+                # x = y where x already is y, or y = x after x = y
+                if same(source, dst) or holds(dst, source) or holds(source, dst):
+                    change = INSTRUCTIONS_CHANGED
+                    continue
+                # as the analysis saw it, before its source is replaced
+                fact = copies.index[copy_fact(instruction)]
+            if replace_uses(instruction, replace):
+                change = INSTRUCTIONS_CHANGED
+            kept.append(instruction)
+
+            dst = destination(instruction)
+            if dst is not None:
+                ended = copies.mentions.get(dst.register, 0) & reaching
+                for i in bits(ended):
+                    values.pop(copies.facts[i][0], None)
+                reaching &= ~ended
+                if fact is not None:
+                    reaching |= 1 << fact
+                    # what it copied before being rewritten, writing that ends the
+                    # fact, a rewritten source could change while it still holds
+                    values[dst.register] = copies.sources[fact]
+        block.instructions[:] = kept
+    return change
+
+
+@register("eliminate-dead-stores")
+def eliminate_dead_stores(analyses: Analyses) -> int:
+    live_out = analyses.get("liveness")
+    change = UNCHANGED
+    for block in analyses.cfg.blocks:
+        live = live_out[block.index]
+        kept = []
+        for instruction in reversed(block.instructions):
+            dst = destination(instruction)
+            if type(instruction) in STORES and not live >> dst.register & 1:
+                change = INSTRUCTIONS_CHANGED
+                continue
+            kept.append(instruction)
+            if dst is not None:
+                live &= ~(1 << dst.register)
+            for source in uses(instruction):
+                if type(source) is IRVarNode:
+                    live |= 1 << source.register
+        kept.reverse()
+        block.instructions[:] = kept
+    return change
+
+
+# passes run at each -O level
+LEVELS = {
+    0: [],
+    1: ["fold-constants", "eliminate-unreachable-code"],
+    2: list(PASSES),
+}
+
+
+def select_passes(level: int, flags: dict[str, bool]) -> list[str]:
+    """The passes an -O level and the pass flags turn on."""
+    return LEVELS[level] + [name for name, enabled in flags.items() if enabled]
+
+
+class PassManager:
+    """Runs passes over each function until none of them changes anything.
+
+    A pass that changes a function queues every pass again, in their usual order,
+    and throws away the analyses the change affects.
+    """
+
+    def __init__(self, passes: list[str], debug: bool = False) -> None:
+        for name in passes:
+            if name not in PASSES:
+                raise Exception(f"Unknown pass {name}")
+        self.passes = [name for name in PASSES if name in passes]
+        self.debug = debug
+        # totals over every function run, for measuring
+        self.runs = 0
+        self.requested = 0
+        self.computed = 0
+
+    def run(self, program: IRProgramNode) -> IRProgramNode:
+        for function in program.function_definitions:
+            if function.body:
+                self.run_function(function)
+        return program
+
+    def run_function(self, function: IRFunctionNode) -> None:
+        analyses = Analyses(function)
+        worklist = deque(self.passes)
+        queued = set(self.passes)
+        while worklist:
+            name = worklist.popleft()
+            queued.discard(name)
+            change = PASSES[name](analyses)
+            self.runs += 1
+            if change == UNCHANGED:
+                continue
+            if self.debug:
+                print(f"{name} changed {function.identifier}")
+            analyses.invalidate(change)
+            for other in self.passes:
+                if other not in queued:
+                    queued.add(other)
+                    worklist.append(other)
+        function.body = analyses.cfg.instructions()
+        self.requested += analyses.requested
+        self.computed += analyses.computed
@@ -3,19 +3,36 @@ from .TackyConstructs import *
 
 from collections import defaultdict
 
+from Visitor import Visitor, run_recursive, run_iterative
+from Identifier import Identifier, intern
+
 
 class Tacky:
-    def __init__(self, ast, debug) -> None:
+    def __init__(self, ast, debug, iterative: bool = False) -> None:
         self.ast = ast
         self.debug = debug
+        # statements are lowered by generators, see Visitor.run_recursive
+        self.run = run_iterative if iterative else run_recursive
         self.temp_variable_counter = 0
         self.temp_label_counter = defaultdict(int)
+        # the function being lowered's variables, by name and by register
+        self.variables = {}
+        self.registers = []
 
         instructions = []
 
-    def make_temporary_variable(self) -> str:
+    def make_temporary_variable(self) -> Identifier:
         self.temp_variable_counter += 1
-        return f"tmp.{self.temp_variable_counter-1}"  # minus 1 so starts at zero
+        # minus 1 so starts at zero
+        return intern(f"tmp.{self.temp_variable_counter-1}")
+
+    def variable(self, name: str) -> IRVarNode:
+        # the next register for a variable not seen in this function yet
+        node = self.variables.get(name)
+        if node is None:
+            node = self.variables[name] = IRVarNode(name, len(self.registers))
+            self.registers.append(name)
+        return node
 
     def make_label(self, ident: str) -> str:
         self.temp_label_counter[ident] += 1
@@ -38,400 +55,426 @@ class Tacky:
         program_node = self.emit_ir(ast, [])
         return program_node
 
-    def emit_ir(self, ast: ProgramNode, instructions: list[IRNode]):
-
-        if ast is None:
-            return None
-
-        if isinstance(ast, ProgramNode):
-            functions = []
-            for function in ast.functions:
-                func = self.emit_ir(function, [])
-                if func:
-                    functions.append(func)
-            return IRProgramNode(functions)
-
-        elif isinstance(ast, FunctionDeclarationNode):
-            if ast.body is not None:
-                self.emit_ir(ast.body, instructions)
-                instructions.append(IRReturnNode(IRConstantNode(0)))
+    @Visitor
+    def emit_ir(self, ast, instructions: list[IRNode]):
+        return None
+
+    @emit_ir.register(ProgramNode)
+    def emit_program(self, ast, instructions: list[IRNode]):
+        functions = []
+        for function in ast.functions:
+            func = self.emit_ir(function, [])
+            if func:
+                functions.append(func)
+        return IRProgramNode(functions)
+
+    @emit_ir.register(FunctionDeclarationNode)
+    def emit_function(self, ast, instructions: list[IRNode]):
+        if ast.body is None:
+            # a declaration, also met inside a body, which keeps its registers
             return IRFunctionNode(ast.identifier, ast.params, instructions)
+        self.variables = {}
+        self.registers = []
+        for param in ast.params:
+            self.variable(param)
+        self.run(self.emit_ir(ast.body, instructions))
+        instructions.append(IRReturnNode(IRConstantNode(0)))
+        return IRFunctionNode(ast.identifier, ast.params, instructions, self.registers)
+
+    @emit_ir.register(BlockNode)
+    def emit_block(self, ast, instructions: list[IRNode]):
+        for block_item in ast.children:
+            if isinstance(block_item, BlockItemNode):
+                block_item = block_item.child
+            yield self.emit_ir(block_item, instructions)
+            # instructions.append(result)
+        return None
+
+    @emit_ir.register(FunctionCallNode)
+    def emit_function_call(self, ast, instructions: list[IRNode]):
+        args = []
+        for arg in ast.arguments:
+            args.append(self.emit_ir(arg, instructions))
+        dst = self.variable(self.make_temporary_variable())
+        instructions.append(IRFunctionCallNode(ast.identifier, args, dst))
+        return dst
+
+        # return IRFunctionCallNode(ast.identifier, args, None)
+
+    @emit_ir.register(ConstantNode)
+    def emit_constant(self, ast, instructions: list[IRNode]):
+        return IRConstantNode(ast.value)
+
+    @emit_ir.register(UnaryNode)
+    def emit_unary(self, ast, instructions: list[IRNode]):
+        if ast.operator in [
+            UnaryOperatorNode.INCREMENT,
+            UnaryOperatorNode.DECREMENT,
+        ]:
+            binary_operator_lookup = {
+                UnaryOperatorNode.INCREMENT: IRBinaryOperator.ADD,
+                UnaryOperatorNode.DECREMENT: IRBinaryOperator.SUBTRACT,
+            }
+            if ast.postfix:
+                src = self.emit_ir(ast.exp, instructions)
+                dst = self.variable(self.make_temporary_variable())
+                instructions.append(IRCopyNode(src, dst))
+                tacky_op = IRBinaryNode(
+                    binary_operator_lookup[ast.operator],
+                    src,
+                    IRConstantNode(1),
+                    src,
+                )
+                instructions.append(tacky_op)
 
-        elif isinstance(ast, BlockNode):
-            for block_item in ast.children:
-                self.emit_ir(block_item.child, instructions)
-                # instructions.append(result)
-            return None
-
-        elif isinstance(ast, FunctionCallNode):
-            args = []
-            for arg in ast.arguments:
-                args.append(self.emit_ir(arg, instructions))
-            dst = IRVarNode(self.make_temporary_variable())
-            instructions.append(IRFunctionCallNode(ast.identifier, args, dst))
-            return dst
-
-            # return IRFunctionCallNode(ast.identifier, args, None)
-
-        elif isinstance(ast, ConstantNode):
-            return IRConstantNode(ast.value)
-
-        elif isinstance(ast, UnaryNode):
-
-            if ast.operator in [
-                UnaryOperatorNode.INCREMENT,
-                UnaryOperatorNode.DECREMENT,
-            ]:
-                binary_operator_lookup = {
-                    UnaryOperatorNode.INCREMENT: IRBinaryOperator.ADD,
-                    UnaryOperatorNode.DECREMENT: IRBinaryOperator.SUBTRACT,
-                }
-                if ast.postfix:
-                    src = self.emit_ir(ast.exp, instructions)
-                    dst = IRVarNode(self.make_temporary_variable())
-                    instructions.append(IRCopyNode(src, dst))
-                    tacky_op = IRBinaryNode(
-                        binary_operator_lookup[ast.operator],
-                        src,
-                        IRConstantNode(1),
-                        src,
-                    )
-                    instructions.append(tacky_op)
-
-                else:
-                    src = self.emit_ir(ast.exp, instructions)
-                    dst = src
-                    tacky_op = IRBinaryNode(
-                        binary_operator_lookup[ast.operator],
-                        src,
-                        IRConstantNode(1),
-                        src,
-                    )
-                    instructions.append(tacky_op)
-
-                return dst
             else:
                 src = self.emit_ir(ast.exp, instructions)
-                dst = IRVarNode(self.make_temporary_variable())
-                tacky_op = IRUnaryOperator[ast.operator.name]
-                instructions.append(IRUnaryNode(tacky_op, src, dst))
+                dst = src
+                tacky_op = IRBinaryNode(
+                    binary_operator_lookup[ast.operator],
+                    src,
+                    IRConstantNode(1),
+                    src,
+                )
+                instructions.append(tacky_op)
 
             return dst
+        else:
+            src = self.emit_ir(ast.exp, instructions)
+            dst = self.variable(self.make_temporary_variable())
+            tacky_op = IRUnaryOperator[ast.operator.name]
+            instructions.append(IRUnaryNode(tacky_op, src, dst))
 
-        elif isinstance(ast, BinaryNode):
-
-            if ast.operator in SHORT_CIRCUIT_BINARY_OPERATORS:
-
-                if ast.operator == BinaryOperatorNode.AND_LOGICAL:
-
-                    false_label = self.make_label("AND_FALSE")
-                    end_label = self.make_label("AND_END")
-                    dst = IRVarNode(self.make_temporary_variable())
+        return dst
 
-                    src_1 = self.emit_ir(ast.exp_1, instructions)
-                    instructions.append(IRJumpIfZeroNode(src_1, false_label))
+    @emit_ir.register(BinaryNode)
+    def emit_binary(self, ast, instructions: list[IRNode]):
+        if ast.operator in SHORT_CIRCUIT_BINARY_OPERATORS:
 
-                    src_2 = self.emit_ir(ast.exp_2, instructions)
-                    instructions.append(IRJumpIfZeroNode(src_2, false_label))
+            if ast.operator == BinaryOperatorNode.AND_LOGICAL:
 
-                    instructions.append(IRCopyNode(IRConstantNode(1), dst))
-                    instructions.append(IRJumpNode(end_label))
-                    instructions.append(IRLabelNode(false_label))
-                    instructions.append(IRCopyNode(IRConstantNode(0), dst))
-                    instructions.append(IRLabelNode(end_label))
+                false_label = self.make_label("AND_FALSE")
+                end_label = self.make_label("AND_END")
+                dst = self.variable(self.make_temporary_variable())
 
-                elif ast.operator == BinaryOperatorNode.OR_LOGICAL:
+                src_1 = self.emit_ir(ast.exp_1, instructions)
+                instructions.append(IRJumpIfZeroNode(src_1, false_label))
 
-                    true_label = self.make_label("OR_TRUE")
-                    end_label = self.make_label("OR_END")
-                    dst = IRVarNode(self.make_temporary_variable())
+                src_2 = self.emit_ir(ast.exp_2, instructions)
+                instructions.append(IRJumpIfZeroNode(src_2, false_label))
 
-                    src_1 = self.emit_ir(ast.exp_1, instructions)
-                    instructions.append(IRJumpIfNotZeroNode(src_1, true_label))
+                instructions.append(IRCopyNode(IRConstantNode(1), dst))
+                instructions.append(IRJumpNode(end_label))
+                instructions.append(IRLabelNode(false_label))
+                instructions.append(IRCopyNode(IRConstantNode(0), dst))
+                instructions.append(IRLabelNode(end_label))
 
-                    src_2 = self.emit_ir(ast.exp_2, instructions)
-                    instructions.append(IRJumpIfNotZeroNode(src_2, true_label))
+            elif ast.operator == BinaryOperatorNode.OR_LOGICAL:
 
-                    instructions.append(IRCopyNode(IRConstantNode(0), dst))
-                    instructions.append(IRJumpNode(end_label))
-                    instructions.append(IRLabelNode(true_label))
-                    instructions.append(IRCopyNode(IRConstantNode(1), dst))
-                    instructions.append(IRLabelNode(end_label))
+                true_label = self.make_label("OR_TRUE")
+                end_label = self.make_label("OR_END")
+                dst = self.variable(self.make_temporary_variable())
 
-            elif ast.operator in NON_SHORT_CIRCUIT_BINARY_OPERATORS:
                 src_1 = self.emit_ir(ast.exp_1, instructions)
+                instructions.append(IRJumpIfNotZeroNode(src_1, true_label))
+
                 src_2 = self.emit_ir(ast.exp_2, instructions)
-                dst = IRVarNode(self.make_temporary_variable())
-                op = IRBinaryOperator[ast.operator.name]
+                instructions.append(IRJumpIfNotZeroNode(src_2, true_label))
 
-                instructions.append(IRBinaryNode(op, src_1, src_2, dst))
+                instructions.append(IRCopyNode(IRConstantNode(0), dst))
+                instructions.append(IRJumpNode(end_label))
+                instructions.append(IRLabelNode(true_label))
+                instructions.append(IRCopyNode(IRConstantNode(1), dst))
+                instructions.append(IRLabelNode(end_label))
 
-            else:
-                raise Exception(f"Unknown type of binary operator {ast.operator}")
+        elif ast.operator in NON_SHORT_CIRCUIT_BINARY_OPERATORS:
+            src_1 = self.emit_ir(ast.exp_1, instructions)
+            src_2 = self.emit_ir(ast.exp_2, instructions)
+            dst = self.variable(self.make_temporary_variable())
+            op = IRBinaryOperator[ast.operator.name]
 
-            return dst
+            instructions.append(IRBinaryNode(op, src_1, src_2, dst))
 
-        elif isinstance(ast, VarNode):
-            return IRVarNode(ast.identifier)
-
-        elif isinstance(ast, AssignmentNode):
-            if ast.type in ASSIGN_EQUAL_OPERATORS_LOOKUP.keys():
-
-                src = self.emit_ir(ast.rvalue, instructions)
-                dst = self.emit_ir(ast.lvalue, instructions)
-                temp = IRVarNode(self.make_temporary_variable())
-                tacky_op = ASSIGN_EQUAL_OPERATORS_LOOKUP[ast.type]
-                instructions.append(IRBinaryNode(tacky_op, dst, src, temp))
-                instructions.append(IRCopyNode(temp, dst))
-                return dst
-
-            result = self.emit_ir(ast.rvalue, instructions)
-            instructions.append(IRCopyNode(result, IRVarNode(ast.lvalue.identifier)))
-            return IRVarNode(ast.lvalue.identifier)
-
-        elif isinstance(ast, DeclarationNode):
-            if ast.exp:
-                result = self.emit_ir(ast.exp, instructions)
-                instructions.append(IRCopyNode(result, IRVarNode(ast.identifier)))
-                return IRVarNode(ast.identifier)
-            else:
-                pass  # TODO: Nothing to do without assignment, just highlighting
-
-        elif isinstance(ast, ReturnNode):
-            if ast.exp:
-                # First evaluate the expression (1 == 1)
-                exp_result = self.emit_ir(ast.exp, instructions)
-                # Then add a return instruction with that result
-                instructions.append(IRReturnNode(exp_result))
-            else:
-                instructions.append(IRReturnNode(IRConstantNode(0)))
-            return None  # Don't return the return node
+        else:
+            raise Exception(f"Unknown type of binary operator {ast.operator}")
 
-        elif isinstance(ast, IfNode):
-            false_label = self.make_label("IF_FALSE")
-            end_label = self.make_label("IF_END")
+        return dst
 
-            if not ast.else_:
-                condition = self.emit_ir(ast.condition, instructions)
-                instructions.append(IRJumpIfZeroNode(condition, end_label))
-                instructions.append(self.emit_ir(ast.then, instructions))
-                instructions.append(IRLabelNode(end_label))
-            else:
-                condition = self.emit_ir(ast.condition, instructions)
-                instructions.append(IRJumpIfZeroNode(condition, false_label))
-                instructions.append(self.emit_ir(ast.then, instructions))
-                instructions.append(IRJumpNode(end_label))
-                instructions.append(IRLabelNode(false_label))
-                instructions.append(self.emit_ir(ast.else_, instructions))
-                instructions.append(IRLabelNode(end_label))
+    @emit_ir.register(VarNode)
+    def emit_var(self, ast, instructions: list[IRNode]):
+        return self.variable(ast.identifier)
 
-        elif isinstance(ast, ConditionalNode):
-            e2_label = self.make_label("CONDITIONAL_ELSE")
-            end_label = self.make_label("CONDITIONAL_END")
-            result_var = IRVarNode(self.make_temporary_variable())
+    @emit_ir.register(AssignmentNode)
+    def emit_assignment(self, ast, instructions: list[IRNode]):
+        if ast.type in ASSIGN_EQUAL_OPERATORS_LOOKUP.keys():
 
-            condition = self.emit_ir(ast.condition, instructions)
-            instructions.append(IRJumpIfZeroNode(condition, e2_label))
-            v1 = self.emit_ir(ast.then, instructions)
-            instructions.append(IRCopyNode(v1, result_var))
+            src = self.emit_ir(ast.rvalue, instructions)
+            dst = self.emit_ir(ast.lvalue, instructions)
+            temp = self.variable(self.make_temporary_variable())
+            tacky_op = ASSIGN_EQUAL_OPERATORS_LOOKUP[ast.type]
+            instructions.append(IRBinaryNode(tacky_op, dst, src, temp))
+            instructions.append(IRCopyNode(temp, dst))
+            return dst
 
-            instructions.append(IRJumpNode(end_label))
+        result = self.emit_ir(ast.rvalue, instructions)
+        instructions.append(IRCopyNode(result, self.variable(ast.lvalue.identifier)))
+        return self.variable(ast.lvalue.identifier)
 
-            instructions.append(IRLabelNode(e2_label))
-            v2 = self.emit_ir(ast.else_, instructions)
-            instructions.append(IRCopyNode(v2, result_var))
+    @emit_ir.register(DeclarationNode)
+    def emit_declaration(self, ast, instructions: list[IRNode]):
+        if ast.exp:
+            result = self.emit_ir(ast.exp, instructions)
+            instructions.append(IRCopyNode(result, self.variable(ast.identifier)))
+            return self.variable(ast.identifier)
+        else:
+            pass  # TODO: Nothing to do without assignment, just highlighting
+
+    @emit_ir.register(ReturnNode)
+    def emit_return(self, ast, instructions: list[IRNode]):
+        if ast.exp:
+            # First evaluate the expression (1 == 1)
+            exp_result = self.emit_ir(ast.exp, instructions)
+            # Then add a return instruction with that result
+            instructions.append(IRReturnNode(exp_result))
+        else:
+            instructions.append(IRReturnNode(IRConstantNode(0)))
+        return None  # Don't return the return node
 
-            instructions.append(IRLabelNode(end_label))
-            return result_var
-
-        elif isinstance(ast, GotoNode):
-            label = ast.label
-            instructions.append(IRJumpNode(label))
-            return None
-        elif isinstance(ast, LabeledStatementNode):
-            label = ast.label
-            instructions.append(IRLabelNode(label))
-            instructions.append(self.emit_ir(ast.child, instructions))
-            return None
-
-        elif isinstance(ast, InitDeclNode):
-            if ast.declaration:
-                result = self.emit_ir(ast.declaration, instructions)
-                return result  # IRVarNode(ast.declaration.identifier)
-            else:
-                pass
+    @emit_ir.register(IfNode)
+    def emit_if(self, ast, instructions: list[IRNode]):
+        false_label = self.make_label("IF_FALSE")
+        end_label = self.make_label("IF_END")
 
-        elif isinstance(ast, InitExprNode):
-            if ast.expression:
-                result = self.emit_ir(ast.expression, instructions)
-                return result  # IRVarNode(ast.expression.identifier)
-            else:
-                pass
-
-        elif isinstance(ast, BreakNode):
-            instructions.append(
-                IRJumpNode(self.get_control_flow_label("BREAK", ast.label))
-            )
-            return None
-        elif isinstance(ast, ContinueNode):
-            instructions.append(
-                IRJumpNode(self.get_control_flow_label("CONTINUE", ast.label))
-            )
-            return None
-
-        elif isinstance(ast, DoWhileNode):
-            loop_label = self.get_control_flow_label("", ast.label)
-            break_label = self.get_control_flow_label("BREAK", ast.label)
-            continue_label = self.get_control_flow_label("CONTINUE", ast.label)
-            condition_result_var = IRVarNode(self.make_temporary_variable())
-
-            instructions.append(IRLabelNode(loop_label))
-            self.emit_ir(ast.body, instructions)
-
-            instructions.append(IRLabelNode(continue_label))
+        if not ast.else_:
             condition = self.emit_ir(ast.condition, instructions)
-            instructions.append(IRCopyNode(condition, condition_result_var))
-            instructions.append(IRJumpIfNotZeroNode(condition_result_var, loop_label))
-            instructions.append(IRLabelNode(break_label))
-
-        elif isinstance(ast, WhileNode):
-            break_label = self.get_control_flow_label("BREAK", ast.label)
-            continue_label = self.get_control_flow_label("CONTINUE", ast.label)
-            condition_result_var = IRVarNode(self.make_temporary_variable())
+            instructions.append(IRJumpIfZeroNode(condition, end_label))
+            instructions.append((yield self.emit_ir(ast.then, instructions)))
+            instructions.append(IRLabelNode(end_label))
+        else:
+            condition = self.emit_ir(ast.condition, instructions)
+            instructions.append(IRJumpIfZeroNode(condition, false_label))
+            instructions.append((yield self.emit_ir(ast.then, instructions)))
+            instructions.append(IRJumpNode(end_label))
+            instructions.append(IRLabelNode(false_label))
+            instructions.append((yield self.emit_ir(ast.else_, instructions)))
+            instructions.append(IRLabelNode(end_label))
 
-            instructions.append(IRLabelNode(continue_label))
+    @emit_ir.register(ConditionalNode)
+    def emit_conditional(self, ast, instructions: list[IRNode]):
+        e2_label = self.make_label("CONDITIONAL_ELSE")
+        end_label = self.make_label("CONDITIONAL_END")
+        result_var = self.variable(self.make_temporary_variable())
+
+        condition = self.emit_ir(ast.condition, instructions)
+        instructions.append(IRJumpIfZeroNode(condition, e2_label))
+        v1 = self.emit_ir(ast.then, instructions)
+        instructions.append(IRCopyNode(v1, result_var))
+
+        instructions.append(IRJumpNode(end_label))
+
+        instructions.append(IRLabelNode(e2_label))
+        v2 = self.emit_ir(ast.else_, instructions)
+        instructions.append(IRCopyNode(v2, result_var))
+
+        instructions.append(IRLabelNode(end_label))
+        return result_var
+
+    @emit_ir.register(GotoNode)
+    def emit_goto(self, ast, instructions: list[IRNode]):
+        label = ast.label
+        instructions.append(IRJumpNode(label))
+        return None
+
+    @emit_ir.register(LabeledStatementNode)
+    def emit_labeled_statement(self, ast, instructions: list[IRNode]):
+        label = ast.label
+        instructions.append(IRLabelNode(label))
+        instructions.append((yield self.emit_ir(ast.child, instructions)))
+        return None
+
+    @emit_ir.register(InitDeclNode)
+    def emit_init_declaration(self, ast, instructions: list[IRNode]):
+        if ast.declaration:
+            result = self.emit_ir(ast.declaration, instructions)
+            return result  # IRVarNode(ast.declaration.identifier)
+        else:
+            pass
 
+    @emit_ir.register(InitExprNode)
+    def emit_init_expression(self, ast, instructions: list[IRNode]):
+        if ast.expression:
+            result = self.emit_ir(ast.expression, instructions)
+            return result  # IRVarNode(ast.expression.identifier)
+        else:
+            pass
+
+    @emit_ir.register(BreakNode)
+    def emit_break(self, ast, instructions: list[IRNode]):
+        instructions.append(IRJumpNode(self.get_control_flow_label("BREAK", ast.label)))
+        return None
+
+    @emit_ir.register(ContinueNode)
+    def emit_continue(self, ast, instructions: list[IRNode]):
+        instructions.append(
+            IRJumpNode(self.get_control_flow_label("CONTINUE", ast.label))
+        )
+        return None
+
+    @emit_ir.register(DoWhileNode)
+    def emit_do_while(self, ast, instructions: list[IRNode]):
+        loop_label = self.get_control_flow_label("", ast.label)
+        break_label = self.get_control_flow_label("BREAK", ast.label)
+        continue_label = self.get_control_flow_label("CONTINUE", ast.label)
+        condition_result_var = self.variable(self.make_temporary_variable())
+
+        instructions.append(IRLabelNode(loop_label))
+        yield self.emit_ir(ast.body, instructions)
+
+        instructions.append(IRLabelNode(continue_label))
+        condition = self.emit_ir(ast.condition, instructions)
+        instructions.append(IRCopyNode(condition, condition_result_var))
+        instructions.append(IRJumpIfNotZeroNode(condition_result_var, loop_label))
+        instructions.append(IRLabelNode(break_label))
+
+    @emit_ir.register(WhileNode)
+    def emit_while(self, ast, instructions: list[IRNode]):
+        break_label = self.get_control_flow_label("BREAK", ast.label)
+        continue_label = self.get_control_flow_label("CONTINUE", ast.label)
+        condition_result_var = self.variable(self.make_temporary_variable())
+
+        instructions.append(IRLabelNode(continue_label))
+
+        condition = self.emit_ir(ast.condition, instructions)
+        instructions.append(IRCopyNode(condition, condition_result_var))
+        instructions.append(IRJumpIfZeroNode(condition_result_var, break_label))
+        yield self.emit_ir(ast.body, instructions)
+
+        instructions.append(IRJumpNode(continue_label))
+        instructions.append(IRLabelNode(break_label))
+
+    @emit_ir.register(ForNode)
+    def emit_for(self, ast, instructions: list[IRNode]):
+        loop_label = self.get_control_flow_label("", ast.label)
+        break_label = self.get_control_flow_label("BREAK", ast.label)
+        continue_label = self.get_control_flow_label("CONTINUE", ast.label)
+
+        condition_result_var = self.variable(self.make_temporary_variable())
+
+        if ast.init:
+            self.emit_ir(ast.init, instructions)
+        instructions.append(IRLabelNode(loop_label))
+
+        if ast.condition:
             condition = self.emit_ir(ast.condition, instructions)
             instructions.append(IRCopyNode(condition, condition_result_var))
             instructions.append(IRJumpIfZeroNode(condition_result_var, break_label))
-            self.emit_ir(ast.body, instructions)
-
-            instructions.append(IRJumpNode(continue_label))
-            instructions.append(IRLabelNode(break_label))
-
-        elif isinstance(ast, ForNode):
-            loop_label = self.get_control_flow_label("", ast.label)
-            break_label = self.get_control_flow_label("BREAK", ast.label)
-            continue_label = self.get_control_flow_label("CONTINUE", ast.label)
-
-            condition_result_var = IRVarNode(self.make_temporary_variable())
-
-            if ast.init:
-                self.emit_ir(ast.init, instructions)
-            instructions.append(IRLabelNode(loop_label))
-
-            if ast.condition:
-                condition = self.emit_ir(ast.condition, instructions)
-                instructions.append(IRCopyNode(condition, condition_result_var))
-                instructions.append(IRJumpIfZeroNode(condition_result_var, break_label))
-            self.emit_ir(ast.body, instructions)
-
-            instructions.append(IRLabelNode(continue_label))
-            self.emit_ir(ast.post, instructions)
-            instructions.append(IRJumpNode(loop_label))
-            instructions.append(IRLabelNode(break_label))
-
-        elif isinstance(ast, CaseNode):
-            if not hasattr(ast, "label") or not ast.label:
-                raise AttributeError("CaseNode missing 'label' attribute")
-
-            instructions.append(IRLabelNode(ast.label))
-            for item in ast.body:
-                instructions.append(self.emit_ir(item, instructions))
-
-            return None
-
-        elif isinstance(ast, DefaultNode):
-            if not hasattr(ast, "label") or not ast.label:
-                raise AttributeError("DefaultNode missing 'label' attribute")
-
-            instructions.append(IRLabelNode(ast.label))
-            for item in ast.body:
-                instructions.append(self.emit_ir(item, instructions))
-            return None
-
-        elif isinstance(ast, SwitchNode):
-            # Ensure required attributes exist
-            if not hasattr(ast, "label"):
-                raise AttributeError("SwitchNode missing 'label' attribute")
-            if not hasattr(ast, "case_targets"):
-                raise AttributeError("SwitchNode missing 'case_targets' attribute")
-
-            switch_end_label = f"{ast.label}_END"
-            switch_break_label = self.get_control_flow_label("BREAK", ast.label)
-
-            condition_value = self.emit_ir(ast.condition, instructions)
-
-            if not isinstance(condition_value, (IRVarNode, IRConstantNode)):
-                temp_var = IRVarNode(self.make_temporary_variable())
-                instructions.append(IRCopyNode(condition_value, temp_var))
-                condition_value = temp_var
-
-            case_nodes = {}  # Maps label -> CaseNode
-            default_node = None
-
-            # Function to recursively find case/default nodes in the switch body
-            def find_case_nodes(node):
-                if node is None:
-                    return
-
-                # First check if this node itself is a case or default
-                if isinstance(node, CaseNode):
-                    case_nodes[node.label] = node
-                    for item in node.body:
-                        find_case_nodes(item)
-                elif isinstance(node, DefaultNode):
-                    nonlocal default_node
-                    default_node = node
-                    for item in node.body:
-                        find_case_nodes(item)
-                elif isinstance(node, BlockNode):
-                    for item in node.children:
-                        find_case_nodes(item)
-                elif isinstance(node, BlockItemNode):
-                    find_case_nodes(node.child)
-                elif isinstance(node, DoWhileNode):
-                    find_case_nodes(node.body)
-                elif isinstance(node, WhileNode):
-                    find_case_nodes(node.body)
-                elif isinstance(node, ForNode):
-                    find_case_nodes(node.body)
-                elif isinstance(node, IfNode):
-                    find_case_nodes(node.then)
-                    if node.else_:
-                        find_case_nodes(node.else_)
-
-            find_case_nodes(ast.body)
-
-            for case_label in ast.case_targets:
-                if case_label in case_nodes:
-                    case_node = case_nodes[case_label]
-                    case_value = self.emit_ir(case_node.condition, instructions)
-
-                    # Compare: switch_condition == case_value
-                    cmp_result = IRVarNode(self.make_temporary_variable())
-                    instructions.append(
-                        IRBinaryNode(
-                            IRBinaryOperator.EQUAL,
-                            condition_value,
-                            case_value,
-                            cmp_result,
-                        )
+        yield self.emit_ir(ast.body, instructions)
+
+        instructions.append(IRLabelNode(continue_label))
+        self.emit_ir(ast.post, instructions)
+        instructions.append(IRJumpNode(loop_label))
+        instructions.append(IRLabelNode(break_label))
+
+    @emit_ir.register(CaseNode)
+    def emit_case(self, ast, instructions: list[IRNode]):
+        if not hasattr(ast, "label") or not ast.label:
+            raise AttributeError("CaseNode missing 'label' attribute")
+
+        instructions.append(IRLabelNode(ast.label))
+        for item in ast.body:
+            instructions.append((yield self.emit_ir(item, instructions)))
+
+        return None
+
+    @emit_ir.register(DefaultNode)
+    def emit_default(self, ast, instructions: list[IRNode]):
+        if not hasattr(ast, "label") or not ast.label:
+            raise AttributeError("DefaultNode missing 'label' attribute")
+
+        instructions.append(IRLabelNode(ast.label))
+        for item in ast.body:
+            instructions.append((yield self.emit_ir(item, instructions)))
+        return None
+
+    @emit_ir.register(SwitchNode)
+    def emit_switch(self, ast, instructions: list[IRNode]):
+        # Ensure required attributes exist
+        if not hasattr(ast, "label"):
+            raise AttributeError("SwitchNode missing 'label' attribute")
+        if not hasattr(ast, "case_targets"):
+            raise AttributeError("SwitchNode missing 'case_targets' attribute")
+
+        switch_end_label = f"{ast.label}_END"
+        switch_break_label = self.get_control_flow_label("BREAK", ast.label)
+
+        condition_value = self.emit_ir(ast.condition, instructions)
+
+        if not isinstance(condition_value, (IRVarNode, IRConstantNode)):
+            temp_var = self.variable(self.make_temporary_variable())
+            instructions.append(IRCopyNode(condition_value, temp_var))
+            condition_value = temp_var
+
+        case_nodes = {}  # Maps label -> CaseNode
+        default_node = None
+
+        # Find the case/default nodes in the switch body, in source order
+        pending = [ast.body]
+        while pending:
+            node = pending.pop()
+            if node is None:
+                continue
+
+            # First check if this node itself is a case or default
+            if isinstance(node, CaseNode):
+                case_nodes[node.label] = node
+                pending.extend(reversed(node.body))
+            elif isinstance(node, DefaultNode):
+                default_node = node
+                pending.extend(reversed(node.body))
+            elif isinstance(node, BlockNode):
+                pending.extend(reversed(node.children))
+            elif isinstance(node, BlockItemNode):
+                pending.append(node.child)
+            elif isinstance(node, DoWhileNode):
+                pending.append(node.body)
+            elif isinstance(node, WhileNode):
+                pending.append(node.body)
+            elif isinstance(node, ForNode):
+                pending.append(node.body)
+            elif isinstance(node, IfNode):
+                if node.else_:
+                    pending.append(node.else_)
+                pending.append(node.then)
+
+        for case_label in ast.case_targets:
+            if case_label in case_nodes:
+                case_node = case_nodes[case_label]
+                case_value = self.emit_ir(case_node.condition, instructions)
+
+                # Compare: switch_condition == case_value
+                cmp_result = self.variable(self.make_temporary_variable())
+                instructions.append(
+                    IRBinaryNode(
+                        IRBinaryOperator.EQUAL,
+                        condition_value,
+                        case_value,
+                        cmp_result,
                     )
+                )
 
-                    instructions.append(IRJumpIfNotZeroNode(cmp_result, case_label))
+                instructions.append(IRJumpIfNotZeroNode(cmp_result, case_label))
 
-            if ast.default_target:
-                instructions.append(IRJumpNode(ast.default_target))
-            else:
-                instructions.append(IRJumpNode(switch_end_label))
+        if ast.default_target:
+            instructions.append(IRJumpNode(ast.default_target))
+        else:
+            instructions.append(IRJumpNode(switch_end_label))
 
-            self.emit_ir(ast.body, instructions)
+        yield self.emit_ir(ast.body, instructions)
 
-            instructions.append(IRLabelNode(switch_end_label))
-            instructions.append(IRLabelNode(switch_break_label))
+        instructions.append(IRLabelNode(switch_end_label))
+        instructions.append(IRLabelNode(switch_break_label))
 
-            return None
+        return None
 
     def pretty_print(self, prog_node: IRProgramNode):
         for func in prog_node.function_definitions:
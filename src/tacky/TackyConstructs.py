@@ -2,9 +2,14 @@ from enum import Enum
 from typing import Self
 from parser.Parser import *
 
+# instructions without operands all share it
+NO_SOURCES = ()
+
 
 class IRNode:
-    def __init__(self, op: str, sources: list[Self], dst: Self) -> None:
+    __slots__ = ("op", "sources", "dst")
+
+    def __init__(self, op: str, sources: tuple[Self, ...], dst: Self) -> None:
         self.op = op
         self.sources = sources
         self.dst = dst
@@ -14,9 +19,10 @@ class IRNode:
 
 
 # Val
-class IRConstantNode(IRNode):
-    def __init__(self, value: str) -> None:
-        super().__init__("CONSTANT", None, None)
+class IRConstantNode:
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
         self.value = value
 
     def __str__(self) -> str:
@@ -26,21 +32,32 @@ class IRConstantNode(IRNode):
         return f"""IRConstantNode({self.value})"""
 
 
-class IRVarNode(IRNode):
-    def __init__(self, name: str) -> None:
-        super().__init__("VAR", [name], [])
+class IRVarNode:
+    """A variable, numbered densely per function by its virtual register.
+
+    Tacky makes one per variable of a function and every instruction that uses the
+    variable shares it, so later stages can index arrays by register.
+    """
+
+    __slots__ = ("name", "register")
+
+    def __init__(self, name: str, register: int) -> None:
+        self.name = name
+        self.register = register
 
     def __str__(self) -> str:
-        return f"""IRVarNode({self.sources[0]})"""
+        return f"""IRVarNode({self.name})"""
 
     def __repr__(self) -> str:
-        return f"""IRVarNode({self.sources[0]})"""
+        return f"""IRVarNode({self.name})"""
 
 
 ### Instructions
 class IRReturnNode(IRNode):
+    __slots__ = ()
+
     def __init__(self, val: IRConstantNode | IRVarNode) -> None:
-        super().__init__("RETURN", [val], None)
+        super().__init__("RETURN", (val,), None)
 
     def __str__(self) -> str:
         return f"""IRReturnNode({self.sources[0]})"""
@@ -50,10 +67,12 @@ class IRReturnNode(IRNode):
 
 
 class IRCopyNode(IRNode):
+    __slots__ = ()
+
     def __init__(
         self, src: IRConstantNode | IRVarNode, dst: IRConstantNode | IRVarNode
     ) -> None:
-        super().__init__("COPY", [src], dst)
+        super().__init__("COPY", (src,), dst)
 
     def __str__(self) -> str:
         return f"""IRCopyNode({self.sources[0]} to {self.dst})"""
@@ -63,8 +82,10 @@ class IRCopyNode(IRNode):
 
 
 class IRJumpNode(IRNode):
+    __slots__ = ("target",)
+
     def __init__(self, target: str) -> None:
-        super().__init__("JUMP", [], None)
+        super().__init__("JUMP", NO_SOURCES, None)
         self.target = target
 
     def __str__(self) -> str:
@@ -75,8 +96,10 @@ class IRJumpNode(IRNode):
 
 
 class IRJumpIfZeroNode(IRNode):
+    __slots__ = ("target", "condition")
+
     def __init__(self, condition: IRConstantNode | IRVarNode, target: str) -> None:
-        super().__init__("JUMP_IF_ZERO", [], None)
+        super().__init__("JUMP_IF_ZERO", NO_SOURCES, None)
         self.target = target
         self.condition = condition
 
@@ -88,8 +111,10 @@ class IRJumpIfZeroNode(IRNode):
 
 
 class IRJumpIfNotZeroNode(IRNode):
+    __slots__ = ("target", "condition")
+
     def __init__(self, condition: IRConstantNode | IRVarNode, target: str) -> None:
-        super().__init__("JUMP_IF_NOT_ZERO", [], None)
+        super().__init__("JUMP_IF_NOT_ZERO", NO_SOURCES, None)
         self.target = target
         self.condition = condition
 
@@ -101,8 +126,10 @@ class IRJumpIfNotZeroNode(IRNode):
 
 
 class IRLabelNode(IRNode):
+    __slots__ = ("identifier",)
+
     def __init__(self, identifier) -> None:
-        super().__init__("LABEL", [], None)
+        super().__init__("LABEL", NO_SOURCES, None)
         self.identifier = identifier
 
     def __str__(self) -> str:
@@ -113,6 +140,8 @@ class IRLabelNode(IRNode):
 
 
 class IRFunctionCallNode(IRNode):
+    __slots__ = ("identifier",)
+
     def __init__(
         self,
         identifier: str,
@@ -121,7 +150,6 @@ class IRFunctionCallNode(IRNode):
     ) -> None:
         super().__init__("FunctionCall", args, dst)
         self.identifier = identifier
-        self.dst = dst
 
     def __str__(self) -> str:
         return f"""FunctionCallNode({self.identifier}, {self.sources}, {self.dst})"""
@@ -140,13 +168,15 @@ class IRUnaryOperator(Enum):
 
 
 class IRUnaryNode(IRNode):
+    __slots__ = ()
+
     def __init__(
         self,
         op: IRUnaryOperator,
         src: IRConstantNode | IRVarNode,
         dst: IRConstantNode | IRVarNode,
     ) -> None:
-        super().__init__(op, [src], dst)
+        super().__init__(op, (src,), dst)
 
     def __str__(self) -> str:
         return f"""IRUnaryNode({self.op}, {self.sources[0]}, {self.dst})"""
@@ -228,6 +258,8 @@ ASSIGN_EQUAL_OPERATORS_LOOKUP = {
 
 
 class IRBinaryNode(IRNode):
+    __slots__ = ()
+
     def __init__(
         self,
         op: IRBinaryOperator,
@@ -235,7 +267,7 @@ class IRBinaryNode(IRNode):
         src_2: IRConstantNode | IRVarNode,
         dst: IRConstantNode | IRVarNode,
     ) -> None:
-        super().__init__(op, [src_1, src_2], dst)
+        super().__init__(op, (src_1, src_2), dst)
 
     def __str__(self) -> str:
         return f"""IRBinaryNode({self.op}, {self.sources[0]}, {self.sources[1]}, {self.dst})"""
@@ -245,11 +277,21 @@ class IRBinaryNode(IRNode):
 
 
 class IRFunctionNode(IRNode):
-    def __init__(self, identifier: str, params: list[str], body: list[IRNode]) -> None:
-        super().__init__("Function", [], None)
+    __slots__ = ("identifier", "params", "body", "registers")
+
+    def __init__(
+        self,
+        identifier: str,
+        params: list[str],
+        body: list[IRNode],
+        registers: list[str] = None,
+    ) -> None:
+        super().__init__("Function", NO_SOURCES, None)
         self.identifier = identifier
         self.params = params
         self.body = body
+        # register -> variable name, the parameters come first
+        self.registers = registers if registers is not None else list(params)
 
     def __str__(self) -> str:
         return f"""IRFunctionNode({self.identifier}, {self.params})"""
@@ -259,13 +301,22 @@ class IRFunctionNode(IRNode):
 
 
 class IRProgramNode(IRNode):
+    __slots__ = ("function_definitions",)
+
     def __init__(
         self,
         function_definitions: list[IRFunctionNode],
     ) -> None:
-        super().__init__("PROGRAM", None, [])
+        super().__init__("PROGRAM", None, None)
         self.function_definitions = function_definitions
 
+    @property
+    def main(self) -> IRFunctionNode | None:
+        for function in self.function_definitions:
+            if function.body and str(function.identifier) == "main":
+                return function
+        return None
+
     def __str__(self) -> str:
         return f"""IRProgramNode({self.function_definitions})"""
 
@@ -155,6 +155,8 @@ class TestChapter(unittest.TestCase):
     * compile_failure: compilation should fail)
     * compile_success: compilation should succeed up to some intermediate stage)
     * compile_and_run: compiling and running the test program should give the expected result)
+    * compile_and_interpret: like compile_and_run, but the compiler runs the program itself
+        with its IR interpreter (--run-ir) instead of emitting an executable
     * compile_client_and_run: the test program consists of a client and library.
         compiling the client with our compiler and library with the system compiler,
         run the compiled program, and validate the result
@@ -362,6 +364,20 @@ class TestChapter(unittest.TestCase):
 
         self.validate_runs(source_file, result)
 
+    def compile_and_interpret(self, source_file: Path) -> None:
+        """Run a valid test program with the compiler's IR interpreter and validate the results"""
+        args = [self.cc] + self.options + ["--run-ir", source_file]
+        try:
+            result = subprocess.run(
+                args, check=False, capture_output=True, text=True, timeout=10.0
+            )
+        except subprocess.TimeoutExpired:
+            # the compiler stops programs past its step limit well before this, so
+            # the interpreter or the program it was given never finished
+            self.fail(f"{source_file} didn't finish running with --run-ir")
+
+        self.validate_runs(source_file, result)
+
     def library_test_helper(
         self, file_under_test: Path, other_files: List[Path]
     ) -> None:
@@ -486,6 +502,16 @@ DIRECTORIES_BY_STAGE = {
     "tacky": dirs,
     "codegen": dirs,
     "run": dirs,
+    "run-ir": dirs,
+}
+
+# valid programs the run-ir stage leaves out because they run too long to interpret
+# under the compiler's default --max-steps limit (1,000,000 jumps and calls)
+TOO_LONG_TO_INTERPRET = {
+    # about 429M loop iterations
+    "chapter_8/valid/empty_loop_body.c",
+    # 10M calls, about 50 s with --max-steps 0
+    "chapter_9/valid/stack_arguments/test_for_memory_leaks.c",
 }
 
 
@@ -566,6 +592,15 @@ def make_test_run(program: Path) -> Callable[[TestChapter], None]:
     return test_run
 
 
+def make_test_interpret(program: Path) -> Callable[[TestChapter], None]:
+    """Generate one test method to run a valid single-file program with the IR interpreter"""
+
+    def test_interpret(self: TestChapter) -> None:
+        self.compile_and_interpret(program)
+
+    return test_interpret
+
+
 def make_test_client(program: Path) -> Callable[[TestChapter], None]:
     """Generate one test method for client in multi-file program"""
 
@@ -666,6 +701,13 @@ def make_valid_tests(
                     test_method = make_test_client(program)
                 else:
                     test_method = make_test_lib(program)
+            elif stage == "run-ir":
+                # multi-file programs have to be linked, so can't be interpreted
+                if "libraries" in key.parts or get_libs(program):
+                    continue
+                if get_props_key(program) in TOO_LONG_TO_INTERPRET:
+                    continue
+                test_method = make_test_interpret(program)
             else:
                 # for stages besides "run", just test that compilation succeeds
                 test_method = make_test_valid(program)